@@ -1,4 +1,7 @@
-import traceback
-EXC_HANDLER = (lambda e: traceback.print_exc())
-__version__ = "1.2.8"
+def _print_exc(e: BaseException):
+    import traceback
+    traceback.print_exc()
+
 
+EXC_HANDLER = _print_exc
+__version__ = "1.2.8"
@@ -7,3 +7,7 @@ class CDPError(Exception):
 
 class SocketExcitedError(Exception):
     pass
+
+
+class BufferOverflowError(Exception):
+    pass
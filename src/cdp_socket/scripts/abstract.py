@@ -1,27 +1,197 @@
 from cdp_socket.socket import SingleCDPSocket
+from cdp_socket.exceptions import BufferOverflowError
+from cdp_socket.utils.dispatcher import DROP_OLDEST, DROP_NEWEST
+import collections
 import uuid
 import asyncio
+import typing
+
+ERROR = "error"
+
+
+class EventBuffer(object):
+    """
+    ring buffer for the events of one subscription, filled by the receive loop
+
+    overflow policies, once ``maxsize`` events are buffered:
+    ``drop_oldest`` (default), ``drop_newest``, ``error`` (the consumer raises ``BufferOverflowError``)
+
+    Once closed, the consumer raises ``StopAsyncIteration`` instead of waiting.
+    """
+    __slots__ = ("_buffer", "_maxsize", "_overflow", "_predicate", "_waiter", "_want", "_loop",
+                 "dropped", "overflowed", "closed")
+
+    def __init__(self, maxsize: int = None, overflow: str = DROP_OLDEST, predicate: callable = None,
+                 loop: asyncio.AbstractEventLoop = None):
+        if overflow not in (DROP_OLDEST, DROP_NEWEST, ERROR):
+            raise ValueError(f"unknown overflow policy: {overflow!r}")
+        self._buffer = collections.deque()
+        self._maxsize = maxsize
+        self._overflow = overflow
+        self._predicate = predicate
+        self._waiter: asyncio.Future = None
+        self._want = 1
+        self._loop = loop
+        self.dropped = 0
+        self.overflowed = False
+        self.closed = False
+
+    def push(self, params):
+        if self._predicate is not None and not self._predicate(params):
+            return
+        buffer = self._buffer
+        if self._maxsize is not None and len(buffer) >= self._maxsize:
+            self.dropped += 1
+            if self._overflow == DROP_NEWEST:
+                return
+            elif self._overflow == ERROR:
+                self.overflowed = True
+                self._wake()
+                return
+            buffer.popleft()
+        buffer.append(params)
+        if len(buffer) >= self._want:
+            self._wake()
+
+    def _wake(self):
+        waiter = self._waiter
+        if waiter is not None and not waiter.done():
+            waiter.set_result(None)
+
+    async def _wait(self, want: int, timeout: float = None):
+        self._want = want
+        if self._loop is None:
+            self._loop = asyncio.get_running_loop()
+        self._waiter = waiter = self._loop.create_future()
+        handle = None
+        if timeout is not None:
+            handle = self._loop.call_later(timeout, self._wake)
+        try:
+            await waiter
+        finally:
+            self._waiter = None
+            self._want = 1
+            if handle is not None:
+                handle.cancel()
+
+    def close(self):
+        self.closed = True
+        self._wake()
+
+    def _check(self):
+        if self.closed:
+            raise StopAsyncIteration
+        if self.overflowed:
+            raise BufferOverflowError(f"more than {self._maxsize} events buffered, {self.dropped} dropped")
+
+    async def get(self):
+        while not self._buffer:
+            self._check()
+            await self._wait(1)
+        self._check()
+        return self._buffer.popleft()
+
+    async def get_batch(self, max_batch: int = 100, max_delay: float = 0) -> list:
+        """wait for at least one event, then up to ``max_delay`` seconds for ``max_batch`` events"""
+        buffer = self._buffer
+        while not buffer:
+            self._check()
+            await self._wait(1)
+        if max_delay and len(buffer) < max_batch:
+            await self._wait(max_batch, max_delay)
+        self._check()
+        if len(buffer) <= max_batch:
+            batch = list(buffer)
+            buffer.clear()
+        else:
+            batch = [buffer.popleft() for _ in range(max_batch)]
+        return batch
+
+    def __len__(self):
+        return len(self._buffer)
 
 
 class CDPEventIter(object):
-    def __init__(self, method, socket: SingleCDPSocket):
+    """
+    iterates over the events of ``method``, buffered from creation on, so no event gets lost between iterations.
+    Unsubscribes on ``close()``, once garbage-collected or when its socket (session) gets closed,
+    which ends a running ``async for``.
+    """
+
+    def __init__(self, method, socket: SingleCDPSocket, maxsize: int = None, overflow: str = DROP_OLDEST,
+                 predicate: callable = None):
+        self._closed = False
         self._method = method
         self._socket = socket
         self._id = uuid.uuid4().hex
-        self._fut = None
+        # noinspection PyProtectedMember
+        self._buffer = EventBuffer(maxsize, overflow, predicate, socket._loop)
+        # noinspection PyProtectedMember
+        socket._iter_callbacks[method][self._id] = self._buffer.push
+        # noinspection PyProtectedMember
+        socket._iterators[self._id] = self
+        # noinspection PyProtectedMember
+        self.ready: asyncio.Task = socket._acquire_domain(method)
 
     def __aiter__(self):
         return self
 
-    def _new_fut(self, result=None):
-        self._fut = asyncio.Future()
-        # noinspection PyProtectedMember
-        self._socket._iter_callbacks[self._method][self._id] = self._fut.set_result
+    async def __anext__(self):
+        if self._closed:
+            raise StopAsyncIteration
+        return await self._buffer.get()
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self._buffer.close()  # wakes a waiting consumer
+            # noinspection PyProtectedMember
+            self._socket._iterators.pop(self._id, None)
+            # noinspection PyProtectedMember
+            callbacks = self._socket._iter_callbacks
+            try:
+                del callbacks[self._method][self._id]
+                if not callbacks[self._method]:
+                    del callbacks[self._method]
+            except KeyError:
+                pass
+            # noinspection PyProtectedMember
+            self._socket._release_domain(self._method)
+
+    async def aclose(self):
+        self.close()
+
+    async def __aenter__(self):
+        return self
 
-    async def __anext__(self) -> asyncio.Future:
-        self._new_fut()
-        return await self._fut
+    async def __aexit__(self, *args, **kwargs):
+        self.close()
+
+    def __del__(self):
+        self.close()
+
+    @property
+    def dropped(self) -> int:
+        return self._buffer.dropped
 
     @property
     def id(self):
         return self._id
+
+
+class CDPEventStream(CDPEventIter):
+    """
+    yields lists of events: as soon as at least one is available, after waiting up to ``max_delay``
+    seconds for ``max_batch`` events
+    """
+
+    def __init__(self, method, socket: SingleCDPSocket, max_batch: int = 100, max_delay: float = 0,
+                 predicate: callable = None, maxsize: int = 10_000, overflow: str = DROP_OLDEST):
+        super().__init__(method, socket, maxsize=maxsize, overflow=overflow, predicate=predicate)
+        self._max_batch = max_batch
+        self._max_delay = max_delay
+
+    async def __anext__(self) -> typing.List[dict]:
+        if self._closed:
+            raise StopAsyncIteration
+        return await self._buffer.get_batch(self._max_batch, self._max_delay)
@@ -0,0 +1,194 @@
+import asyncio
+import collections
+import hashlib
+import json
+import typing
+
+from cdp_socket.exceptions import CDPError
+from cdp_socket.socket import SingleCDPSocket, safe_wrap_fut
+
+OBJECT_GROUP = "cdp-socket-scripts"
+# calls the installed function, the handle is its objectId
+_CALL = "function(){return this()}"
+# handles which don't exist (anymore) in the page
+_GONE = ("Could not find object with given id", "Cannot find context with specified id")
+
+
+class ScriptCache:
+    """
+    ``Runtime.evaluate`` for hot scripts: each distinct expression gets installed once per execution context
+    as a function (wrapping an indirect ``eval`` of the source, V8 caches its compilation),
+    later calls only send ``Runtime.callFunctionOn`` with the function's ``objectId``.
+
+    ``Runtime.compileScript`` + ``Runtime.runScript`` isn't used, V8 forgets a persisted script once it ran.
+
+    The ``Runtime`` domain gets enabled before the first call to track the default execution context,
+    with a reference if the target has ``auto_enable``. Installed functions are dropped on
+    ``Runtime.executionContextDestroyed`` and ``Runtime.executionContextsCleared``,
+    a function which is gone anyways gets installed again.
+
+    .. code-block:: python
+
+        scripts = ScriptCache(sock)
+        res = await scripts.evaluate("document.querySelectorAll('a').length")
+        print(res["result"]["value"])
+    """
+
+    def __init__(self, target: SingleCDPSocket, maxsize: int = 256):
+        """
+        :param target: ``SingleCDPSocket`` or ``CDPSession`` of a page
+        :param maxsize: installed functions kept, least recently used ones get released
+        """
+        self._target = target
+        self._maxsize = maxsize
+        # (context id, source hash): objectId, None as context id if the default context isn't known
+        self._scripts: typing.OrderedDict[typing.Tuple[typing.Optional[int], bytes], str] = collections.OrderedDict()
+        self._compiling: typing.Dict[typing.Tuple[typing.Optional[int], bytes], asyncio.Future] = {}
+        self._enabling: asyncio.Future = None
+        self._runtime_enabled = False
+        self._runtime_ref = False
+        self._default_context: typing.Optional[int] = None
+        self.compiled = 0
+        self.runs = 0
+        self.invalidations = 0
+        target.add_listener("Runtime.executionContextCreated", self._on_context_created)
+        target.add_listener("Runtime.executionContextDestroyed", self._on_context_destroyed)
+        target.add_listener("Runtime.executionContextsCleared", self._on_contexts_cleared)
+
+    async def evaluate(self, expression: str, context_id: int = None, return_by_value: bool = True,
+                       await_promise: bool = False, timeout: float = 2, **params) -> dict:
+        """
+        like ``Runtime.evaluate``, returns ``{"result": ..., "exceptionDetails": ...}``
+
+        :param context_id: ``executionContextId``, the page's default context by default
+        :param params: further ``Runtime.callFunctionOn`` parameters, e.g. ``objectGroup``
+        """
+        if not self._runtime_enabled:
+            await self._enable_runtime(timeout)
+        digest = hashlib.blake2b(expression.encode(), digest_size=16).digest()
+        params["functionDeclaration"] = _CALL
+        params["returnByValue"] = return_by_value
+        params["awaitPromise"] = await_promise
+        for attempt in range(2):
+            key = (self._default_context if context_id is None else context_id, digest)
+            object_id = self._scripts.get(key)
+            if object_id is None:
+                object_id = await self._compile(key, expression, context_id, timeout)
+                if isinstance(object_id, dict):
+                    return object_id  # couldn't be installed
+            else:
+                self._scripts.move_to_end(key)
+            params["objectId"] = object_id
+            try:
+                res = await self._target.exec("Runtime.callFunctionOn", params, timeout=timeout)
+            except CDPError as e:
+                if attempt or e.code != -32000 or e.message not in _GONE:
+                    raise
+                # the context got replaced
+                if self._scripts.get(key) == object_id:
+                    del self._scripts[key]
+                    self.invalidations += 1
+                continue
+            self.runs += 1
+            return res
+
+    async def _enable_runtime(self, timeout: float):
+        if self._enabling is None:
+            enabling = None
+            if not self._runtime_ref:
+                # noinspection PyProtectedMember
+                enabling = self._target._acquire_domain("Runtime.")  # reference counted with auto_enable
+                self._runtime_ref = enabling is not None
+            if enabling is None:
+                enabling = asyncio.ensure_future(self._target.exec("Runtime.enable", timeout=timeout))
+            self._enabling = enabling
+        try:
+            await asyncio.shield(self._enabling)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self._enabling = None  # try again on the next call
+            raise
+        self._runtime_enabled = True
+
+    async def _compile(self, key: tuple, expression: str, context_id: typing.Optional[int],
+                       timeout: float) -> str or dict:
+        compiling = self._compiling.get(key)
+        if compiling is not None:
+            return await asyncio.shield(compiling)
+        # noinspection PyProtectedMember
+        compiling = self._compiling[key] = self._target._loop.create_future()
+        try:
+            params = {"expression": f"(function(){{return (0, eval)({json.dumps(expression)})}})",
+                      "objectGroup": OBJECT_GROUP, "silent": True}
+            if context_id is not None:
+                params["contextId"] = context_id
+            res = await self._target.exec("Runtime.evaluate", params, timeout=timeout)
+            if "exceptionDetails" in res or "objectId" not in res["result"]:
+                result = res
+            else:
+                result = res["result"]["objectId"]
+                self._scripts[key] = result
+                self.compiled += 1
+                if len(self._scripts) > self._maxsize:
+                    self._release(self._scripts.popitem(last=False)[1])
+            compiling.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            compiling.cancel()
+            raise
+        except Exception as e:
+            compiling.set_exception(e)
+            compiling.exception()  # retrieved
+            raise
+        finally:
+            del self._compiling[key]
+
+    def _release(self, object_id: str):
+        if not self._target.closed:
+            safe_wrap_fut(self._send_release("Runtime.releaseObject", {"objectId": object_id}))
+
+    async def _send_release(self, method: str, params: dict):
+        try:
+            await self._target.exec(method, params)
+        except Exception:
+            pass  # gone with its context anyways
+
+    def _on_context_created(self, params: dict):
+        context = params["context"]
+        if self._default_context is None and (context.get("auxData") or {}).get("isDefault"):
+            # reported first on Runtime.enable and after each navigation of the main frame
+            self._default_context = context["id"]
+
+    def _on_context_destroyed(self, params: dict):
+        context_id = params.get("executionContextId")
+        if context_id == self._default_context:
+            self._default_context = None
+        for key in [key for key in self._scripts if key[0] == context_id]:
+            del self._scripts[key]
+        self.invalidations += 1
+
+    # noinspection PyUnusedLocal
+    def _on_contexts_cleared(self, params: dict):
+        self._default_context = None
+        self._scripts.clear()
+        self.invalidations += 1
+
+    def __len__(self):
+        return len(self._scripts)
+
+    def stats(self) -> dict:
+        return {"scripts": len(self._scripts), "compiled": self.compiled, "runs": self.runs,
+                "invalidations": self.invalidations}
+
+    def close(self):
+        if self.compiled and not self._target.closed:
+            safe_wrap_fut(self._send_release("Runtime.releaseObjectGroup", {"objectGroup": OBJECT_GROUP}))
+        self._scripts.clear()
+        if self._runtime_ref:
+            # noinspection PyProtectedMember
+            self._target._release_domain("Runtime.")
+            self._runtime_ref = False
+        self._target.remove_listener("Runtime.executionContextCreated", self._on_context_created)
+        self._target.remove_listener("Runtime.executionContextDestroyed", self._on_context_destroyed)
+        self._target.remove_listener("Runtime.executionContextsCleared", self._on_contexts_cleared)
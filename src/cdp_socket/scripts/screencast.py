@@ -0,0 +1,198 @@
+import asyncio
+import binascii
+import collections
+import concurrent.futures
+import inspect
+import time
+import typing
+
+from cdp_socket.socket import SingleCDPSocket, safe_wrap_fut
+
+IMMEDIATE = "immediate"
+AFTER_SINK = "after_sink"
+
+
+class ScreencastFrame:
+    __slots__ = ("data", "metadata", "session_id", "received_at")
+
+    def __init__(self, data: bytes or str, metadata: dict, session_id: int, received_at: float):
+        self.data = data
+        self.metadata = metadata
+        self.session_id = session_id
+        self.received_at = received_at
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(session_id={self.session_id}, size={len(self.data)})"
+
+
+class Screencast:
+    """
+    ``Page.startScreencast`` consumer.
+
+    ``Page.screencastFrame`` events are acknowledged right away (``ack="immediate"``) or once the sink
+    handled the frame (``ack="after_sink"``, Chrome then only sends as fast as the sink consumes),
+    optionally at most ``max_fps`` times per second.
+    Frames are base64-decoded in a thread pool and queued for ``sink``, the oldest queued frames
+    get dropped once more than ``max_pending`` are waiting.
+
+    .. code-block:: python
+
+        async with Screencast(sock, sink, params={"format": "jpeg", "quality": 80}) as cast:
+            await asyncio.sleep(10)
+        print(cast.stats())
+    """
+
+    def __init__(self, target: SingleCDPSocket, sink: typing.Callable[[ScreencastFrame], typing.Any],
+                 params: dict = None, ack: str = IMMEDIATE, max_fps: float = None, max_pending: int = 2,
+                 decode: bool = True, executor: concurrent.futures.Executor = None, timeout: float = 2):
+        """
+        :param target: ``SingleCDPSocket`` or ``CDPSession`` of a page
+        :param sink: called with each ``ScreencastFrame``, may be async
+        :param params: ``Page.startScreencast`` parameters
+        :param ack: ``immediate`` or ``after_sink``
+        :param max_fps: delay acks to cap the frame rate
+        :param max_pending: frames queued for the sink before the oldest get dropped
+        :param decode: base64-decode ``frame.data`` to bytes
+        :param executor: for decoding, defaults to the loop's default executor
+        """
+        if ack not in (IMMEDIATE, AFTER_SINK):
+            raise ValueError(f"ack must be {IMMEDIATE!r} or {AFTER_SINK!r}, got {ack!r}")
+        if max_pending < 1:
+            raise ValueError("max_pending must be >= 1")
+        self._target = target
+        self._sink = sink
+        self._params = params
+        self._ack = ack
+        self._min_interval = 1 / max_fps if max_fps else 0
+        self._max_pending = max_pending
+        self._decode = decode
+        self._executor = executor
+        self._timeout = timeout
+        # noinspection PyProtectedMember
+        self._loop: asyncio.AbstractEventLoop = target._loop
+        self._queue: typing.Deque[ScreencastFrame] = collections.deque()
+        self._not_empty: asyncio.Future = None
+        self._worker: asyncio.Task = None
+        self._last_ack = 0
+        # acks delayed for max_fps, they fire in order
+        self._delayed_acks: typing.Deque[asyncio.TimerHandle] = collections.deque()
+        self._started_at: float = None
+        self._stopped_at: float = None
+        self.received = 0
+        self.processed = 0
+        self.dropped = 0
+        self.acked = 0
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *args, **kwargs):
+        await self.stop()
+
+    async def start(self):
+        self._started_at = time.perf_counter()
+        self._stopped_at = None
+        self._target.add_listener("Page.screencastFrame", self._on_frame)
+        self._worker = self._loop.create_task(self._work())
+        await self._target.exec("Page.startScreencast", self._params, timeout=self._timeout)
+        return self
+
+    async def stop(self):
+        try:
+            if not self._target.closed:
+                await self._target.exec("Page.stopScreencast", timeout=self._timeout)
+        finally:
+            try:
+                self._target.remove_listener("Page.screencastFrame", self._on_frame)
+            except ValueError:
+                pass
+            if self._worker is not None:
+                self._worker.cancel()
+                self._worker = None
+            self._queue.clear()
+            for handle in self._delayed_acks:
+                handle.cancel()
+            self._delayed_acks.clear()
+            self._stopped_at = time.perf_counter()
+
+    def _on_frame(self, params: dict):
+        self.received += 1
+        frame = ScreencastFrame(params["data"], params.get("metadata"), params["sessionId"], time.perf_counter())
+        if self._ack == IMMEDIATE:
+            self._schedule_ack(frame.session_id)
+        queue = self._queue
+        if len(queue) >= self._max_pending:
+            stale = queue.popleft()
+            self.dropped += 1
+            if self._ack == AFTER_SINK:
+                self._schedule_ack(stale.session_id)
+        queue.append(frame)
+        waiter = self._not_empty
+        if waiter is not None and not waiter.done():
+            waiter.set_result(None)
+
+    def _schedule_ack(self, session_id: int):
+        now = self._loop.time()
+        delay = self._last_ack + self._min_interval - now
+        if delay > 0:
+            self._last_ack += self._min_interval
+            self._delayed_acks.append(self._loop.call_later(delay, self._delayed_ack, session_id))
+        else:
+            self._last_ack = now
+            self._ack_now(session_id)
+
+    def _delayed_ack(self, session_id: int):
+        self._delayed_acks.popleft()
+        self._ack_now(session_id)
+
+    def _ack_now(self, session_id: int):
+        safe_wrap_fut(self._send_ack(session_id))
+
+    async def _send_ack(self, session_id: int):
+        from cdp_socket import EXC_HANDLER
+        if self._target.closed:
+            return
+        try:
+            await self._target.exec("Page.screencastFrameAck", {"sessionId": session_id}, timeout=self._timeout)
+            self.acked += 1
+        except Exception as e:
+            EXC_HANDLER(e)
+
+    async def _work(self):
+        from cdp_socket import EXC_HANDLER
+        queue = self._queue
+        while True:
+            if not queue:
+                self._not_empty = self._loop.create_future()
+                await self._not_empty
+                self._not_empty = None
+                continue
+            frame = queue.popleft()
+            try:
+                if self._decode:
+                    frame.data = await self._loop.run_in_executor(self._executor, binascii.a2b_base64, frame.data)
+                res = self._sink(frame)
+                if inspect.isawaitable(res):
+                    await res
+                self.processed += 1
+            except Exception as e:
+                EXC_HANDLER(e)
+            if self._ack == AFTER_SINK:
+                self._schedule_ack(frame.session_id)
+
+    @property
+    def fps(self) -> float:
+        """frames handed to the sink per second"""
+        if self._started_at is None:
+            return 0.
+        elapsed = (self._stopped_at or time.perf_counter()) - self._started_at
+        return self.processed / elapsed if elapsed > 0 else 0.
+
+    @property
+    def drop_rate(self) -> float:
+        return self.dropped / self.received if self.received else 0.
+
+    def stats(self) -> dict:
+        return {"received": self.received, "processed": self.processed, "dropped": self.dropped,
+                "acked": self.acked, "pending": len(self._queue), "fps": round(self.fps, 2),
+                "drop_rate": round(self.drop_rate, 4)}
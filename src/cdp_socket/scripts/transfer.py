@@ -0,0 +1,143 @@
+import asyncio
+import binascii
+import collections
+import inspect
+import os
+import typing
+
+from cdp_socket.socket import SingleCDPSocket
+
+Sink = typing.Union[str, os.PathLike, typing.BinaryIO]
+
+
+class Base64Writer:
+    """decodes base64 chunks of any length into ``sink``, keeping at most 3 undecoded characters"""
+
+    def __init__(self, sink: typing.BinaryIO):
+        self._sink = sink
+        self._rest = b""
+        self.written = 0
+
+    async def write(self, data: str or bytes):
+        if isinstance(data, str):
+            data = data.encode("ascii")
+        if self._rest:
+            data = self._rest + data
+        cut = len(data) - len(data) % 4
+        self._rest = data[cut:]
+        if cut:
+            await self.write_raw(binascii.a2b_base64(data[:cut]))
+
+    async def write_raw(self, data: bytes):
+        res = self._sink.write(data)
+        if inspect.isawaitable(res):
+            await res
+        self.written += len(data)
+
+    async def close(self):
+        if self._rest:
+            raise ValueError(f"incomplete base64 data, {len(self._rest)} characters left")
+
+
+class _open_sink:
+    def __init__(self, sink: Sink):
+        self._sink = sink
+        self._file = None
+
+    def __enter__(self) -> typing.BinaryIO:
+        if isinstance(self._sink, (str, os.PathLike)):
+            self._file = open(self._sink, "wb")
+            return self._file
+        return self._sink
+
+    def __exit__(self, *args):
+        if self._file is not None:
+            self._file.close()
+
+
+async def read_stream(target: SingleCDPSocket, handle: str, sink: Sink, chunk_size: int = 2 ** 18,
+                      read_ahead: int = 2, timeout: float = 10, close: bool = True) -> int:
+    """
+    reads a stream (``IO.StreamHandle``) with ``IO.read`` into ``sink``, decoding base64 chunk by chunk.
+    Peak memory is about ``chunk_size * read_ahead``, independent of the stream's size.
+
+    :param target: ``SingleCDPSocket`` or ``CDPSession`` the stream belongs to
+    :param sink: file path, or an object with a ``write(bytes)`` method (which may be async)
+    :param chunk_size: maximum bytes per ``IO.read``
+    :param read_ahead: ``IO.read`` commands kept in flight
+    :param timeout: timeout per ``IO.read``
+    :param close: ``IO.close`` the stream afterwards
+    :return: bytes written
+    """
+    if read_ahead < 1:
+        raise ValueError("read_ahead must be >= 1")
+    params = {"handle": handle, "size": chunk_size}
+    reads = collections.deque()
+    failed = True
+    try:
+        with _open_sink(sink) as file:
+            writer = Base64Writer(file)
+            eof = False
+            while not eof:
+                # Chrome answers reads of the same handle in order
+                while len(reads) < read_ahead:
+                    reads.append(asyncio.ensure_future(target.exec("IO.read", params, timeout=timeout)))
+                res = await reads.popleft()
+                if res.get("base64Encoded"):
+                    await writer.write(res["data"])
+                else:
+                    await writer.write_raw(res["data"].encode())
+                eof = res.get("eof", not res["data"])
+            await writer.close()
+            failed = False
+            return writer.written
+    finally:
+        for read in reads:
+            read.cancel()
+        if reads:
+            await asyncio.wait(reads)
+        if close:
+            try:
+                await target.exec("IO.close", {"handle": handle}, timeout=timeout)
+            except Exception as e:
+                if not failed:
+                    raise
+                from cdp_socket import EXC_HANDLER
+                EXC_HANDLER(e)  # don't mask the error which ended the transfer
+
+
+async def print_to_pdf(target: SingleCDPSocket, sink: Sink, params: dict = None, chunk_size: int = 2 ** 18,
+                       read_ahead: int = 2, timeout: float = 30) -> int:
+    """
+    ``Page.printToPDF`` with ``transferMode: ReturnAsStream``, streamed into ``sink``
+
+    :param params: further ``Page.printToPDF`` parameters
+    :return: bytes written
+    """
+    params = {**(params or {}), "transferMode": "ReturnAsStream"}
+    res = await target.exec("Page.printToPDF", params, timeout=timeout)
+    return await read_stream(target, res["stream"], sink, chunk_size=chunk_size, read_ahead=read_ahead,
+                             timeout=timeout)
+
+
+async def capture_screenshot(target: SingleCDPSocket, sink: Sink, params: dict = None, chunk_size: int = 2 ** 18,
+                             timeout: float = 30) -> int:
+    """
+    ``Page.captureScreenshot``, decoded into ``sink`` in chunks.
+
+    Chrome has no stream mode for screenshots, so the base64 response still arrives in one frame
+    (``max_size`` of the socket has to fit it), only the decoded copy is kept out of memory.
+
+    :return: bytes written
+    """
+    res = await target.exec("Page.captureScreenshot", params, timeout=timeout)
+    data: str = res.pop("data")
+    del res
+    step = max(chunk_size // 3, 1) * 4
+    with _open_sink(sink) as file:
+        writer = Base64Writer(file)
+        for start in range(0, len(data), step):
+            await writer.write(data[start:start + step])
+        await writer.close()
+        return writer.written
+
@@ -0,0 +1,73 @@
+import typing
+
+from cdp_socket.socket import CDPEventTarget, SingleCDPSocket
+
+
+class CDPSession(CDPEventTarget):
+    """
+    a flat-mode target session, multiplexed over a ``SingleCDPSocket`` (usually the browser-level connection).
+    Has the same ``exec``/``add_listener``/``wait_for`` API as ``SingleCDPSocket``.
+    """
+
+    def __init__(self, socket: SingleCDPSocket, session_id: str, target_id: str = None):
+        # noinspection PyProtectedMember
+        super().__init__(socket._loop, socket._listener_maxsize, socket._listener_policy, socket._auto_enable,
+                         socket._auto_disable_delay)
+        # noinspection PyProtectedMember
+        self._metrics = socket._metrics
+        self._socket = socket
+        self._session_id = session_id
+        self._target_id = target_id
+        self._detached = False
+
+    async def send(self, method: str, params: dict = None):
+        return await self._socket.send(method, params, session_id=self._session_id)
+
+    async def exec(self, method: str, params: dict = None, timeout: float = 2, priority: str = None):
+        self._observe_domain(method)
+        return await self._socket.exec(method, params, timeout=timeout, session_id=self._session_id,
+                                       priority=priority)
+
+    async def exec_many(self, commands: typing.Iterable[typing.Tuple[str, dict] or typing.Tuple[str]],
+                        timeout: float = 2) -> list:
+        return await self._socket.exec_many(commands, timeout=timeout, session_id=self._session_id)
+
+    def as_completed(self, commands: typing.Iterable[typing.Tuple[str, dict] or typing.Tuple[str]],
+                     timeout: float = 2) -> typing.AsyncIterator[typing.Tuple[int, typing.Any]]:
+        return self._socket.as_completed(commands, timeout=timeout, session_id=self._session_id)
+
+    async def _on_detached(self):
+        self._detached = True
+        self._close_listeners()
+        for callback in self.on_closed:
+            await self._handle_callback(callback, code=1000, reason="detached")
+
+    async def detach(self, timeout: float = 2):
+        if not self._detached:
+            await self._socket.exec("Target.detachFromTarget", {"sessionId": self._session_id}, timeout=timeout)
+
+    async def close(self, code: int = 1000, reason: str = ''):
+        await self.detach()
+
+    @property
+    def closed(self):
+        return self._detached or self._socket.closed
+
+    @property
+    def socket(self) -> SingleCDPSocket:
+        return self._socket
+
+    @property
+    def session_id(self):
+        return self._session_id
+
+    @property
+    def target_id(self):
+        return self._target_id
+
+    @property
+    def id(self):
+        return self._target_id
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(session_id={self._session_id!r}, target_id={self._target_id!r})"
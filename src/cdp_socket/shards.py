@@ -0,0 +1,437 @@
+import asyncio
+import inspect
+import multiprocessing
+import os
+import threading
+import typing
+from multiprocessing.connection import Connection
+
+import orjson
+
+from cdp_socket.exceptions import CDPError, SocketExcitedError
+from cdp_socket.utils.discovery import Discovery
+
+# ipc message kinds, messages are orjson arrays, batched per event-loop iteration
+READY, OK, CDP_ERROR, TIMEOUT, ERROR, EVENT = range(6)
+EXEC, LISTEN, UNLISTEN, CLOSE = range(4)
+
+
+def select(obj, paths: typing.Union[str, typing.Sequence[str]] = None):
+    """
+    pick fields out of a result: ``"result.value"``, or a list of paths for a list of values.
+    Missing fields are None.
+    """
+    if paths is None:
+        return obj
+    if isinstance(paths, str):
+        return _get_path(obj, paths)
+    return [_get_path(obj, path) for path in paths]
+
+
+def _get_path(obj, path: str):
+    for key in path.split("."):
+        try:
+            obj = obj[int(key)] if isinstance(obj, list) else obj[key]
+        except (KeyError, IndexError, ValueError, TypeError):
+            return None
+    return obj
+
+
+class _Channel:
+    """
+    one end of a pipe: batches outgoing messages, reads incoming ones in a thread.
+    Messages which can't be serialised are passed to ``on_unsendable(message, exception)`` instead.
+    """
+
+    def __init__(self, conn: Connection, loop: asyncio.AbstractEventLoop, on_messages: callable,
+                 on_eof: callable = None, on_unsendable: callable = None):
+        self._conn = conn
+        self._loop = loop
+        self._on_messages = on_messages
+        self._on_eof = on_eof
+        self._on_unsendable = on_unsendable
+        self._out = []
+        self._closed = False
+        self.sent = 0
+        self.received = 0
+        self._thread = threading.Thread(target=self._read, daemon=True)
+        self._thread.start()
+
+    def send(self, message: list):
+        if self._closed:
+            return
+        if not self._out:
+            self._loop.call_soon(self._flush)
+        self._out.append(message)
+
+    def _flush(self):
+        batch, self._out = self._out, []
+        if self._closed or not batch:
+            return
+        try:
+            data = orjson.dumps(batch)
+        except TypeError:
+            # e.g. an int wider than 64 bits, keep the others
+            batch = self._sendable(batch)
+            if not batch:
+                return
+            data = orjson.dumps(batch)
+        try:
+            self._conn.send_bytes(data)
+            self.sent += len(batch)
+        except (OSError, EOFError):
+            self._closed = True
+
+    def _sendable(self, batch: list) -> list:
+        from cdp_socket import EXC_HANDLER
+        sendable = []
+        for message in batch:
+            try:
+                orjson.dumps(message)
+            except TypeError as e:
+                if self._on_unsendable is None:
+                    EXC_HANDLER(e)
+                else:
+                    self._on_unsendable(message, e)
+            else:
+                sendable.append(message)
+        return sendable
+
+    def _read(self):
+        while True:
+            try:
+                data = self._conn.recv_bytes()
+            except (OSError, EOFError):
+                break
+            batch = orjson.loads(data)
+            self.received += len(batch)
+            self._loop.call_soon_threadsafe(self._on_messages, batch)
+        if self._on_eof is not None and not self._loop.is_closed():
+            try:
+                self._loop.call_soon_threadsafe(self._on_eof)
+            except RuntimeError:  # loop closed meanwhile
+                pass
+
+    def close(self):
+        if not self._closed:
+            self._flush()
+            self._closed = True
+            self._conn.close()
+
+
+class _Shard:
+    """runs in the worker process: owns the sockets of its targets"""
+
+    def __init__(self, conn: Connection, port: int, host: str, timeout: float, max_size: int):
+        self._conn = conn
+        self._port = port
+        self._host = host
+        self._timeout = timeout
+        self._max_size = max_size
+        self._base = None
+        self._opening: typing.Dict[str, asyncio.Future] = {}
+        self._listeners: typing.Dict[int, tuple] = {}
+        self._done: asyncio.Future = None
+        self._channel: _Channel = None
+
+    async def run(self):
+        from cdp_socket.socket import CDPSocket
+        loop = asyncio.get_running_loop()
+        self._done = loop.create_future()
+        self._channel = _Channel(self._conn, loop, self._on_messages, on_eof=self._close,
+                                 on_unsendable=self._on_unsendable)
+        try:
+            self._base = await CDPSocket(self._port, self._host, timeout=self._timeout, max_size=self._max_size)
+        except Exception as e:
+            self._channel.send([0, ERROR, f"{e.__class__.__name__}: {e}"])
+            self._channel.close()
+            return
+        self._channel.send([0, READY, os.getpid()])
+        await self._done
+        await self._base.close(reason="")
+        self._channel.close()
+
+    def _close(self):
+        if not self._done.done():
+            self._done.set_result(None)
+
+    def _on_unsendable(self, message: list, exc: TypeError):
+        from cdp_socket import EXC_HANDLER
+        if message[0]:
+            self._channel.send([message[0], ERROR, f"{exc.__class__.__name__}: {exc}"])
+        else:
+            EXC_HANDLER(exc)  # an event
+
+    def _on_messages(self, batch: list):
+        for message in batch:
+            op = message[1]
+            if op == EXEC:
+                asyncio.ensure_future(self._exec(*message))
+            elif op == LISTEN:
+                asyncio.ensure_future(self._listen(*message))
+            elif op == UNLISTEN:
+                self._unlisten(message[2])
+            elif op == CLOSE:
+                self._close()
+
+    async def _socket(self, target_id: str):
+        sock = self._base.sockets.get(target_id)
+        if sock is not None and not sock.closed:
+            return sock
+        # one handshake per target, concurrent calls wait for it
+        opening = self._opening.get(target_id)
+        if opening is None:
+            opening = asyncio.ensure_future(self._base.get_socket(sock_id=target_id, timeout=self._timeout))
+            self._opening[target_id] = opening
+            opening.add_done_callback(lambda _: self._opening.pop(target_id, None))
+        return await asyncio.shield(opening)
+
+    async def _exec(self, req_id: int, op, target_id: str, method: str, params: dict, timeout: float, paths):
+        try:
+            sock = await self._socket(target_id)
+            res = await sock.exec(method, params, timeout=timeout)
+            self._channel.send([req_id, OK, select(res, paths)])
+        except CDPError as e:
+            self._channel.send([req_id, CDP_ERROR, {"code": e.code, "message": e.message}])
+        except asyncio.TimeoutError as e:
+            self._channel.send([req_id, TIMEOUT, str(e)])
+        except Exception as e:
+            self._channel.send([req_id, ERROR, f"{e.__class__.__name__}: {e}"])
+
+    async def _listen(self, req_id: int, op, listener_id: int, target_id: str, method: str, paths):
+        channel = self._channel
+
+        def forward(params):
+            channel.send([0, EVENT, listener_id, select(params, paths)])
+
+        try:
+            sock = await self._socket(target_id)
+        except Exception as e:
+            self._channel.send([req_id, ERROR, f"{e.__class__.__name__}: {e}"])
+            return
+        sock.add_listener(method, forward)
+        self._listeners[listener_id] = (sock, method, forward)
+        self._channel.send([req_id, OK, None])
+
+    def _unlisten(self, listener_id: int):
+        listener = self._listeners.pop(listener_id, None)
+        if listener is not None:
+            sock, method, forward = listener
+            try:
+                sock.remove_listener(method, forward)
+            except ValueError:
+                pass
+
+
+def _shard_main(conn: Connection, port: int, host: str, timeout: float, max_size: int):
+    asyncio.run(_Shard(conn, port, host, timeout, max_size).run())
+
+
+class _ShardHandle:
+    """the front-end's view of one worker process"""
+
+    def __init__(self, idx: int, process: multiprocessing.Process, conn: Connection, front: "ShardedCDPSocket"):
+        self.idx = idx
+        self.process = process
+        self.pid: int = None
+        self.targets = 0
+        self.ready: asyncio.Future = front._loop.create_future()
+        self.pending: typing.Dict[int, asyncio.Future] = {}
+        self.channel = _Channel(conn, front._loop, lambda batch: front._on_messages(self, batch),
+                                on_eof=lambda: front._on_eof(self),
+                                on_unsendable=lambda message, exc: front._on_unsendable(self, message, exc))
+
+
+class ShardedCDPSocket:
+    """
+    spreads the targets of one browser over ``shards`` worker processes, each with its own event loop
+    and ``CDPSocket``, so receiving, decoding and callbacks of different targets run in parallel.
+
+    Calls are routed to the shard owning the target over a pipe, with messages batched per
+    event-loop iteration. ``fields`` picks the fields of results and events to send back,
+    so large results don't need to cross the process boundary.
+
+    .. code-block:: python
+
+        async with ShardedCDPSocket(port, shards=4) as sharded:
+            for target in await sharded.targets:
+                title = await sharded.exec(target["id"], "Runtime.evaluate", {"expression": "document.title"},
+                                           fields="result.value")
+    """
+
+    def __init__(self, port: int, host: str = "127.0.0.1", shards: int = None, timeout: float = 30,
+                 max_size: int = 2 ** 20, mp_context: str = "spawn"):
+        """
+        :param shards: worker processes, defaults to ``os.cpu_count()``
+        :param mp_context: multiprocessing start method
+        """
+        self._port = port
+        self._host = host
+        self._n_shards = shards or os.cpu_count() or 1
+        self._timeout = timeout
+        self._max_size = max_size
+        self._ctx = multiprocessing.get_context(mp_context)
+        self._loop: asyncio.AbstractEventLoop = None
+        self._shards: typing.List[_ShardHandle] = []
+        self._owners: typing.Dict[str, _ShardHandle] = {}
+        self._listeners: typing.Dict[int, typing.Tuple[_ShardHandle, callable]] = {}
+        self._req_count = 1
+        self._discovery = Discovery(f"{host}:{port}")
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *args, **kwargs):
+        await self.close()
+
+    def __await__(self):
+        return self.start().__await__()
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        # fail fast if the browser isn't reachable
+        await self._discovery.targets(timeout=self._timeout)
+        for idx in range(self._n_shards):
+            parent_conn, child_conn = self._ctx.Pipe()
+            process = self._ctx.Process(target=_shard_main, daemon=True, name=f"cdp-shard-{idx}",
+                                        args=(child_conn, self._port, self._host, self._timeout, self._max_size))
+            process.start()
+            child_conn.close()
+            self._shards.append(_ShardHandle(idx, process, parent_conn, self))
+        try:
+            await asyncio.wait_for(asyncio.gather(*(shard.ready for shard in self._shards)), self._timeout)
+        except BaseException:
+            await self.close()
+            raise
+        return self
+
+    def _on_messages(self, shard: _ShardHandle, batch: list):
+        from cdp_socket import EXC_HANDLER
+        from cdp_socket.socket import safe_wrap_fut
+        for message in batch:
+            req_id, kind, value = message[0], message[1], message[-1]
+            if kind == EVENT:
+                listener = self._listeners.get(message[2])
+                if listener is not None:
+                    try:
+                        res = listener[1](value)
+                        if inspect.isawaitable(res):
+                            safe_wrap_fut(res)
+                    except Exception as e:
+                        EXC_HANDLER(e)
+                continue
+            if req_id == 0:
+                if kind == READY:
+                    shard.pid = value
+                    shard.ready.set_result(shard)
+                elif not shard.ready.done():
+                    shard.ready.set_exception(SocketExcitedError(f"shard {shard.idx} failed to start: {value}"))
+                else:
+                    EXC_HANDLER(SocketExcitedError(value))
+                continue
+            fut = shard.pending.pop(req_id, None)
+            if fut is None or fut.done():
+                continue
+            if kind == OK:
+                fut.set_result(value)
+            elif kind == CDP_ERROR:
+                fut.set_exception(CDPError(value))
+            elif kind == TIMEOUT:
+                fut.set_exception(asyncio.TimeoutError(value))
+            else:
+                fut.set_exception(SocketExcitedError(value))
+
+    @staticmethod
+    def _on_unsendable(shard: _ShardHandle, message: list, exc: TypeError):
+        fut = shard.pending.pop(message[0], None)
+        if fut is not None and not fut.done():
+            fut.set_exception(exc)
+
+    def _on_eof(self, shard: _ShardHandle):
+        exc = SocketExcitedError(f"shard {shard.idx} exited")
+        if not shard.ready.done():
+            shard.ready.set_exception(exc)
+        pending, shard.pending = shard.pending, {}
+        for fut in pending.values():
+            if not fut.done():
+                fut.set_exception(exc)
+
+    def shard_for(self, target_id: str) -> int:
+        """index of the shard owning ``target_id``, new targets go to the shard with the fewest targets"""
+        return self._owner(target_id).idx
+
+    def _owner(self, target_id: str) -> _ShardHandle:
+        shard = self._owners.get(target_id)
+        if shard is None:
+            shard = min(self._shards, key=lambda s: s.targets)
+            shard.targets += 1
+            self._owners[target_id] = shard
+        return shard
+
+    def _request(self, shard: _ShardHandle, message: list) -> asyncio.Future:
+        req_id = self._req_count
+        self._req_count += 1
+        fut = self._loop.create_future()
+        shard.pending[req_id] = fut
+        shard.channel.send([req_id, *message])
+        return fut
+
+    async def exec(self, target_id: str, method: str, params: dict = None, timeout: float = 2,
+                   fields: typing.Union[str, typing.Sequence[str]] = None):
+        """
+        :param fields: a path like ``"result.value"`` (or a list of paths) to only get these fields back, see ``select``
+        :raises TypeError: if ``params`` can't be serialised
+        """
+        shard = self._owner(target_id)
+        fut = self._request(shard, [EXEC, target_id, method, params, timeout, fields])
+        # the shard enforces the timeout, this one only guards against a stuck shard
+        return await asyncio.wait_for(fut, None if timeout is None else timeout + self._timeout)
+
+    async def add_listener(self, target_id: str, method: str, callback: callable,
+                           fields: typing.Union[str, typing.Sequence[str]] = None) -> int:
+        """
+        :param fields: only send these fields of the event params to ``callback``
+        :return: listener id for ``remove_listener``
+        """
+        shard = self._owner(target_id)
+        listener_id = self._req_count
+        self._listeners[listener_id] = (shard, callback)
+        try:
+            await asyncio.wait_for(self._request(shard, [LISTEN, listener_id, target_id, method, fields]),
+                                   self._timeout)
+        except BaseException:
+            del self._listeners[listener_id]
+            raise
+        return listener_id
+
+    def remove_listener(self, listener_id: int):
+        shard, _ = self._listeners.pop(listener_id)
+        shard.channel.send([0, UNLISTEN, listener_id])
+
+    @property
+    async def targets(self):
+        return await self._discovery.targets(timeout=2)
+
+    @property
+    def shards(self) -> int:
+        return self._n_shards
+
+    def stats(self) -> typing.List[dict]:
+        return [{"pid": shard.pid, "alive": shard.process.is_alive(), "targets": shard.targets,
+                 "pending": len(shard.pending), "sent": shard.channel.sent, "received": shard.channel.received}
+                for shard in self._shards]
+
+    async def close(self, timeout: float = 5):
+        for shard in self._shards:
+            shard.channel.send([0, CLOSE])
+        await asyncio.sleep(0)  # flush
+        loop = asyncio.get_running_loop()
+        for shard in self._shards:
+            await loop.run_in_executor(None, shard.process.join, timeout)
+            if shard.process.is_alive():
+                shard.process.terminate()
+            shard.channel.close()
+        self._shards.clear()
+        self._owners.clear()
+        self._listeners.clear()
+        await self._discovery.close()
@@ -1,15 +1,28 @@
 import asyncio
-import sys
-
-import orjson
 from collections import defaultdict
+import functools
 import websockets
 import inspect
+import time
 import typing
-import json
+import weakref
 
 from cdp_socket.exceptions import CDPError, SocketExcitedError
-from cdp_socket.utils.conn import get_websock_url, get_json
+from cdp_socket.utils.discovery import Discovery, backoff
+from cdp_socket.utils.decoder import JSONDecoder
+from cdp_socket.utils.dispatcher import QueuedListener, BLOCK, DROP_OLDEST
+from cdp_socket.utils.domains import DomainRefs
+from cdp_socket.utils.encoder import FrameEncoder, FrameWriter
+from cdp_socket.utils.frames import peek_frame, peek_session_id, LazyParams
+from cdp_socket.utils.metrics import Metrics
+from cdp_socket.utils.recording import Recorder, IN, OUT
+from cdp_socket.utils.pending import PendingTable, PendingRequest
+
+if typing.TYPE_CHECKING:
+    # optional, only imported by those who pass them
+    from cdp_socket.scripts.abstract import CDPEventIter
+    from cdp_socket.utils.cache import ResponseCache
+    from cdp_socket.utils.window import InFlightWindow
 
 background_tasks = set()
 
@@ -20,24 +33,246 @@ def safe_wrap_fut(fut: typing.Awaitable):
     task.add_done_callback(background_tasks.discard)
 
 
-class SingleCDPSocket:
+def _report_exception(fut: asyncio.Future):
+    # for requests nobody awaits
+    if not fut.cancelled() and fut.exception() is not None:
+        from cdp_socket import EXC_HANDLER
+        EXC_HANDLER(fut.exception())
+
+
+class CDPEventTarget:
+    """event listeners and iterators, shared by ``SingleCDPSocket`` and ``CDPSession``"""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, listener_maxsize: int = None,
+                 listener_policy: str = DROP_OLDEST, auto_enable: bool = False, auto_disable_delay: float = 1):
+        self._events = defaultdict(lambda: [])
+        self._iter_callbacks = defaultdict(lambda: {})
+        self._iterators: "weakref.WeakValueDictionary[str, CDPEventIter]" = weakref.WeakValueDictionary()
+        self._loop = loop
+        self._listener_maxsize = listener_maxsize
+        self._listener_policy = listener_policy
+        self._auto_enable = auto_enable
+        self._auto_disable_delay = auto_disable_delay
+        self._domains: DomainRefs = None
+        self._metrics: Metrics = None
+        if auto_enable:
+            # noinspection PyUnresolvedReferences
+            self._domains = DomainRefs(self.exec, loop, delay=auto_disable_delay)
+        self.on_closed = []
+
+    def add_listener(self, method: str, callback: callable, maxsize: int = None, policy: str = None,
+                     threaded: bool = False):
+        """
+        :param maxsize: run the callback in its own worker, fed by a queue of this size
+                        (defaults to the ``listener_maxsize`` of the socket, ``None`` calls the callback inline)
+        :param policy: overflow policy of the queue, see ``cdp_socket.utils.dispatcher.QueuedListener``
+        :param threaded: run a synchronous callback in the default executor (implies a queue)
+        """
+        if maxsize is None:
+            maxsize = self._listener_maxsize
+        if maxsize is not None or policy is not None or threaded:
+            timer = None
+            if self._metrics is not None:
+                timer = functools.partial(self._metrics.callback_done, method, callback)
+            callback = QueuedListener(callback, maxsize=maxsize or 1000, policy=policy or self._listener_policy,
+                                      loop=self._loop, threaded=threaded, timer=timer)
+        self._events[method].append(callback)
+        self._acquire_domain(method)
+        return callback
+
+    def remove_listener(self, method: str, callback: callable):
+        callbacks = self._events[method]
+        for idx, _callback in enumerate(callbacks):
+            if _callback == callback:
+                del callbacks[idx]
+                if isinstance(_callback, QueuedListener):
+                    _callback.close()
+                self._release_domain(method)
+                return
+        raise ValueError(f"{callback} isn't a listener for {method}")
+
+    def listener_stats(self) -> typing.Dict[str, typing.List[dict]]:
+        """queue depth and drop counts of queued listeners"""
+        return {method: [callback.stats() for callback in callbacks if isinstance(callback, QueuedListener)]
+                for method, callbacks in self._events.items()
+                if any(isinstance(callback, QueuedListener) for callback in callbacks)}
+
+    def _close_listeners(self):
+        for _iter in list(self._iterators.values()):
+            _iter.close()
+        for callbacks in self._events.values():
+            for callback in callbacks:
+                if isinstance(callback, QueuedListener):
+                    callback.close()
+        if self._domains is not None:
+            self._domains.close()
+
+    def _acquire_domain(self, method: str) -> typing.Optional[asyncio.Task]:
+        if self._domains is not None:
+            return self._domains.acquire(method)
+
+    def _release_domain(self, method: str):
+        if self._domains is not None:
+            self._domains.release(method)
+
+    def _observe_domain(self, method: str):
+        if self._domains is not None:
+            self._domains.observe(method)
+
+    @property
+    def domains(self) -> typing.Optional[DomainRefs]:
+        """reference counts of automatically enabled domains, None without ``auto_enable``"""
+        return self._domains
+
+    def method_iterator(self, method: str, maxsize: int = None, overflow: str = "drop_oldest",
+                        predicate: callable = None):
+        """
+        iterate over events of ``method``, which get buffered from now on.
+        Call ``.close()`` (or use ``async with``) when done.
+        """
+        from cdp_socket.scripts.abstract import CDPEventIter
+        return CDPEventIter(method=method, socket=self, maxsize=maxsize, overflow=overflow, predicate=predicate)
+
+    def stream(self, method: str, max_batch: int = 100, max_delay: float = 0, predicate: callable = None,
+               maxsize: int = 10_000, overflow: str = "drop_oldest"):
+        """
+        batched event stream: ``async for batch in sock.stream(method, max_batch=..., max_delay=...)``
+
+        :param predicate: only events for which it returns true get buffered
+        :param maxsize: maximum events buffered, see ``overflow``
+        :param overflow: ``drop_oldest``, ``drop_newest``, or ``error`` to raise ``BufferOverflowError``
+        """
+        from cdp_socket.scripts.abstract import CDPEventStream
+        return CDPEventStream(method=method, socket=self, max_batch=max_batch, max_delay=max_delay,
+                              predicate=predicate, maxsize=maxsize, overflow=overflow)
+
+    async def wait_for(self, method: str, timeout=None, predicate: callable = None):
+        _iter = self.method_iterator(method, predicate=predicate)
+
+        async def wait():
+            if _iter.ready is not None:
+                await asyncio.shield(_iter.ready)
+            return await _iter.__anext__()
+
+        try:
+            return await asyncio.wait_for(wait(), timeout)
+        except StopAsyncIteration:
+            raise SocketExcitedError(f"closed while waiting for {method}")
+        finally:
+            _iter.close()
+
+    def _subscribed(self, method: str) -> bool:
+        return bool(self._events.get(method) or self._iter_callbacks.get(method))
+
+    async def _dispatch_event(self, method: str, params: dict or LazyParams):
+        metrics = self._metrics
+        if metrics is not None:
+            start = time.perf_counter()
+        callbacks: callable = self._events[method]
+        for callback in callbacks:
+            if callback.__class__ is QueuedListener:
+                if callback.policy == BLOCK:
+                    await callback.put(params)
+                else:
+                    callback.put_nowait(params)
+            elif metrics is None:
+                await self._handle_callback(callback, params)
+            else:
+                t = time.perf_counter()
+                await self._handle_callback(callback, params)
+                metrics.callback_done(method, callback, time.perf_counter() - t)
+        iter_callbacks = self._iter_callbacks.get(method)
+        if iter_callbacks:
+            from cdp_socket import EXC_HANDLER
+            for push in tuple(iter_callbacks.values()):
+                try:
+                    push(params)
+                except Exception as e:
+                    EXC_HANDLER(e)  # predicate failed
+        if metrics is not None:
+            # noinspection PyUnboundLocalVariable
+            metrics.dispatched(method, time.perf_counter() - start)
+
+    @staticmethod
+    async def _handle_callback(callback: callable, *args, **kwargs):
+        from . import EXC_HANDLER
+        if callback:
+            async def async_handle(awaitable):
+                try:
+                    await awaitable
+                except Exception as e:
+                    EXC_HANDLER(e)
+            try:
+                res = callback(*args, **kwargs)
+            except Exception as e:
+                EXC_HANDLER(e)
+                return
+            if inspect.isawaitable(res):
+                safe_wrap_fut(async_handle(res))
+            return res
+
+
+class SingleCDPSocket(CDPEventTarget):
     def __init__(self, websock_url: str, timeout: float = 10, loop: asyncio.AbstractEventLoop = None,
-                 max_size: int = 2 ** 20):
+                 max_size: int = 2 ** 20, lazy_params: bool = False, decoder: JSONDecoder = None,
+                 coalesce_writes: bool = False, listener_maxsize: int = None, listener_policy: str = DROP_OLDEST,
+                 auto_enable: bool = False, auto_disable_delay: float = 1, metrics: Metrics = None,
+                 recorder: Recorder = None, cache: "ResponseCache" = None, reconnect: bool = False,
+                 reconnect_attempts: int = 5, idempotent: typing.Iterable[str] = (), window: "InFlightWindow" = None):
+        """
+        :param lazy_params: pass event params to callbacks as ``LazyParams``, which only get decoded on access
+        :param decoder: decoder for incoming frames, defaults to inline orjson
+        :param coalesce_writes: write all frames sent within the same event-loop iteration at once
+        :param listener_maxsize: default queue size for listeners, see ``add_listener``
+        :param listener_policy: default overflow policy for queued listeners
+        :param auto_enable: enable domains (``Network.enable``, ...) while listeners or iterators for them exist
+        :param auto_disable_delay: disable a domain this many seconds after its last listener got removed
+        :param metrics: record latencies, byte counts and more into this ``Metrics`` instance
+        :param recorder: append every frame sent and received to this ``Recorder``,
+                         replay it with ``ReplayServer`` of ``tests/fake_server.py``
+        :param cache: serve idempotent commands (``Browser.getVersion``, ...) from this ``ResponseCache``
+        :param reconnect: re-open the websocket if the connection drops, re-enabling the domains enabled with ``exec``.
+                          Listeners and iterators stay registered, sessions get detached.
+        :param reconnect_attempts: give up (and fail pending requests) after this many attempts
+        :param idempotent: methods which are safe to send again, pending ones get replayed after reconnecting
+                           instead of failing
+        :param window: limit the commands in flight, with priority classes
+        """
         self._task = None
         if not loop:
             loop = asyncio.get_running_loop()
+        super().__init__(loop, listener_maxsize, listener_policy, auto_enable, auto_disable_delay)
         self._ws: websockets.WebSocketClientProtocol = None
         self._url = websock_url
         self._timeout = timeout
         self._req_count = 0
         self._max_size = max_size
-        self._responses = defaultdict(lambda: asyncio.Future())
-        self._events = defaultdict(lambda: [])
-        self._iter_callbacks = defaultdict(lambda: {})
-        self._loop = loop
-        self.on_closed = []
+        self._pending = PendingTable(loop)
+        self._sessions = {}
         self._id = websock_url.split("/")[-1]
         self._exc = None
+        self._lazy_params = lazy_params
+        if decoder is None:
+            decoder = JSONDecoder()
+        decoder.acquire()
+        self._decoder = decoder
+        self._decoder_acquired = True
+        self._encoder = FrameEncoder()
+        self._writer: FrameWriter = None
+        self._coalesce_writes = coalesce_writes
+        self._metrics = metrics
+        if metrics is not None:
+            metrics.register(self)
+        self._recorder = recorder
+        self._cache = cache
+        self._reconnect = reconnect
+        self._reconnect_attempts = reconnect_attempts
+        self._idempotent = frozenset(idempotent)
+        self._reconnecting: asyncio.Future = None
+        self._enables: typing.Dict[str, typing.Optional[dict]] = {}  # domain: params, in order
+        self._closing = False
+        self.reconnects = 0
+        self._window = window
 
     def __await__(self):
         return self.start_session(timeout=self._timeout).__await__()
@@ -56,6 +291,7 @@ class SingleCDPSocket:
                                                                                     max_size=self._max_size)
         except asyncio.TimeoutError:
             raise asyncio.TimeoutError(f"Couldn't connect to websocket within {timeout} seconds")
+        self._writer = FrameWriter(self._ws, coalesce=self._coalesce_writes, loop=self._loop)
         self._task = self._loop.create_task(self._rec_coro())
         self._task.add_done_callback(self._exc_handler)
         return self
@@ -67,143 +303,391 @@ class SingleCDPSocket:
         if exc:
             raise exc
 
-    async def send(self, method: str, params: dict = None):
-        _id = [self._req_count][0]
-        _dict = {'id': _id, 'method': method}
-        if params:
-            _dict['params'] = params
-        await self._ws.send(json.dumps(_dict))
+    def _new_id(self):
+        _id = self._req_count
         self._req_count += 1
         return _id
 
+    async def send(self, method: str, params: dict = None, session_id: str = None):
+        if self._reconnecting is not None:
+            await asyncio.shield(self._reconnecting)
+        _id = self._new_id()
+        frame = self._encoder.encode(_id, method, params, session_id)
+        if self._metrics is not None:
+            self._metrics.sent(len(frame))
+        if self._recorder is not None:
+            self._recorder.record(OUT, frame)
+        await self._writer.write(frame)
+        return _id
+
     # noinspection PyTypeChecker
-    async def exec(self, method: str, params: dict = None, timeout: float = 2):
-        _id = await self.send(method=method, params=params)
-        # noinspection PyStatementEffect
-        self._responses[_id]
+    async def exec(self, method: str, params: dict = None, timeout: float = 2, session_id: str = None,
+                   priority: str = None):
+        """
+        :param session_id: execute within a (flat) target session, see ``attach``
+        :param priority: ``interactive``, ``normal`` or ``bulk`` for the ``InFlightWindow``, classified by method by default
+        """
+        if session_id is None:
+            self._observe_domain(method)  # sessions observe their own
+        if self._reconnect:
+            if self._reconnecting is not None:
+                await asyncio.shield(self._reconnecting)
+            if session_id is None:
+                self._track_enable(method, params)
+        cache = self._cache
+        if cache is not None and cache.cacheable(method, params):
+            return await cache.fetch(method, params, session_id,
+                                     lambda: self._exec(method, params, timeout, session_id, priority))
+        return await self._exec(method, params, timeout, session_id, priority)
+
+    def _track_enable(self, method: str, params: dict = None):
+        domain, _, command = method.partition(".")
+        if command == "enable":
+            self._enables[domain] = params
+        elif command == "disable":
+            self._enables.pop(domain, None)
+
+    async def _exec(self, method: str, params: dict, timeout: float, session_id: str, priority: str = None):
+        window = self._window
+        if window is not None:
+            waiting = window.acquire(method, session_id, priority)
+            if waiting is not None:
+                timeout = await self._wait_credit(window, waiting, session_id, method, timeout)
+        _id = self._new_id()
+        # register before sending, responses for unknown ids get dropped
+        request = self._pending.add(_id, method, params, timeout, session_id)
+        if window is not None:
+            request.future.add_done_callback(functools.partial(window.release, session_id))
+        frame = self._encoder.encode(_id, method, params, session_id)
+        if self._metrics is not None:
+            self._metrics.request_started(request)
+            self._metrics.sent(len(frame))
+        if self._recorder is not None:
+            self._recorder.record(OUT, frame)
         try:
-            res = await asyncio.wait_for(self._responses[_id], timeout=timeout)
-            try:
-                del self._responses[_id]
-            except KeyError:
-                pass
-            return res
+            await self._writer.write(frame)
+            return await request.future
         except asyncio.TimeoutError:
-            if self._task.done():
-                # task has excited
-                # noinspection PyProtectedMember
-                if self._exc:
-                    raise self._exc
-                elif self._task._exception:
-                    # noinspection PyProtectedMember
-                    raise self._task._exception
-                else:
-                    raise SocketExcitedError("socket coroutine excited without exception")
-            raise asyncio.TimeoutError(f'got no response for method: "{method}", params: {params}'
-                                       f"\nwithin {timeout} seconds")
-
-    def add_listener(self, method: str, callback: callable):
-        self._events[method].append(callback)
-
-    def remove_listener(self, method: str, callback: callable):
-        self._events[method].remove(callback)
+            self._raise_if_excited()
+            raise
+        except BaseException:
+            self._pending.pop(_id)
+            raise
 
-    def method_iterator(self, method: str):
-        from cdp_socket.scripts.abstract import CDPEventIter
-        return CDPEventIter(method=method, socket=self)
+    @staticmethod
+    async def _wait_credit(window: "InFlightWindow", waiting: asyncio.Future, session_id: str, method: str,
+                           timeout: float) -> typing.Optional[float]:
+        """wait for a credit of ``window``, returns the rest of the timeout"""
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiting), timeout)
+        except asyncio.TimeoutError:
+            window.discard(waiting, session_id)
+            raise asyncio.TimeoutError(f'"{method}" got no in-flight credit within {timeout} seconds')
+        except BaseException:
+            window.discard(waiting, session_id)
+            raise
+        if timeout is not None:
+            timeout = max(0., timeout - (time.perf_counter() - start))
+        return timeout
+
+    def _raise_if_excited(self):
+        if self._task.done():
+            # task has excited
+            # noinspection PyProtectedMember
+            if self._exc:
+                raise self._exc
+            elif self._task._exception:
+                # noinspection PyProtectedMember
+                raise self._task._exception
+            else:
+                raise SocketExcitedError("socket coroutine excited without exception")
+
+    async def _send_many(self, commands: typing.Iterable[typing.Tuple[str, dict] or typing.Tuple[str]],
+                         timeout: float = None, session_id: str = None) -> typing.List[PendingRequest]:
+        if self._reconnecting is not None:
+            await asyncio.shield(self._reconnecting)
+        window = self._window
+        loop = self._loop
+        # one deadline for all, waiting for credits counts towards it
+        deadline = None if timeout is None else loop.time() + timeout
+        remaining = timeout
+        frames = []
+        batch = []  # requests of frames
+        requests = []
+        try:
+            for command in commands:
+                method, params = command[0], command[1] if len(command) > 1 else None
+                if window is not None:
+                    if deadline is not None:
+                        remaining = deadline - loop.time()
+                        if remaining <= 0:
+                            requests.append(self._timed_out(method, params, session_id, timeout))
+                            continue
+                    waiting = window.acquire(method, session_id)
+                    if waiting is not None:
+                        # send what got a credit so far
+                        await self._write_many(frames, batch)
+                        frames, batch = [], []
+                        try:
+                            remaining = await self._wait_credit(window, waiting, session_id, method, remaining)
+                        except asyncio.TimeoutError:
+                            requests.append(self._timed_out(method, params, session_id, timeout))
+                            continue
+                _id = self._new_id()
+                request = self._pending.add(_id, method, params, remaining, session_id)
+                if window is not None:
+                    request.future.add_done_callback(functools.partial(window.release, session_id))
+                requests.append(request)
+                batch.append(request)
+                frames.append(self._encoder.encode(_id, method, params, session_id))
+            await self._write_many(frames, batch)
+        except BaseException:
+            self._cancel(requests)
+            raise
+        return requests
+
+    def _timed_out(self, method: str, params: dict, session_id: str, timeout: float) -> PendingRequest:
+        # never sent, didn't get an in-flight credit before the deadline
+        fut = self._loop.create_future()
+        fut.set_exception(asyncio.TimeoutError(f'"{method}" got no in-flight credit within {timeout} seconds'))
+        fut.exception()  # retrieved, even if the caller stops early
+        return PendingRequest(None, method, params, session_id, fut, timeout)
+
+    async def _write_many(self, frames: typing.List[bytes], requests: typing.List[PendingRequest]):
+        if not frames:
+            return
+        if self._metrics is not None:
+            for request in requests:
+                self._metrics.request_started(request)
+            self._metrics.sent(sum(len(frame) for frame in frames), len(frames))
+        if self._recorder is not None:
+            for frame in frames:
+                self._recorder.record(OUT, frame)
+        await self._writer.write_many(frames)
+
+    def _cancel(self, requests: typing.Iterable[PendingRequest]):
+        for request in requests:
+            self._pending.pop(request.id)
 
-    async def wait_for(self, method: str, timeout=None):
-        _iter = self.method_iterator(method)
+    @staticmethod
+    def _fut_result(fut: asyncio.Future):
+        if fut.exception():
+            return fut.exception()
+        return fut.result()
+
+    async def exec_many(self, commands: typing.Iterable[typing.Tuple[str, dict] or typing.Tuple[str]],
+                        timeout: float = 2, session_id: str = None) -> list:
+        """
+        execute independent commands pipelined: all frames are written in one burst
+        and awaited with one shared deadline
+
+        :param commands: ``(method, params)`` or ``(method,)`` tuples
+        :returns: results in order, failed commands as their ``CDPError`` or ``asyncio.TimeoutError`` instance
+        """
+        requests = await self._send_many(commands, timeout, session_id)
+        if not requests:
+            return []
+        futs = [request.future for request in requests]
         try:
-            res = await asyncio.wait_for(_iter.__anext__(), timeout)
-        except asyncio.TimeoutError as e:
-            _id = _iter.id
-            try:
-                del self._iter_callbacks[_id]
-            except KeyError:
-                pass
-            raise e
-        return res
+            await asyncio.wait(futs)
+        except BaseException:
+            self._cancel(requests)
+            raise
+        results = [self._fut_result(fut) for fut in futs]
+        if any(isinstance(res, asyncio.TimeoutError) for res in results):
+            self._raise_if_excited()
+        return results
+
+    async def as_completed(self, commands: typing.Iterable[typing.Tuple[str, dict] or typing.Tuple[str]],
+                           timeout: float = 2, session_id: str = None
+                           ) -> typing.AsyncIterator[typing.Tuple[int, typing.Any]]:
+        """
+        like ``exec_many``, but yields ``(index, result)`` pairs as soon as each response arrives.
+        Commands without response at the shared deadline are yielded with an ``asyncio.TimeoutError`` instance.
+        """
+        requests = await self._send_many(commands, timeout, session_id)
+        index = {request.future: idx for idx, request in enumerate(requests)}
+        try:
+            while index:
+                done, _ = await asyncio.wait(index.keys(), return_when=asyncio.FIRST_COMPLETED)
+                for fut in sorted(done, key=index.get):
+                    res = self._fut_result(fut)
+                    if isinstance(res, asyncio.TimeoutError):
+                        self._raise_if_excited()
+                    yield index.pop(fut), res
+        finally:
+            if index:
+                self._cancel(requests[idx] for idx in index.values())
 
     async def load_json(self, data):
-        try:
-            if sys.getsizeof(data) > 8000:
-                return await self._loop.run_in_executor(None, orjson.loads, data)
-            else:
-                return json.loads(data)
-        except orjson.JSONDecodeError:
-            return await self._loop.run_in_executor(None, json.loads, data)
+        return await self._decoder.decode(data, self._loop)
 
     async def _rec_coro(self):
-        # noinspection PyUnresolvedReferences
+        exc = None
         try:
-            async for data in self._ws:
+            while True:
                 try:
-                    data = await self.load_json(data)
-                except Exception as e:
-                    from cdp_socket import EXC_HANDLER
-                    EXC_HANDLER(e)
-                    data = {"method": "DecodeError", "params": {"e": e}}
-                err = data.get('error')
-                _id = data.get("id")
-                if err is None:
-                    if _id is None:
-                        method = data.get("method")
-                        params = data.get("params")
-                        callbacks: callable = self._events[method]
-                        for callback in callbacks:
-                            await self._handle_callback(callback, params)
-                        for _id, fut_result_setter in list(self._iter_callbacks[method].items()):
-                            try:
-                                fut_result_setter(params)
-                            except asyncio.InvalidStateError:
-                                pass  # callback got cancelled
-                            try:
-                                del self._iter_callbacks[method][_id]
-                            except KeyError:
-                                pass
-                    else:
-                        try:
-                            self._responses[_id].set_result(data["result"])
-                        except asyncio.InvalidStateError:
-                            try:
-                                del self._responses[_id]
-                            except KeyError:
-                                pass
-                else:
-                    exc = CDPError(error=err)
-                    try:
-                        self._responses[_id].set_exception(exc)
-                    except asyncio.InvalidStateError:
-                        try:
-                            del self._responses[_id]
-                        except KeyError:
-                            pass
-        except websockets.exceptions.ConnectionClosedError as e:
-            if self.on_closed:
-                self._exc = e
-                for callback in self.on_closed:
-                    await self._handle_callback(callback, code=e.code, reason=e.reason)
+                    await self._receive()
+                except websockets.exceptions.ConnectionClosedError as e:
+                    # shared with the pending requests, don't keep this (suspended) frame alive in it
+                    exc = self._exc = e.with_traceback(None)
+                    if self._reconnect and not self._closing and await self._reopen(e):
+                        exc = self._exc = None
+                        continue
+                break
+        finally:
+            # don't let requests wait for their timeout
+            self._pending.fail_all(exc or SocketExcitedError("websocket closed"))
+        if exc is not None:
+            for callback in self.on_closed:
+                await self._handle_callback(callback, code=exc.code, reason=exc.reason)
+
+    async def _reopen(self, exc: BaseException) -> bool:
+        from cdp_socket import EXC_HANDLER
+        self._reconnecting = reconnecting = self._loop.create_future()
+        idempotent = self._idempotent
+        replay = self._pending.fail_all(exc, keep=lambda r: r.session_id is None and r.method in idempotent)
+        # neither do cached node-, frame- or object ids
+        if self._cache is not None:
+            self._cache.clear()
+        # sessions don't survive the connection
+        sessions, self._sessions = list(self._sessions.values()), {}
+        if sessions:
+            # registered again with the next session
+            self.remove_listener("Target.detachedFromTarget", self._on_detached)
+        for session in sessions:
+            await session._on_detached()
+
+        ws = None
+        for attempt in range(self._reconnect_attempts):
+            await asyncio.sleep(backoff(attempt, base=0.1, cap=2))
+            if self._closing:
+                break
+            try:
+                ws = await websockets.connect(uri=self._url, open_timeout=self._timeout, max_size=self._max_size)
+                break
+            except (OSError, asyncio.TimeoutError, websockets.exceptions.WebSocketException):
+                continue
+        self._reconnecting = None
+        if ws is None:
+            reconnecting.set_exception(exc)
+            reconnecting.exception()  # retrieved
+            return False
 
-    @staticmethod
-    async def _handle_callback(callback: callable, *args, **kwargs):
-        from . import EXC_HANDLER
-        if callback:
-            async def async_handle(awaitable):
-                try:
-                    await awaitable
-                except Exception as e:
-                    EXC_HANDLER(e)
+        self._ws = ws
+        self._writer = FrameWriter(ws, coalesce=self._coalesce_writes, loop=self._loop)
+        self.reconnects += 1
+        # re-enable domains before replaying, in one burst
+        frames = []
+        for domain, params in self._enables.items():
+            _id = self._new_id()
+            request = self._pending.add(_id, f"{domain}.enable", params, self._timeout)
+            request.future.add_done_callback(_report_exception)
+            frames.append(self._encoder.encode(_id, f"{domain}.enable", params))
+        frames.extend(self._encoder.encode(request.id, request.method, request.params) for request in replay)
+        if self._recorder is not None:
+            for frame in frames:
+                self._recorder.record(OUT, frame)
+        try:
+            if frames:
+                await self._writer.write_many(frames)
+        except websockets.exceptions.ConnectionClosed:
+            pass  # received next
+        except Exception as e:
+            EXC_HANDLER(e)
+        reconnecting.set_result(None)
+        return True
+
+    async def _receive(self):
+        # noinspection PyUnresolvedReferences
+        metrics = self._metrics
+        recorder = self._recorder
+        cache = self._cache
+        async for data in self._ws:
+            if metrics is not None:
+                metrics.received(len(data))
+            if recorder is not None:
+                recorder.record(IN, data)
+            _id, method = peek_frame(data)
+            if method is not None:
+                if cache is not None and method in cache.invalidate_on:
+                    cache.on_event(method, peek_session_id(data))
+                target = self
+                if self._sessions:
+                    session_id = peek_session_id(data)
+                    if session_id is not None:
+                        target = self._sessions.get(session_id, self)
+                if not target._subscribed(method):
+                    continue  # nobody subscribed, don't decode
+                if self._lazy_params:
+                    await target._dispatch_event(method, LazyParams(data, self._decoder.loads))
+                    continue
+            elif _id is not None and _id not in self._pending:
+                self._pending.discard(_id)
+                continue  # nobody waiting for the response (anymore)
             try:
-                res = callback(*args, **kwargs)
+                if metrics is None:
+                    data = await self._decoder.decode(data, self._loop)
+                else:
+                    start = time.perf_counter()
+                    data = await self._decoder.decode(data, self._loop)
+                    metrics.decoded(time.perf_counter() - start)
             except Exception as e:
+                from cdp_socket import EXC_HANDLER
                 EXC_HANDLER(e)
-                return
-            if inspect.isawaitable(res):
-                safe_wrap_fut(async_handle(res))
-            return res
+                data = {"method": "DecodeError", "params": {"e": e}}
+            err = data.get('error')
+            _id = data.get("id")
+            if err is None:
+                if _id is None:
+                    target = self
+                    session_id = data.get("sessionId")
+                    if session_id is not None:
+                        target = self._sessions.get(session_id, self)
+                    await target._dispatch_event(data.get("method"), data.get("params"))
+                else:
+                    self._pending.resolve(_id, data["result"])
+            else:
+                self._pending.reject(_id, CDPError(error=err))
+
+    async def attach(self, target_id: str, timeout: float = 2):
+        """
+        attach to a target over this (usually browser-level) connection, using ``Target.attachToTarget``
+        with ``flatten: true``. Returns a ``CDPSession``, which routes by ``sessionId``.
+        """
+        res = await self.exec("Target.attachToTarget", {"targetId": target_id, "flatten": True}, timeout=timeout)
+        return self.session(res["sessionId"], target_id)
+
+    def session(self, session_id: str, target_id: str = None):
+        """get or create the ``CDPSession`` for an already attached ``session_id``"""
+        from cdp_socket.session import CDPSession
+        session = self._sessions.get(session_id)
+        if session is None:
+            if not self._sessions:
+                self.add_listener("Target.detachedFromTarget", self._on_detached)
+            session = CDPSession(self, session_id, target_id)
+            self._sessions[session_id] = session
+        return session
+
+    async def _on_detached(self, params: dict):
+        if self._cache is not None:
+            self._cache.invalidate(session_id=params["sessionId"])
+        session = self._sessions.pop(params["sessionId"], None)
+        if session is not None:
+            await session._on_detached()
+        if not self._sessions:
+            self.remove_listener("Target.detachedFromTarget", self._on_detached)
+
+    @property
+    def sessions(self):
+        return self._sessions
 
     async def close(self, code: int = 1000, reason: str = ''):
+        self._closing = True
+        self._close_listeners()
+        for session in self._sessions.values():
+            session._close_listeners()
         if self._ws.open:
             try:
                 await self._ws.close(code=code, reason=reason)
@@ -213,11 +697,41 @@ class SingleCDPSocket:
                     pass
                 else:
                     raise e
+        if self._recorder is not None:
+            self._recorder.flush()
+        if self._decoder_acquired:
+            self._decoder_acquired = False
+            self._decoder.release()  # shuts its process pool down with the last socket
 
     @property
     def closed(self):
         return self._ws.closed
 
+    @property
+    def metrics(self) -> typing.Optional[Metrics]:
+        return self._metrics
+
+    @property
+    def recorder(self) -> typing.Optional[Recorder]:
+        return self._recorder
+
+    @property
+    def cache(self) -> typing.Optional["ResponseCache"]:
+        return self._cache
+
+    @property
+    def window(self) -> typing.Optional["InFlightWindow"]:
+        return self._window
+
+    @property
+    def pending(self) -> PendingTable:
+        """requests waiting for a response, see ``PendingTable.stats()`` for late/orphaned responses"""
+        return self._pending
+
+    @property
+    def decoder(self) -> JSONDecoder:
+        return self._decoder
+
     @property
     def ws_url(self):
         return self._url
@@ -236,8 +750,23 @@ class SingleCDPSocket:
         return not self.__eq__(other)
 
 
+PROBES = ("connect", "reuse", "skip")
+
+
 class CDPSocket:
-    def __init__(self, port: int, host: str = "127.0.0.1", timeout: int = 30, loop=None, max_size: int = 2 ** 20):
+    def __init__(self, port: int, host: str = "127.0.0.1", timeout: int = 30, loop=None, max_size: int = 2 ** 20,
+                 live_targets: bool = False, metrics: Metrics = None, probe: str = "connect"):
+        """
+        :param live_targets: keep the targets up to date over the browser connection
+                             (``Target.setDiscoverTargets``), so ``targets`` doesn't need an http request
+        :param metrics: shared by all sockets of this browser, see ``SingleCDPSocket``
+        :param probe: how ``start_session`` makes sure the browser is reachable, after its http endpoint answered:
+                      ``"connect"`` opens and closes a websocket to the first target,
+                      ``"reuse"`` keeps that websocket as the target's socket for ``get_socket``,
+                      ``"skip"`` doesn't connect at all
+        """
+        if probe not in PROBES:
+            raise ValueError(f"probe has to be one of {PROBES}, got {probe!r}")
         if not loop:
             loop = asyncio.get_event_loop()
         self._port = port
@@ -248,6 +777,13 @@ class CDPSocket:
         self._loop = loop
         # noinspection PyTypeChecker
         self._sockets: typing.Dict[str, SingleCDPSocket] = defaultdict(lambda: None)
+        self._browser_socket: SingleCDPSocket = None
+        self._browser_lock = asyncio.Lock()
+        self._sessions = {}
+        self._discovery = Discovery(self._host)
+        self._live_targets = live_targets
+        self._metrics = metrics
+        self._probe = probe
 
     async def __aenter__(self):
         return await self.start_session()
@@ -261,22 +797,36 @@ class CDPSocket:
         return await asyncio.wait_for(self._connect(), timeout=timeout)
 
     async def _connect(self):
-        ws_url = await get_websock_url(self._port, self._host_, timeout=self._timeout)
-        conn = await SingleCDPSocket(ws_url, max_size=self._max_size)
-        await conn.close()
+        try:
+            targets = await self._discovery.targets(timeout=self._timeout)
+        except asyncio.TimeoutError:
+            raise asyncio.TimeoutError(f"No response from Chrome within {self._timeout} seconds, assuming it crashed")
+        if self._probe == "reuse":
+            await self.get_socket(targets[0], timeout=self._timeout)
+        elif self._probe == "connect":
+            conn = await SingleCDPSocket(targets[0]['webSocketDebuggerUrl'], max_size=self._max_size)
+            await conn.close()
+        if self._live_targets:
+            await self._discovery.watch(await self.get_browser_socket(timeout=self._timeout))
         return self
 
     async def __aexit__(self, *args, **kwargs):
         for socket in list(self.sockets.values()):
             await socket.__aexit__(*args, **kwargs)
+        if self._browser_socket:
+            await self._browser_socket.__aexit__(*args, **kwargs)
+        await self._discovery.close()
 
     async def close(self, code: int = 1000, reason: str = None):
         for socket in list(self.sockets.values()):
             await socket.close(code, reason)
+        if self._browser_socket:
+            await self._browser_socket.close(code, reason)
+        await self._discovery.close()
 
     @property
     async def targets(self):
-        return await get_json(self.host, timeout=2)
+        return await self._discovery.targets(timeout=2)
 
     async def get_socket(self, target: dict = None, sock_id: str = None,
                          ensure_new: bool = False, timeout: float or None = 10):
@@ -286,24 +836,105 @@ class CDPSocket:
             sock_id = target["id"]
         sock_url = f'ws://{self.host}/devtools/page/{sock_id}'
 
-        existing = self.sockets[sock_id]
-        if existing and (not ensure_new):
+        existing = self._sockets.get(sock_id)
+        if existing and not existing.closed and not ensure_new:
             socket = existing
         else:
-            socket = await SingleCDPSocket(sock_url, timeout=timeout, loop=self._loop, max_size=self._max_size)
+            socket = await SingleCDPSocket(sock_url, timeout=timeout, loop=self._loop, max_size=self._max_size,
+                                           metrics=self._metrics)
             self._sockets[sock_id] = socket
 
             # noinspection PyUnusedLocal
             def remove_sock(code, reason):
-                _id = socket.id
-                try:
-                    del self._sockets[_id]
-                except KeyError:
-                    pass
+                # unless it got replaced already
+                if self._sockets.get(socket.id) is socket:
+                    del self._sockets[socket.id]
 
             socket.on_closed.append(remove_sock)
         return socket
 
+    async def get_sockets(self, targets: typing.Iterable[dict or str] = None, concurrency: int = 16,
+                          ensure_new: bool = False, timeout: float or None = 10
+                          ) -> typing.Tuple[typing.Dict[str, SingleCDPSocket], typing.Dict[str, BaseException]]:
+        """
+        ``get_socket`` for many targets at once, with at most ``concurrency`` handshakes in flight.
+        Existing sockets are reused (unless ``ensure_new``), a target which fails doesn't fail the others.
+
+        :param targets: target dicts or ids, all ``targets`` by default
+        :param timeout: per handshake
+        :returns: ``({target id: socket}, {target id: exception})``
+        """
+        if targets is None:
+            targets = await self.targets
+        sock_ids = list(dict.fromkeys(target if isinstance(target, str) else target["id"] for target in targets))
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def open_socket(sock_id: str) -> SingleCDPSocket:
+            existing = self._sockets.get(sock_id)
+            if existing and not existing.closed and not ensure_new:
+                return existing
+            async with semaphore:
+                return await self.get_socket(sock_id=sock_id, ensure_new=ensure_new, timeout=timeout)
+
+        results = await asyncio.gather(*(open_socket(sock_id) for sock_id in sock_ids), return_exceptions=True)
+        sockets, errors = {}, {}
+        for sock_id, res in zip(sock_ids, results):
+            if isinstance(res, BaseException):
+                errors[sock_id] = res
+            else:
+                sockets[sock_id] = res
+        return sockets, errors
+
+    async def get_browser_socket(self, timeout: float or None = 10) -> SingleCDPSocket:
+        """the browser-level connection (``/json/version``), which sessions get multiplexed over"""
+        async with self._browser_lock:
+            if self._browser_socket is None or self._browser_socket.closed:
+                version = await self._discovery.version(timeout=timeout)
+                self._browser_socket = await SingleCDPSocket(version["webSocketDebuggerUrl"], timeout=timeout,
+                                                             loop=self._loop, max_size=self._max_size,
+                                                             metrics=self._metrics)
+                self._sessions.clear()
+        return self._browser_socket
+
+    async def get_session(self, target: dict = None, sock_id: str = None, ensure_new: bool = False,
+                          timeout: float or None = 10):
+        """
+        like ``get_socket``, but attaches in flat mode over the shared browser-level connection
+        instead of opening a websocket per target
+
+        :returns: ``cdp_socket.session.CDPSession``
+        """
+        if not (target or sock_id) or (target and sock_id):
+            raise ValueError("expected either target or sock_id")
+        if target:
+            sock_id = target["id"]
+        browser = await self.get_browser_socket(timeout=timeout)
+        existing = self._sessions.get(sock_id)
+        if existing and not existing.closed and not ensure_new:
+            return existing
+        session = await browser.attach(sock_id, timeout=timeout)
+        self._sessions[sock_id] = session
+
+        # noinspection PyUnusedLocal
+        def remove_session(code, reason):
+            if self._sessions.get(sock_id) is session:
+                del self._sessions[sock_id]
+
+        session.on_closed.append(remove_session)
+        return session
+
+    @property
+    def sessions(self):
+        return self._sessions
+
+    @property
+    def metrics(self) -> typing.Optional[Metrics]:
+        return self._metrics
+
+    @property
+    def discovery(self) -> Discovery:
+        return self._discovery
+
     @property
     def host(self):
         return self._host
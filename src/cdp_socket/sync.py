@@ -0,0 +1,185 @@
+import asyncio
+import concurrent.futures
+import threading
+import typing
+
+from cdp_socket.socket import SingleCDPSocket
+
+
+class SyncCDPSocket:
+    """
+    blocking facade over a ``SingleCDPSocket``, which runs on an event loop in a background thread.
+    Safe to use from any number of threads.
+
+    Commands submitted from other threads are batched: the loop is woken up once per batch
+    (instead of once per command, like ``asyncio.run_coroutine_threadsafe``),
+    and the frames of a batch get written at once.
+
+    .. code-block:: python
+
+        with SyncCDPSocket(websock_url) as sock:
+            sock.exec("Browser.getVersion")
+            futures = [sock.submit("Runtime.evaluate", {"expression": "1+1"}) for _ in range(10)]
+            results = [fut.result() for fut in futures]
+    """
+
+    def __init__(self, websock_url: str, timeout: float = 10, coalesce_writes: bool = True, **kwargs):
+        """
+        :param kwargs: passed to ``SingleCDPSocket``
+        """
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run_loop, name="SyncCDPSocket", daemon=True)
+        self._lock = threading.Lock()
+        self._queue: typing.List[tuple] = []
+        self._scheduled = False
+        self._closed = False
+        self.submitted = 0
+        self.wakeups = 0
+        self._thread.start()
+        try:
+            self._socket: SingleCDPSocket = self.call(self._start(websock_url, timeout, coalesce_writes, kwargs))
+        except BaseException:
+            self._stop_loop()
+            raise
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_forever()
+
+    async def _start(self, websock_url: str, timeout: float, coalesce_writes: bool, kwargs: dict):
+        return await SingleCDPSocket(websock_url, timeout=timeout, loop=self._loop,
+                                     coalesce_writes=coalesce_writes, **kwargs)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    # submission
+    def submit(self, method: str, params: dict = None, timeout: float = 2,
+               session_id: str = None) -> concurrent.futures.Future:
+        """like ``exec``, but returns a ``concurrent.futures.Future`` without blocking"""
+        fut = concurrent.futures.Future()
+        self._enqueue([(method, params, timeout, session_id, fut)])
+        return fut
+
+    def submit_many(self, commands: typing.Iterable[typing.Tuple[str, dict] or typing.Tuple[str]],
+                    timeout: float = 2, session_id: str = None) -> typing.List[concurrent.futures.Future]:
+        """submit ``(method, params)`` or ``(method,)`` tuples as one batch"""
+        items = []
+        for command in commands:
+            items.append((command[0], command[1] if len(command) > 1 else None, timeout, session_id,
+                          concurrent.futures.Future()))
+        self._enqueue(items)
+        return [item[4] for item in items]
+
+    def exec(self, method: str, params: dict = None, timeout: float = 2, session_id: str = None):
+        """execute a command and block until its response"""
+        return self.submit(method, params, timeout, session_id).result()
+
+    def exec_many(self, commands: typing.Iterable[typing.Tuple[str, dict] or typing.Tuple[str]],
+                  timeout: float = 2, session_id: str = None) -> list:
+        """see ``SingleCDPSocket.exec_many``, failed commands are returned as their exception"""
+        return self.call(self._socket.exec_many(list(commands), timeout, session_id))
+
+    def _enqueue(self, items: typing.List[tuple]):
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("socket is closed")
+            self._queue.extend(items)
+            self.submitted += len(items)
+            if self._scheduled:
+                return  # the pending wake-up picks these up as well
+            self._scheduled = True
+        self._loop.call_soon_threadsafe(self._drain)
+
+    def _drain(self):
+        with self._lock:
+            items, self._queue = self._queue, []
+            self._scheduled = False
+        self.wakeups += 1
+        for method, params, timeout, session_id, fut in items:
+            if not fut.set_running_or_notify_cancel():
+                continue  # cancelled before it got sent
+            task = self._loop.create_task(self._socket.exec(method, params, timeout, session_id))
+            task.add_done_callback(lambda t, _fut=fut: _copy_result(t, _fut))
+
+    # everything else
+    def call(self, coro: typing.Awaitable, timeout: float = None):
+        """run a coroutine on the socket's loop and block for its result"""
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result(timeout)
+
+    def _call_on_loop(self, func: callable, *args, **kwargs):
+        """run ``func`` on the socket's loop and block for its result"""
+        if threading.current_thread() is self._thread:
+            return func(*args, **kwargs)  # from a listener, waiting would deadlock
+        fut = concurrent.futures.Future()
+
+        def run():
+            try:
+                fut.set_result(func(*args, **kwargs))
+            except BaseException as e:
+                fut.set_exception(e)
+
+        self._loop.call_soon_threadsafe(run)
+        return fut.result()
+
+    def add_listener(self, method: str, callback: callable, **kwargs):
+        """the callback runs on the socket's thread, see ``SingleCDPSocket.add_listener``"""
+        return self._call_on_loop(self._socket.add_listener, method, callback, **kwargs)
+
+    def remove_listener(self, method: str, callback: callable):
+        """:raises ValueError: if ``callback`` isn't a listener for ``method``"""
+        return self._call_on_loop(self._socket.remove_listener, method, callback)
+
+    def wait_for(self, method: str, timeout: float = None, predicate: callable = None):
+        return self.call(self._socket.wait_for(method, timeout, predicate))
+
+    @property
+    def socket(self) -> SingleCDPSocket:
+        """the underlying socket, only use it on ``loop``"""
+        return self._socket
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        return self._loop
+
+    @property
+    def closed(self) -> bool:
+        return self._closed or self._socket.closed
+
+    def stats(self) -> dict:
+        return {"submitted": self.submitted, "wakeups": self.wakeups, "pending": len(self._socket.pending)}
+
+    def close(self, timeout: float = 5):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        try:
+            self.call(self._shutdown(), timeout)
+        finally:
+            self._stop_loop()
+
+    async def _shutdown(self):
+        await self._socket.close(reason="")
+        # pending exec calls, listener workers, ...
+        tasks = [task for task in asyncio.all_tasks(self._loop) if task is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _stop_loop(self):
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+
+def _copy_result(task: asyncio.Task, fut: concurrent.futures.Future):
+    if task.cancelled():
+        fut.set_exception(concurrent.futures.CancelledError())  # already running, can't be cancelled
+    elif task.exception() is not None:
+        fut.set_exception(task.exception())
+    else:
+        fut.set_result(task.result())
@@ -0,0 +1,151 @@
+import asyncio
+import time
+import typing
+from collections import OrderedDict
+
+import orjson
+
+# event: prefixes of the cached methods it invalidates
+DEFAULT_INVALIDATIONS = {
+    "DOM.documentUpdated": ("DOM.",),
+    "Page.frameNavigated": ("Page.getFrameTree", "Page.getResourceTree", "Runtime."),
+    "Runtime.executionContextsCleared": ("Runtime.",),
+}
+
+
+class CachePolicy(typing.NamedTuple):
+    ttl: typing.Optional[float] = None  # seconds, None: until invalidated
+    maxsize: int = 128  # entries per method, least recently used ones get evicted
+    when: typing.Optional[typing.Callable[[dict], bool]] = None  # only cache calls with these params
+
+
+DEFAULT_POLICIES = {
+    "Browser.getVersion": CachePolicy(),
+    "DOM.getDocument": CachePolicy(),
+    "Page.getFrameTree": CachePolicy(),
+}
+
+
+class ResponseCache:
+    """
+    opt-in cache for idempotent commands: ``SingleCDPSocket(url, cache=ResponseCache())``
+
+    Identical concurrent calls share one request. Entries are invalidated per session when
+    an event in ``invalidate_on`` arrives (its domain has to be enabled). Cached results are shared
+    between callers, don't mutate them.
+
+    :param policies: ``{method: CachePolicy}``, defaults to ``DEFAULT_POLICIES``
+    :param invalidate_on: ``{event: (method prefix, ...)}``, defaults to ``DEFAULT_INVALIDATIONS``
+    """
+
+    def __init__(self, policies: typing.Dict[str, CachePolicy] = None,
+                 invalidate_on: typing.Dict[str, typing.Iterable[str]] = None):
+        if policies is None:
+            policies = DEFAULT_POLICIES
+        if invalidate_on is None:
+            invalidate_on = DEFAULT_INVALIDATIONS
+        self.policies = dict(policies)
+        self.invalidate_on = {event: tuple(prefixes) for event, prefixes in invalidate_on.items()}
+        # method: {(session_id, params): (result, expires_at)}
+        self._entries: typing.Dict[str, OrderedDict] = {}
+        self._in_flight: typing.Dict[tuple, asyncio.Future] = {}
+        self._generation = 0  # bumped on invalidation, results fetched across it aren't stored
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _key(params: typing.Optional[dict], session_id: typing.Optional[str]) -> tuple:
+        return session_id, orjson.dumps(params, option=orjson.OPT_SORT_KEYS) if params else b""
+
+    def cacheable(self, method: str, params: dict = None) -> bool:
+        policy = self.policies.get(method)
+        return policy is not None and (policy.when is None or policy.when(params or {}))
+
+    async def fetch(self, method: str, params: typing.Optional[dict], session_id: typing.Optional[str],
+                    request: typing.Callable[[], typing.Awaitable]):
+        """the cached result, or the result of ``request()``"""
+        policy = self.policies[method]
+        key = self._key(params, session_id)
+        entries = self._entries.get(method)
+        if entries is None:
+            entries = self._entries[method] = OrderedDict()
+        entry = entries.get(key)
+        if entry is not None:
+            result, expires_at = entry
+            if expires_at is None or time.monotonic() < expires_at:
+                entries.move_to_end(key)
+                self.hits += 1
+                return result
+            del entries[key]
+
+        flight_key = (method, key)
+        fut = self._in_flight.get(flight_key)
+        if fut is not None:
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(fut)
+            except asyncio.CancelledError:
+                if fut.cancelled():
+                    # the leading call got cancelled, not this one
+                    return await request()
+                raise
+
+        self.misses += 1
+        fut = self._in_flight[flight_key] = asyncio.get_running_loop().create_future()
+        fut.add_done_callback(_retrieve)
+        generation = self._generation
+        try:
+            result = await request()
+        except asyncio.CancelledError:
+            fut.cancel()
+            raise
+        except BaseException as e:
+            fut.set_exception(e)
+            raise
+        finally:
+            del self._in_flight[flight_key]
+        fut.set_result(result)
+        if generation == self._generation:
+            entries[key] = (result, None if policy.ttl is None else time.monotonic() + policy.ttl)
+            if len(entries) > policy.maxsize:
+                entries.popitem(last=False)
+        return result
+
+    def on_event(self, method: str, session_id: str = None):
+        """invalidate the entries ``method`` (an event) affects within ``session_id``"""
+        prefixes = self.invalidate_on.get(method)
+        if prefixes:
+            self.invalidate(prefixes, session_id)
+
+    def invalidate(self, prefixes: typing.Iterable[str] = ("",), session_id: str = None, all_sessions: bool = False):
+        """drop the entries of the methods starting with any of ``prefixes``, everything by default"""
+        prefixes = tuple(prefixes)
+        self._generation += 1
+        self.invalidations += 1
+        for method, entries in self._entries.items():
+            if not method.startswith(prefixes):
+                continue
+            if all_sessions:
+                entries.clear()
+            else:
+                for key in [key for key in entries if key[0] == session_id]:
+                    del entries[key]
+
+    def clear(self):
+        self._entries.clear()
+        self._generation += 1
+
+    def __len__(self):
+        return sum(len(entries) for entries in self._entries.values())
+
+    def stats(self) -> dict:
+        return {"entries": len(self), "hits": self.hits, "misses": self.misses, "coalesced": self.coalesced,
+                "invalidations": self.invalidations, "in_flight": len(self._in_flight)}
+
+
+def _retrieve(fut: asyncio.Future):
+    # coalesced callers may not exist, don't log "exception was never retrieved"
+    if not fut.cancelled():
+        fut.exception()
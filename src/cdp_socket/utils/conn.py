@@ -1,22 +1,27 @@
 import asyncio
-import aiohttp
+
+from cdp_socket.utils.discovery import backoff
 
 
 async def get_http(url: str, timeout: float or None = 10):
+    import aiohttp
     async with aiohttp.ClientSession() as session:
         async with session.get(url, timeout=timeout) as resp:
             return resp
 
 
-async def get_json(host: str, timeout: float or None = 10):
-    res = None
-    while not res:
-        try:
-            async with aiohttp.ClientSession() as session:
-                res = await session.get(f"http://{host}/json", timeout=timeout)
-                return await res.json()
-        except aiohttp.ClientError:
-            pass
+async def get_json(host: str, timeout: float or None = 10, path: str = "/json"):
+    import aiohttp
+    attempt = 0
+    async with aiohttp.ClientSession() as session:
+        while True:
+            try:
+                async with session.get(f"http://{host}{path}", timeout=timeout) as res:
+                    return await res.json()
+            except aiohttp.ClientError:
+                # browser not listening yet
+                await asyncio.sleep(backoff(attempt))
+                attempt += 1
 
 
 async def get_websock_url(port: int, host: str = "127.0.0.1", timeout: float or None = 10):
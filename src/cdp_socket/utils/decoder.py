@@ -0,0 +1,104 @@
+import asyncio
+import concurrent.futures
+import json
+
+import orjson
+
+
+def loads(data: str or bytes):
+    """orjson, with a fallback to the (more lenient, e.g. for lone surrogates) stdlib json"""
+    try:
+        return orjson.loads(data)
+    except orjson.JSONDecodeError:
+        return json.loads(data)
+
+
+class JSONDecoder:
+    """
+    decodes incoming frames, choosing the path by frame size
+
+    * ``inline``: orjson on the event loop (default for all frames, orjson holds the GIL anyways)
+    * ``process``: orjson in a process pool, for frames of at least ``process_threshold`` bytes
+      (for example DOM snapshots), keeps the event loop responsive
+    * ``fallback``: stdlib json, if orjson rejects a frame
+
+    ``counters`` shows how many frames took each path and their size
+    (characters of text frames, bytes of binary ones).
+    Each socket gets its own decoder by default, one decoder (and its pool) can also be shared:
+    sockets ``acquire()`` it and ``release()`` it on close, an own process pool gets shut down
+    when the last one is released (and started again if needed).
+    """
+
+    def __init__(self, process_threshold: int = None, max_workers: int = None,
+                 executor: concurrent.futures.Executor = None):
+        """
+        :param process_threshold: minimum frame size for the process pool, ``None`` to always decode inline
+        :param max_workers: workers for the lazily created process pool
+        :param executor: custom executor to use instead of a ``ProcessPoolExecutor``
+        """
+        self.process_threshold = process_threshold
+        self._max_workers = max_workers
+        self._executor = executor
+        self._owns_executor = executor is None
+        self._users = 0
+        self.counters = {"inline": 0, "inline_size": 0, "process": 0, "process_size": 0,
+                         "fallback": 0, "fallback_size": 0}
+
+    @property
+    def executor(self) -> concurrent.futures.Executor:
+        if self._executor is None:
+            self._executor = concurrent.futures.ProcessPoolExecutor(max_workers=self._max_workers)
+        return self._executor
+
+    def loads(self, data: str or bytes):
+        """decode inline"""
+        counters = self.counters
+        try:
+            res = orjson.loads(data)
+        except orjson.JSONDecodeError:
+            res = json.loads(data)
+            counters["fallback"] += 1
+            counters["fallback_size"] += len(data)
+            return res
+        counters["inline"] += 1
+        counters["inline_size"] += len(data)
+        return res
+
+    async def decode(self, data: str or bytes, loop: asyncio.AbstractEventLoop = None):
+        threshold = self.process_threshold
+        if threshold is None or len(data) < threshold:
+            return self.loads(data)
+        if not loop:
+            loop = asyncio.get_running_loop()
+        counters = self.counters
+        try:
+            res = await loop.run_in_executor(self.executor, orjson.loads, data)
+        except orjson.JSONDecodeError:
+            res = json.loads(data)
+            counters["fallback"] += 1
+            counters["fallback_size"] += len(data)
+            return res
+        counters["process"] += 1
+        counters["process_size"] += len(data)
+        return res
+
+    def reset_counters(self):
+        for key in self.counters:
+            self.counters[key] = 0
+
+    def acquire(self):
+        """register a user (socket) of this decoder"""
+        self._users += 1
+
+    def release(self):
+        """unregister a user, the last one shuts an own process pool down without waiting"""
+        self._users -= 1
+        if self._users <= 0:
+            self._users = 0
+            self.close(wait=False)
+
+    def close(self, wait: bool = True):
+        if self._owns_executor and self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+
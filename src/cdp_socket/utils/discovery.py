@@ -0,0 +1,153 @@
+import asyncio
+import random
+import typing
+
+if typing.TYPE_CHECKING:
+    import aiohttp  # imported on first use, it dominates the import time
+
+# target types /json lists with a webSocketDebuggerUrl
+DEBUGGABLE_TYPES = ("page", "iframe", "background_page", "service_worker", "shared_worker", "worker",
+                    "webview", "app", "other")
+
+
+def backoff(attempt: int, base: float = 0.05, cap: float = 1) -> float:
+    """full-jitter exponential backoff: random delay in ``[0, min(cap, base * 2 ** attempt)]``"""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class Discovery:
+    """
+    http discovery (``/json``, ``/json/version``) of a single browser over one pooled ``aiohttp`` session.
+
+    Requests are retried with jittered exponential backoff while the browser starts, ``/json/version``
+    is cached. With ``watch(browser_socket)``, ``targets()`` is answered from a table kept up to date by
+    ``Target.setDiscoverTargets`` events instead of an http round-trip.
+    """
+
+    def __init__(self, host: str, backoff_base: float = 0.05, backoff_cap: float = 1, limit: int = 10):
+        """
+        :param host: ``host:port`` of the remote-debugging endpoint
+        :param backoff_base: delay before the first retry (at most), doubled per retry
+        :param backoff_cap: maximum delay between retries
+        :param limit: maximum pooled http connections
+        """
+        self._host = host
+        self._backoff_base = backoff_base
+        self._backoff_cap = backoff_cap
+        self._limit = limit
+        self._session: "aiohttp.ClientSession" = None
+        self._version: dict = None
+        self._targets: typing.Dict[str, dict] = {}
+        self._watching = None
+        self.requests = 0
+        self.retries = 0
+
+    def _get_session(self) -> "aiohttp.ClientSession":
+        if self._session is None or self._session.closed:
+            import aiohttp
+            self._session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=self._limit))
+        return self._session
+
+    async def get_json(self, path: str = "/json", timeout: float or None = 10):
+        """
+        GET ``path``, retried until ``timeout``
+
+        :raises asyncio.TimeoutError: if there's no (json) response within ``timeout`` seconds
+        """
+        import aiohttp
+        loop = asyncio.get_running_loop()
+        url = f"http://{self._host}{path}"
+        deadline = None if timeout is None else loop.time() + timeout
+        attempt = 0
+        while True:
+            remaining = None if deadline is None else max(deadline - loop.time(), 0)
+            try:
+                self.requests += 1
+                async with self._get_session().get(url, timeout=aiohttp.ClientTimeout(total=remaining)) as resp:
+                    return await resp.json(content_type=None)
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                # ValueError: not (yet) a json body
+                delay = backoff(attempt, self._backoff_base, self._backoff_cap)
+                if deadline is not None and loop.time() + delay >= deadline:
+                    raise asyncio.TimeoutError(f"No response from {url} within {timeout} seconds") from e
+                self.retries += 1
+                attempt += 1
+                await asyncio.sleep(delay)
+
+    async def version(self, refresh: bool = False, timeout: float or None = 10) -> dict:
+        """``/json/version``, cached"""
+        if self._version is None or refresh:
+            self._version = await self.get_json("/json/version", timeout=timeout)
+        return self._version
+
+    async def targets(self, timeout: float or None = 10) -> typing.List[dict]:
+        """targets in the format of ``/json``, from the live table if ``watch()`` was called"""
+        if self.watching:
+            return list(self._targets.values())
+        return await self.get_json("/json", timeout=timeout)
+
+    async def watch(self, browser_socket, timeout: float = 10):
+        """keep the target table up to date with ``Target.targetCreated``/``targetInfoChanged``/``targetDestroyed``"""
+        if self._watching is browser_socket and not browser_socket.closed:
+            return
+        self._unwatch()
+        self._targets.clear()
+        browser_socket.add_listener("Target.targetCreated", self._on_target)
+        browser_socket.add_listener("Target.targetInfoChanged", self._on_target)
+        browser_socket.add_listener("Target.targetDestroyed", self._on_target_destroyed)
+        browser_socket.on_closed.append(self._on_closed)
+        self._watching = browser_socket
+        res = await browser_socket.exec("Target.getTargets", timeout=timeout)
+        for info in res["targetInfos"]:
+            self._update(info)
+        await browser_socket.exec("Target.setDiscoverTargets", {"discover": True}, timeout=timeout)
+
+    @property
+    def watching(self) -> bool:
+        return self._watching is not None and not self._watching.closed
+
+    def _unwatch(self):
+        socket, self._watching = self._watching, None
+        if socket is None:
+            return
+        for method, callback in (("Target.targetCreated", self._on_target),
+                                 ("Target.targetInfoChanged", self._on_target),
+                                 ("Target.targetDestroyed", self._on_target_destroyed)):
+            try:
+                socket.remove_listener(method, callback)
+            except ValueError:
+                pass
+        if self._on_closed in socket.on_closed:
+            socket.on_closed.remove(self._on_closed)
+
+    def _update(self, info: dict):
+        if info["type"] == "browser":
+            return
+        _id = info["targetId"]
+        target = {"description": "", "id": _id, "title": info.get("title", ""), "type": info["type"],
+                  "url": info.get("url", "")}
+        if info["type"] in DEBUGGABLE_TYPES:
+            target["webSocketDebuggerUrl"] = f"ws://{self._host}/devtools/page/{_id}"
+        self._targets[_id] = target
+
+    def _on_target(self, params: dict):
+        self._update(params["targetInfo"])
+
+    def _on_target_destroyed(self, params: dict):
+        self._targets.pop(params["targetId"], None)
+
+    # noinspection PyUnusedLocal
+    def _on_closed(self, code, reason):
+        self._watching = None
+
+    def get_target(self, target_id: str) -> typing.Optional[dict]:
+        return self._targets.get(target_id)
+
+    @property
+    def host(self):
+        return self._host
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
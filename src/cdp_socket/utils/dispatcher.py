@@ -0,0 +1,152 @@
+import asyncio
+import collections
+import inspect
+import time
+import typing
+
+BLOCK = "block"
+DROP_OLDEST = "drop_oldest"
+DROP_NEWEST = "drop_newest"
+COALESCE_LATEST = "coalesce_latest"
+POLICIES = (BLOCK, DROP_OLDEST, DROP_NEWEST, COALESCE_LATEST)
+
+
+class QueuedListener:
+    """
+    runs an event callback in its own worker task, fed by a bounded queue,
+    so a slow callback doesn't stall the receive loop (and with it ``exec`` responses)
+
+    overflow policies, once ``maxsize`` events are queued:
+
+    * ``block``: the receive loop waits for space (backpressure onto the websocket)
+    * ``drop_oldest``: discard the oldest queued event
+    * ``drop_newest``: discard the incoming event
+    * ``coalesce_latest``: only the latest event is kept, ``maxsize`` is ignored
+
+    With ``threaded=True``, synchronous callbacks run in the loop's default executor,
+    so CPU-heavy callbacks don't block the event loop either.
+    ``timer`` gets called with the duration of each callback (until its result is awaited).
+    """
+
+    def __init__(self, callback: callable, maxsize: int = 1000, policy: str = DROP_OLDEST,
+                 loop: asyncio.AbstractEventLoop = None, threaded: bool = False,
+                 timer: typing.Callable[[float], typing.Any] = None):
+        if policy not in POLICIES:
+            raise ValueError(f"policy must be one of {POLICIES}, got {policy!r}")
+        if maxsize < 1:
+            raise ValueError("maxsize must be >= 1")
+        self.callback = callback
+        self.policy = policy
+        self.maxsize = 1 if policy == COALESCE_LATEST else maxsize
+        self.threaded = threaded and not inspect.iscoroutinefunction(callback)
+        self.timer = timer
+        self._loop = loop
+        self._queue = collections.deque()
+        self._worker: asyncio.Task = None
+        self._not_empty: asyncio.Future = None
+        self._not_full: asyncio.Future = None
+        self._closed = False
+        self.processed = 0
+        self.dropped = 0
+        self.max_depth = 0
+
+    def put_nowait(self, params) -> bool:
+        """queue an event, applying the overflow policy; returns False if an event got dropped"""
+        if self._closed:
+            return False
+        queue = self._queue
+        dropped = False
+        if len(queue) >= self.maxsize:
+            if self.policy == DROP_NEWEST:
+                self.dropped += 1
+                return False
+            queue.popleft()  # drop_oldest, coalesce_latest, block (if called directly)
+            self.dropped += 1
+            dropped = True
+        queue.append(params)
+        if len(queue) > self.max_depth:
+            self.max_depth = len(queue)
+        self._wakeup()
+        return not dropped
+
+    async def put(self, params):
+        """queue an event, waiting for space with the ``block`` policy"""
+        if self.policy == BLOCK:
+            while len(self._queue) >= self.maxsize and not self._closed:
+                if self._not_full is None:
+                    self._not_full = self._get_loop().create_future()
+                await self._not_full
+        return self.put_nowait(params)
+
+    def _get_loop(self):
+        if self._loop is None:
+            self._loop = asyncio.get_running_loop()
+        return self._loop
+
+    def _wakeup(self):
+        if self._worker is None:
+            self._worker = self._get_loop().create_task(self._work())
+        waiter = self._not_empty
+        if waiter is not None and not waiter.done():
+            waiter.set_result(None)
+
+    async def _work(self):
+        from cdp_socket import EXC_HANDLER
+        queue = self._queue
+        while not self._closed:
+            if not queue:
+                self._not_empty = self._get_loop().create_future()
+                await self._not_empty
+                self._not_empty = None
+                continue
+            params = queue.popleft()
+            waiter = self._not_full
+            if waiter is not None:
+                self._not_full = None
+                if not waiter.done():
+                    waiter.set_result(None)
+            if self.timer is not None:
+                start = time.perf_counter()
+            try:
+                if self.threaded:
+                    res = await self._get_loop().run_in_executor(None, self.callback, params)
+                else:
+                    res = self.callback(params)
+                if inspect.isawaitable(res):
+                    await res
+            except Exception as e:
+                EXC_HANDLER(e)
+            if self.timer is not None:
+                # noinspection PyUnboundLocalVariable
+                self.timer(time.perf_counter() - start)
+            self.processed += 1
+
+    @property
+    def depth(self) -> int:
+        return len(self._queue)
+
+    def stats(self) -> dict:
+        return {"callback": getattr(self.callback, "__qualname__", repr(self.callback)), "policy": self.policy,
+                "maxsize": self.maxsize, "depth": len(self._queue), "max_depth": self.max_depth,
+                "processed": self.processed, "dropped": self.dropped}
+
+    def close(self):
+        self._closed = True
+        self._queue.clear()
+        for waiter in (self._not_full, self._not_empty):
+            if waiter is not None and not waiter.done():
+                waiter.set_result(None)
+        if self._worker is not None:
+            self._worker.cancel()
+            self._worker = None
+
+    def __eq__(self, other):
+        if isinstance(other, QueuedListener):
+            return other is self or other.callback == self.callback
+        return other == self.callback
+
+    def __hash__(self):
+        return hash(self.callback)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.callback!r}, maxsize={self.maxsize}, policy={self.policy!r})"
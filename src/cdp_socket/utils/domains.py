@@ -0,0 +1,156 @@
+import asyncio
+import contextvars
+import typing
+
+from cdp_socket.exceptions import CDPError
+
+# domains whose events flow without (or which have no) ``<Domain>.enable``
+NO_ENABLE = frozenset({"Target", "Browser", "Tracing", "IO", "Input", "SystemInfo", "Tethering", "Schema"})
+# set in the tasks sending our own enable/disable commands, to tell them from the user's
+_sending = contextvars.ContextVar("cdp_socket_domain_refs", default=False)
+
+
+class _Domain:
+    __slots__ = ("refs", "enabled", "manual", "task", "handle")
+
+    def __init__(self):
+        self.refs = 0
+        self.enabled = False
+        self.manual = False  # enabled by the user, never disabled automatically
+        self.task: asyncio.Task = None
+        self.handle: asyncio.TimerHandle = None
+
+
+class DomainRefs:
+    """
+    reference counts per CDP domain.
+    The first reference enables the domain, it gets disabled ``delay`` seconds
+    after the last reference is released (unless acquired again in the meantime).
+    A domain the user enabled with an own ``<Domain>.enable`` stays enabled until their ``<Domain>.disable``.
+    """
+
+    def __init__(self, _exec: typing.Callable[..., typing.Awaitable], loop: asyncio.AbstractEventLoop,
+                 delay: float = 1, skip: typing.Iterable[str] = NO_ENABLE):
+        """
+        :param _exec: ``exec`` of the socket or session
+        :param delay: debounce for disabling, in seconds
+        :param skip: domains which never get enabled or disabled
+        """
+        self._exec = _exec
+        self._loop = loop
+        self._delay = delay
+        self._skip = set(skip)
+        self._domains: typing.Dict[str, _Domain] = {}
+        self._closed = False
+        self.enables = 0
+        self.disables = 0
+
+    @staticmethod
+    def domain(method: str) -> str:
+        return method.split(".", 1)[0]
+
+    def acquire(self, method: str) -> typing.Optional[asyncio.Task]:
+        """
+        add a reference to the domain of ``method``
+
+        :return: a task to await until the domain is enabled, or None
+        """
+        domain = self.domain(method)
+        if self._closed or domain in self._skip:
+            return None
+        state = self._domains.get(domain)
+        if state is None:
+            state = self._domains[domain] = _Domain()
+        state.refs += 1
+        if state.handle is not None:
+            state.handle.cancel()
+            state.handle = None
+        if not state.enabled:
+            state.enabled = True
+            self.enables += 1
+            state.task = self._chain(domain, state, "enable")
+        return state.task
+
+    def release(self, method: str):
+        """remove a reference to the domain of ``method``"""
+        domain = self.domain(method)
+        state = self._domains.get(domain)
+        if state is None or state.refs == 0:
+            return
+        state.refs -= 1
+        if state.refs == 0 and not self._closed and not self._loop.is_closed():
+            if self._delay:
+                state.handle = self._loop.call_later(self._delay, self._disable, domain)
+            else:
+                self._disable(domain)
+
+    def observe(self, method: str):
+        """note an ``enable``/``disable`` command sent by the user"""
+        if not method.endswith((".enable", ".disable")) or _sending.get():
+            return
+        domain, _, command = method.partition(".")
+        state = self._domains.get(domain)
+        if state is None:
+            state = self._domains[domain] = _Domain()
+        if command == "enable":
+            state.manual = state.enabled = True
+            if state.handle is not None:
+                state.handle.cancel()
+                state.handle = None
+        else:
+            state.manual = state.enabled = False  # enabled again by the next reference
+
+    def _disable(self, domain: str):
+        state = self._domains[domain]
+        state.handle = None
+        if state.refs or state.manual or not state.enabled or domain in self._skip:
+            return
+        state.enabled = False
+        self.disables += 1
+        state.task = self._chain(domain, state, "disable")
+
+    def _chain(self, domain: str, state: _Domain, command: str) -> asyncio.Task:
+        # enable and disable of a domain run in order
+        prev = state.task
+
+        async def run():
+            from cdp_socket import EXC_HANDLER
+            _sending.set(True)  # in this task's context only
+            if prev is not None and not prev.done():
+                await asyncio.wait([prev])
+            if domain in self._skip:
+                return
+            try:
+                await self._exec(f"{domain}.{command}")
+            except CDPError as e:
+                if e.code == -32601:  # "'<Domain>.enable' wasn't found"
+                    self._skip.add(domain)
+                else:
+                    self._failed(state, command)
+                    EXC_HANDLER(e)
+            except Exception as e:
+                self._failed(state, command)
+                if not self._closed:
+                    EXC_HANDLER(e)
+
+        return self._loop.create_task(run())
+
+    @staticmethod
+    def _failed(state: _Domain, command: str):
+        if command == "enable":
+            state.enabled = False  # retry on the next acquire
+
+    def refs(self) -> typing.Dict[str, int]:
+        return {domain: state.refs for domain, state in self._domains.items() if state.refs}
+
+    @property
+    def enabled(self) -> typing.Set[str]:
+        return {domain for domain, state in self._domains.items() if state.enabled and domain not in self._skip}
+
+    def close(self):
+        """stop scheduling enable/disable commands, e.g. once the connection is closed"""
+        self._closed = True
+        for state in self._domains.values():
+            if state.handle is not None:
+                state.handle.cancel()
+                state.handle = None
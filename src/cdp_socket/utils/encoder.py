@@ -0,0 +1,127 @@
+import asyncio
+import json
+import typing
+
+import orjson
+import websockets
+from websockets.frames import Frame, Opcode
+
+from cdp_socket.exceptions import SocketExcitedError
+
+
+class FrameEncoder:
+    """
+    encodes commands to utf-8 bytes with orjson.
+    The ``{"method":"<method>","id":`` prefix is cached for up to ``max_cached`` methods.
+    """
+
+    def __init__(self, max_cached: int = 1024):
+        self._prefixes: typing.Dict[str, bytes] = {}
+        self._max_cached = max_cached
+
+    def _prefix(self, method: str) -> bytes:
+        prefix = self._prefixes.get(method)
+        if prefix is None:
+            prefix = b'{"method":' + orjson.dumps(method) + b',"id":'
+            if len(self._prefixes) < self._max_cached:
+                self._prefixes[method] = prefix
+        return prefix
+
+    def encode(self, _id: int, method: str, params: dict = None, session_id: str = None) -> bytes:
+        prefix = self._prefix(method)
+        if params:
+            try:
+                params = orjson.dumps(params)
+            except TypeError:  # orjson.JSONEncodeError, e.g. integers > 64 bit
+                params = json.dumps(params).encode()
+            frame = b'%s%d,"params":%s' % (prefix, _id, params)
+        else:
+            frame = b'%s%d' % (prefix, _id)
+        if session_id:
+            return frame + b',"sessionId":' + orjson.dumps(session_id) + b'}'
+        return frame + b'}'
+
+
+class FrameWriter:
+    """
+    writes pre-encoded frames as websocket text frames.
+
+    With ``coalesce=True``, frames written within the same event-loop iteration are
+    serialized into one buffer and handed to the transport with a single write and drain.
+    """
+
+    def __init__(self, ws: websockets.WebSocketClientProtocol, coalesce: bool = False,
+                 loop: asyncio.AbstractEventLoop = None):
+        if not loop:
+            loop = asyncio.get_running_loop()
+        self._ws = ws
+        self._loop = loop
+        self._coalesce = coalesce
+        self._queue: typing.List[bytes] = []
+        self._flushed: asyncio.Future = None
+        self._drain_task: asyncio.Task = None
+        # websockets' legacy protocol allows writing text frames from bytes without decoding
+        self._raw = hasattr(ws, "write_frame_sync") and hasattr(ws, "transport")
+        self.frames = 0
+        self.writes = 0
+
+    async def write(self, data: bytes):
+        if not self._raw:
+            self.frames += 1
+            self.writes += 1
+            await self._ws.send(data.decode())
+        elif self._coalesce:
+            if not self._ws.open:
+                await self._ws.ensure_open()
+            self._queue.append(data)
+            if self._flushed is None:
+                self._flushed = self._loop.create_future()
+                self._loop.call_soon(self._flush)
+            await asyncio.shield(self._flushed)
+        else:
+            await self.write_many([data])
+
+    async def write_many(self, frames: typing.List[bytes]):
+        """write multiple frames in one burst"""
+        if not self._raw:
+            for data in frames:
+                await self.write(data)
+            return
+        ws = self._ws
+        if not ws.open:
+            await ws.ensure_open()
+        self._write(frames)
+        await ws.drain()
+
+    def _write(self, frames: typing.List[bytes]):
+        ws = self._ws
+        mask, extensions = ws.is_client, ws.extensions
+        if len(frames) == 1:
+            buffer = Frame(Opcode.TEXT, frames[0]).serialize(mask=mask, extensions=extensions)
+        else:
+            buffer = b"".join(Frame(Opcode.TEXT, data).serialize(mask=mask, extensions=extensions) for data in frames)
+        ws.transport.write(buffer)
+        self.frames += len(frames)
+        self.writes += 1
+
+    def _flush(self):
+        frames, self._queue = self._queue, []
+        flushed, self._flushed = self._flushed, None
+        if not self._ws.open:
+            flushed.set_exception(SocketExcitedError("websocket isn't open"))
+            return
+        try:
+            self._write(frames)
+        except Exception as e:
+            flushed.set_exception(e)
+            return
+
+        async def drain():
+            try:
+                await self._ws.drain()
+            except Exception as e:
+                flushed.set_exception(e)
+            else:
+                flushed.set_result(None)
+
+        self._drain_task = asyncio.ensure_future(drain())
@@ -0,0 +1,71 @@
+import typing
+from collections.abc import Mapping
+
+from cdp_socket.utils.decoder import loads
+
+
+def peek_frame(data: str or bytes) -> typing.Tuple[typing.Optional[int], typing.Optional[str]]:
+    """
+    cheaply find the id (responses) or the method (events) of a frame without parsing it.
+    relies on Chrome serializing ``id`` resp. ``method`` as the first key.
+
+    :returns: ``(id, method)``, ``(None, None)`` if the frame can't be pre-routed
+    """
+    if isinstance(data, str):
+        if data.startswith('{"method":"'):
+            end = data.find('"', 11)
+            if end != -1:
+                return None, data[11:end]
+        elif data.startswith('{"id":'):
+            end = data.find(',', 6)
+            if end != -1:
+                try:
+                    return int(data[6:end]), None
+                except ValueError:
+                    pass
+    return None, None
+
+
+def peek_session_id(data: str or bytes) -> typing.Optional[str]:
+    """find the ``sessionId`` of a (flat mode) frame, which Chrome serializes as the last key"""
+    if isinstance(data, str) and data.endswith('"}'):
+        idx = data.rfind(',"sessionId":"')
+        if idx != -1:
+            return data[idx + 14:-2]
+
+
+class LazyParams(Mapping):
+    """read-only event params, decoded from the raw frame on first access and shared by all callbacks"""
+    __slots__ = ("_raw", "_params", "_loads")
+
+    def __init__(self, raw: str or bytes, _loads: callable = loads):
+        self._raw = raw
+        self._params = None
+        self._loads = _loads
+
+    def _load(self) -> dict:
+        if self._params is None:
+            self._params = self._loads(self._raw).get("params", {})
+            self._raw = None
+        return self._params
+
+    @property
+    def loaded(self) -> bool:
+        return self._params is not None
+
+    def to_dict(self) -> dict:
+        return self._load()
+
+    def __getitem__(self, key):
+        return self._load()[key]
+
+    def __iter__(self):
+        return iter(self._load())
+
+    def __len__(self):
+        return len(self._load())
+
+    def __repr__(self):
+        if self._params is None:
+            return f"{self.__class__.__name__}(<{len(self._raw)} bytes not decoded>)"
+        return f"{self.__class__.__name__}({self._params!r})"
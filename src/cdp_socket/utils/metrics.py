@@ -0,0 +1,229 @@
+import asyncio
+import bisect
+import time
+import typing
+import weakref
+
+import websockets
+
+from cdp_socket.exceptions import CDPError, SocketExcitedError
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: typing.Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last one: +Inf
+        self.sum = 0.
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> typing.Optional[float]:
+        """upper bound of the bucket containing the ``q`` quantile"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def snapshot(self) -> dict:
+        return {"count": self.count, "sum": self.sum, "p50": self.quantile(0.5), "p99": self.quantile(0.99),
+                "buckets": dict(zip(self.buckets + (float("inf"),), self.counts))}
+
+
+class Tracer:
+    """hook points for custom tracers, see ``Metrics.add_tracer``. Override what's needed."""
+
+    def request_start(self, method: str, params: dict, session_id: str = None) -> typing.Any:
+        """called before a command is written, the return value is passed to ``request_end``"""
+
+    def request_end(self, token: typing.Any, method: str, duration: float, error: BaseException = None):
+        pass
+
+    def event(self, method: str, duration: float):
+        """called after an event got dispatched to its inline listeners"""
+
+
+class Metrics:
+    """
+    opt-in instrumentation, pass the same instance to any number of sockets:
+    ``SingleCDPSocket(url, metrics=Metrics())`` or ``CDPSocket(port, metrics=Metrics())``.
+
+    Tracks per-method request counts and latency, failures (error response, timeout, cancelled or
+    lost connection), bytes and frames sent and received, decode time, time spent in listeners,
+    pending requests and background tasks.
+    Read it with ``snapshot()`` or ``prometheus()``.
+    """
+
+    def __init__(self, buckets: typing.Sequence[float] = LATENCY_BUCKETS):
+        self._buckets = buckets
+        self.requests: typing.Dict[str, Histogram] = {}
+        self.errors: typing.Dict[str, int] = {}
+        self.timeouts: typing.Dict[str, int] = {}
+        self.cancelled: typing.Dict[str, int] = {}
+        self.disconnected: typing.Dict[str, int] = {}
+        self.events: typing.Dict[str, int] = {}
+        self.callbacks: typing.Dict[typing.Tuple[str, str], Histogram] = {}
+        self.decode = Histogram(buckets)
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.frames_sent = 0
+        self.frames_received = 0
+        self._sockets: typing.List[weakref.ref] = []
+        self._tracers: typing.List[Tracer] = []
+
+    def register(self, socket):
+        """count the pending requests of ``socket`` in snapshots"""
+        self._sockets = [ref for ref in self._sockets if ref() is not None]
+        self._sockets.append(weakref.ref(socket))
+
+    def add_tracer(self, tracer: Tracer):
+        self._tracers.append(tracer)
+
+    def remove_tracer(self, tracer: Tracer):
+        self._tracers.remove(tracer)
+
+    def request_started(self, request):
+        """track a ``PendingRequest`` until its future is done"""
+        tokens = None
+        if self._tracers:
+            tokens = [tracer.request_start(request.method, request.params, request.session_id)
+                      for tracer in self._tracers]
+        start = time.perf_counter()
+        method = request.method
+
+        def done(fut: asyncio.Future):
+            duration = time.perf_counter() - start
+            if fut.cancelled():
+                # gave up on, not a latency sample
+                error = asyncio.CancelledError()
+                self.cancelled[method] = self.cancelled.get(method, 0) + 1
+            else:
+                error = fut.exception()
+            if error is None:
+                histogram = self.requests.get(method)
+                if histogram is None:
+                    histogram = self.requests[method] = Histogram(self._buckets)
+                histogram.observe(duration)
+            elif isinstance(error, asyncio.TimeoutError):
+                self.timeouts[method] = self.timeouts.get(method, 0) + 1
+            elif isinstance(error, CDPError):
+                self.errors[method] = self.errors.get(method, 0) + 1
+            elif isinstance(error, (SocketExcitedError, websockets.exceptions.ConnectionClosed)):
+                # failed by fail_all
+                self.disconnected[method] = self.disconnected.get(method, 0) + 1
+            if tokens is not None:
+                for tracer, token in zip(self._tracers, tokens):
+                    tracer.request_end(token, method, duration, error)
+
+        request.future.add_done_callback(done)
+
+    def sent(self, n_bytes: int, n_frames: int = 1):
+        self.bytes_sent += n_bytes
+        self.frames_sent += n_frames
+
+    def received(self, n_bytes: int):
+        self.bytes_received += n_bytes
+        self.frames_received += 1
+
+    def decoded(self, duration: float):
+        self.decode.observe(duration)
+
+    def dispatched(self, method: str, duration: float):
+        self.events[method] = self.events.get(method, 0) + 1
+        for tracer in self._tracers:
+            tracer.event(method, duration)
+
+    def callback_done(self, method: str, callback: callable, duration: float):
+        key = (method, getattr(callback, "__qualname__", None) or repr(callback))
+        histogram = self.callbacks.get(key)
+        if histogram is None:
+            histogram = self.callbacks[key] = Histogram(self._buckets)
+        histogram.observe(duration)
+
+    @property
+    def pending(self) -> int:
+        sockets = (ref() for ref in self._sockets)
+        return sum(len(socket.pending) for socket in sockets if socket is not None)
+
+    @property
+    def background_tasks(self) -> int:
+        from cdp_socket.socket import background_tasks
+        return len(background_tasks)
+
+    def snapshot(self) -> dict:
+        return {
+            "requests": {method: histogram.snapshot() for method, histogram in self.requests.items()},
+            "errors": dict(self.errors), "timeouts": dict(self.timeouts),
+            "cancelled": dict(self.cancelled), "disconnected": dict(self.disconnected),
+            "events": dict(self.events),
+            "callbacks": {f"{method}:{name}": histogram.snapshot()
+                          for (method, name), histogram in self.callbacks.items()},
+            "decode": self.decode.snapshot(),
+            "bytes_sent": self.bytes_sent, "bytes_received": self.bytes_received,
+            "frames_sent": self.frames_sent, "frames_received": self.frames_received,
+            "pending": self.pending, "background_tasks": self.background_tasks,
+        }
+
+    def prometheus(self, prefix: str = "cdp_socket") -> str:
+        """snapshot in the prometheus text exposition format"""
+        lines = []
+
+        def metric(name: str, kind: str, doc: str):
+            lines.append(f"# HELP {prefix}_{name} {doc}")
+            lines.append(f"# TYPE {prefix}_{name} {kind}")
+
+        def histogram(name: str, _histogram: Histogram, labels: str = ""):
+            cumulative = 0
+            for bound, count in zip(_histogram.buckets + (float("inf"),), _histogram.counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(float(bound))
+                lines.append(f'{prefix}_{name}_bucket{{{labels}{"," if labels else ""}le="{le}"}} {cumulative}')
+            braces = f"{{{labels}}}" if labels else ""
+            lines.append(f"{prefix}_{name}_sum{braces} {_histogram.sum}")
+            lines.append(f"{prefix}_{name}_count{braces} {_histogram.count}")
+
+        metric("request_duration_seconds", "histogram", "time until the response of a command")
+        for method, _histogram in sorted(self.requests.items()):
+            histogram("request_duration_seconds", _histogram, f'method="{_escape(method)}"')
+        metric("request_failures_total", "counter",
+               "commands failed with an error response, timeout or lost connection, or cancelled")
+        for reason, counts in (("error", self.errors), ("timeout", self.timeouts), ("cancelled", self.cancelled),
+                               ("disconnected", self.disconnected)):
+            for method, count in sorted(counts.items()):
+                lines.append(f'{prefix}_request_failures_total{{method="{_escape(method)}",reason="{reason}"}} {count}')
+        metric("events_total", "counter", "events dispatched to listeners")
+        for method, count in sorted(self.events.items()):
+            lines.append(f'{prefix}_events_total{{method="{_escape(method)}"}} {count}')
+        metric("callback_duration_seconds", "histogram", "time spent in listeners")
+        for (method, name), _histogram in sorted(self.callbacks.items()):
+            histogram("callback_duration_seconds", _histogram,
+                      f'method="{_escape(method)}",callback="{_escape(name)}"')
+        metric("decode_duration_seconds", "histogram", "time spent decoding frames")
+        histogram("decode_duration_seconds", self.decode)
+        for name, value, doc in (("sent_bytes_total", self.bytes_sent, "bytes written"),
+                                 ("received_bytes_total", self.bytes_received, "bytes received"),
+                                 ("sent_frames_total", self.frames_sent, "frames written"),
+                                 ("received_frames_total", self.frames_received, "frames received")):
+            metric(name, "counter", doc)
+            lines.append(f"{prefix}_{name} {value}")
+        for name, value, doc in (("pending_requests", self.pending, "commands waiting for a response"),
+                                 ("background_tasks", self.background_tasks, "running background tasks")):
+            metric(name, "gauge", doc)
+            lines.append(f"{prefix}_{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
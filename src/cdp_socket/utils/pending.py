@@ -0,0 +1,169 @@
+import asyncio
+import heapq
+import typing
+
+
+class PendingRequest:
+    __slots__ = ("id", "method", "params", "session_id", "future", "timeout", "deadline")
+
+    def __init__(self, _id: int, method: str, params: dict, session_id: str, future: asyncio.Future,
+                 timeout: float = None, deadline: float = None):
+        self.id = _id
+        self.method = method
+        self.params = params
+        self.session_id = session_id
+        self.future = future
+        self.timeout = timeout
+        self.deadline = deadline
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(id={self.id}, method={self.method!r}, deadline={self.deadline})"
+
+
+class PendingTable:
+    """
+    requests waiting for a response, by id.
+
+    Deadlines are kept in a heap and expired in batches by a single timer per table
+    (instead of an ``asyncio.wait_for`` task and timer per request).
+    Responses for requests which already timed out are counted as ``late``,
+    responses for ids which were never requested (here) as ``orphaned``.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, resolution: float = 0.01, history: int = 4096):
+        """
+        :param resolution: requests expiring within this many seconds get expired together
+        :param history: how many timed-out ids are remembered to tell late from orphaned responses
+        """
+        self._loop = loop
+        self._resolution = resolution
+        self._history = history
+        self._requests: typing.Dict[int, PendingRequest] = {}
+        self._deadlines: typing.List[typing.Tuple[float, int]] = []
+        self._timer: asyncio.TimerHandle = None
+        self._timer_at: float = None
+        self._expired_ids: typing.Dict[int, None] = {}
+        self.expired = 0
+        self.late = 0
+        self.orphaned = 0
+
+    def add(self, _id: int, method: str, params: dict = None, timeout: float = None,
+            session_id: str = None) -> PendingRequest:
+        deadline = None if timeout is None else self._loop.time() + timeout
+        request = PendingRequest(_id, method, params, session_id, self._loop.create_future(), timeout, deadline)
+        self._requests[_id] = request
+        if deadline is not None:
+            heapq.heappush(self._deadlines, (deadline, _id))
+            if self._timer_at is None or deadline < self._timer_at:
+                self._schedule(deadline)
+        return request
+
+    def get(self, _id: int) -> typing.Optional[PendingRequest]:
+        return self._requests.get(_id)
+
+    def pop(self, _id: int) -> typing.Optional[PendingRequest]:
+        """remove a request without resolving it (cancels its future)"""
+        request = self._requests.pop(_id, None)
+        if request is not None and not request.future.done():
+            request.future.cancel()
+        return request
+
+    def __contains__(self, _id: int):
+        return _id in self._requests
+
+    def __len__(self):
+        return len(self._requests)
+
+    def __iter__(self):
+        return iter(list(self._requests.values()))
+
+    def _unknown(self, _id: int):
+        if _id in self._expired_ids:
+            self.late += 1
+            del self._expired_ids[_id]
+        else:
+            self.orphaned += 1
+
+    def discard(self, _id: int):
+        """account for a response nobody is waiting for"""
+        if _id not in self._requests:
+            self._unknown(_id)
+
+    def resolve(self, _id: int, result):
+        request = self._requests.pop(_id, None)
+        if request is None:
+            self._unknown(_id)
+        else:
+            if not request.future.done():
+                request.future.set_result(result)
+            if len(self._deadlines) > 1024:
+                self._compact()
+
+    def reject(self, _id: int, exc: BaseException):
+        request = self._requests.pop(_id, None)
+        if request is None:
+            self._unknown(_id)
+        else:
+            if not request.future.done():
+                request.future.set_exception(exc)
+            if len(self._deadlines) > 1024:
+                self._compact()
+
+    def _compact(self):
+        # resolved requests stay in the heap until their deadline, drop them once they dominate it
+        if len(self._deadlines) > 4 * len(self._requests):
+            self._deadlines = [(deadline, _id) for deadline, _id in self._deadlines if _id in self._requests]
+            heapq.heapify(self._deadlines)
+
+    def fail_all(self, exc: BaseException, keep: typing.Callable[[PendingRequest], bool] = None
+                 ) -> typing.List[PendingRequest]:
+        """
+        fail every pending request at once
+
+        :param keep: requests for which this returns ``True`` stay pending (and get returned)
+        """
+        requests, self._requests = self._requests, {}
+        kept = []
+        for request in requests.values():
+            if keep is not None and keep(request):
+                self._requests[request.id] = request
+                kept.append(request)
+            elif not request.future.done():
+                request.future.set_exception(exc)
+        if not self._requests:
+            self._deadlines.clear()
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = self._timer_at = None
+        return kept
+
+    def _schedule(self, deadline: float):
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer_at = deadline
+        self._timer = self._loop.call_at(deadline + self._resolution, self._expire)
+
+    def _expire(self):
+        self._timer = self._timer_at = None
+        now = self._loop.time()
+        deadlines = self._deadlines
+        while deadlines and deadlines[0][0] <= now:
+            _, _id = heapq.heappop(deadlines)
+            request = self._requests.get(_id)
+            if request is None or request.deadline is None or request.deadline > now:
+                continue  # already resolved
+            del self._requests[_id]
+            self.expired += 1
+            self._expired_ids[_id] = None
+            if len(self._expired_ids) > self._history:
+                del self._expired_ids[next(iter(self._expired_ids))]
+            if not request.future.done():
+                request.future.set_exception(asyncio.TimeoutError(
+                    f'got no response for method: "{request.method}", params: {request.params}'
+                    f"\nwithin {request.timeout} seconds"))
+        if deadlines:
+            self._schedule(deadlines[0][0])
+
+    def stats(self) -> dict:
+        return {"pending": len(self._requests), "expired": self.expired, "late": self.late,
+                "orphaned": self.orphaned}
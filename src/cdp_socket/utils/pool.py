@@ -0,0 +1,380 @@
+import asyncio
+import collections
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+import typing
+
+from cdp_socket.utils.discovery import backoff
+from cdp_socket.utils.utils import find_chrome_executable, IS_POSIX
+
+DEVTOOLS_LISTENING = re.compile(r"DevTools listening on (ws://([^/\s]+)/devtools/browser/\S+)")
+
+
+class ChromeProcess:
+    """
+    a launched browser. Its stderr is drained by a daemon thread (the last ``tail`` lines are kept),
+    so the process never blocks on a full pipe.
+    """
+
+    def __init__(self, process: subprocess.Popen, data_dir: str, remove_data_dir: bool = False, tail: int = 100):
+        self.process = process
+        self.data_dir = data_dir
+        self.ws_url: str = None
+        self.host: str = None
+        self.launched_at = time.perf_counter()
+        self.ready_after: float = None  # seconds
+        self.stderr_tail: typing.Deque[str] = collections.deque(maxlen=tail)
+        self._remove_data_dir = remove_data_dir
+        self._listening = threading.Event()
+        self._thread = threading.Thread(target=self._drain, daemon=True)
+        self._thread.start()
+
+    def _drain(self):
+        for line in iter(self.process.stderr.readline, b""):
+            line = line.decode(errors="replace").rstrip()
+            self.stderr_tail.append(line)
+            if self.ws_url is None:
+                match = DEVTOOLS_LISTENING.search(line)
+                if match:
+                    self.ws_url, self.host = match.group(1), match.group(2)
+                    self._listening.set()
+        self.process.stderr.close()
+
+    def _read_active_port(self) -> bool:
+        # <data_dir>/DevToolsActivePort: "<port>\n/devtools/browser/<id>"
+        try:
+            with open(os.path.join(self.data_dir, "DevToolsActivePort")) as f:
+                port, path = f.read().split("\n")[:2]
+        except (OSError, ValueError):
+            return False
+        if not port.strip().isdigit() or not path.strip():
+            return False
+        self.host = f"127.0.0.1:{port.strip()}"
+        self.ws_url = f"ws://{self.host}{path.strip()}"
+        return True
+
+    async def wait_ready(self, timeout: float = 30, poll: float = 0.01):
+        """
+        wait for the ``DevTools listening on ws://...`` line on stderr or the ``DevToolsActivePort`` file
+
+        :raises RuntimeError: if the process exits first
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while not (self._listening.is_set() or self._read_active_port()):
+            if self.process.poll() is not None:
+                self._thread.join(1)
+                tail = "\n".join(self.stderr_tail)
+                raise RuntimeError(f"browser exited with code {self.process.returncode} before listening:\n{tail}")
+            if loop.time() > deadline:
+                raise asyncio.TimeoutError(f"browser didn't start listening within {timeout} seconds")
+            await asyncio.sleep(poll)
+        self.ready_after = time.perf_counter() - self.launched_at
+        return self
+
+    @property
+    def port(self) -> typing.Optional[int]:
+        return int(self.host.rsplit(":", 1)[1]) if self.host else None
+
+    @property
+    def pid(self):
+        return self.process.pid
+
+    def kill(self, timeout: float = 5):
+        if self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        if self._remove_data_dir:
+            shutil.rmtree(self.data_dir, ignore_errors=True)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(pid={self.pid}, host={self.host!r})"
+
+
+def launch(data_dir: str = None, binary_path: str = None, args: typing.List[str] = None,
+           profile_template: str = None) -> ChromeProcess:
+    """
+    launch a browser with ``--remote-debugging-port=0``, await ``.wait_ready()`` for its address
+
+    :param data_dir: user data dir, a temporary directory (removed on ``kill()``) by default
+    :param profile_template: user data dir to copy into ``data_dir`` first
+    """
+    if not binary_path:
+        binary_path = find_chrome_executable()
+    if args is None:
+        args = []
+        if IS_POSIX:
+            args.append("--password-store=basic")
+    remove_data_dir = data_dir is None
+    if data_dir is None:
+        data_dir = tempfile.mkdtemp(prefix="cdp_socket_")
+    try:
+        if profile_template:
+            if os.path.isdir(data_dir) and not os.listdir(data_dir):
+                os.rmdir(data_dir)
+            shutil.copytree(profile_template, data_dir)
+        os.makedirs(data_dir, exist_ok=True)
+        try:
+            os.remove(os.path.join(data_dir, "DevToolsActivePort"))
+        except FileNotFoundError:
+            pass
+        process = subprocess.Popen(
+            [binary_path, *args, f"--user-data-dir={data_dir}", "--remote-debugging-port=0"],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            close_fds=IS_POSIX,
+        )
+    except BaseException:
+        if remove_data_dir:
+            shutil.rmtree(data_dir, ignore_errors=True)
+        raise
+    return ChromeProcess(process, data_dir, remove_data_dir=remove_data_dir)
+
+
+class ChromePool:
+    """
+    keeps ``size`` launched and ready browsers, so the cold start isn't on the request path.
+
+    Every browser gets a fresh copy of ``profile_template`` (if given). ``acquire()`` hands out a ready
+    browser and launches its replacement in the background, ``release()`` kills it and removes its profile.
+    With ``recycle=True``, the pool owns at most ``size`` browsers instead: ``release()`` closes the browser's
+    pages, opens a blank one and hands the browser out again (cookies, storage and cache persist within its profile),
+    ``acquire()`` waits for a release if all are in use.
+
+    A failed launch is retried ``retries`` times with backoff, then callers waiting in ``acquire()`` get its error.
+
+    .. code-block:: python
+
+        async with ChromePool(size=2) as pool:
+            async with pool.browser() as chrome:
+                async with await CDPSocket(chrome.port) as base_socket:
+                    ...
+    """
+
+    def __init__(self, size: int = 2, binary_path: str = None, args: typing.List[str] = None,
+                 profile_template: str = None, timeout: float = 30, recycle: bool = False, retries: int = 2):
+        """
+        :param size: browsers kept ready
+        :param profile_template: user data dir copied for every browser
+        :param timeout: for a browser to start listening
+        :param recycle: reset and reuse released browsers instead of killing them
+        :param retries: launch attempts after the first failed one, before waiting callers get the error
+        """
+        self._size = size
+        self._binary_path = binary_path
+        self._args = args
+        self._profile_template = profile_template
+        self._timeout = timeout
+        self._recycle = recycle
+        self._retries = retries
+        self._ready: typing.Deque[ChromeProcess] = collections.deque()
+        self._waiters: typing.Deque[asyncio.Future] = collections.deque()
+        self._launching: typing.Set[asyncio.Task] = set()
+        self._in_use: typing.Set[ChromeProcess] = set()
+        self._started = False
+        self._closed = False
+        self.launched = 0
+        self.failed = 0
+        self.recycled = 0
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *args, **kwargs):
+        await self.close()
+
+    def __await__(self):
+        return self.start().__await__()
+
+    async def start(self, wait: bool = True):
+        """launch the pool's browsers, ``wait`` until they are ready"""
+        self._started = True
+        for _ in range(self._missing()):
+            self._refill()
+        if wait and self._launching:
+            await asyncio.wait(set(self._launching))
+        return self
+
+    def _missing(self) -> int:
+        owned = len(self._ready) + len(self._launching)
+        if self._recycle:
+            owned += len(self._in_use)
+        return self._size - owned
+
+    def _refill(self):
+        task = asyncio.ensure_future(self._launch())
+        self._launching.add(task)
+        task.add_done_callback(self._launching.discard)
+
+    async def _launch(self):
+        from cdp_socket import EXC_HANDLER
+        for attempt in range(self._retries + 1):
+            if attempt:
+                await asyncio.sleep(backoff(attempt, base=0.5, cap=5))
+            try:
+                chrome = await self._launch_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.failed += 1
+                EXC_HANDLER(e)
+                error = e
+                continue
+            if self._closed:
+                await asyncio.get_running_loop().run_in_executor(None, chrome.kill)
+            else:
+                self._put(chrome)
+            return
+        # noinspection PyUnboundLocalVariable
+        self._fail(error)
+
+    async def _launch_once(self) -> ChromeProcess:
+        loop = asyncio.get_running_loop()
+        # copying the profile may take a while
+        launching = loop.run_in_executor(None, lambda: launch(binary_path=self._binary_path, args=self._args,
+                                                              profile_template=self._profile_template))
+        try:
+            chrome = await asyncio.shield(launching)
+        except asyncio.CancelledError:
+            # the executor can't be interrupted, kill the browser it still starts
+            try:
+                chrome = await launching
+            except Exception:
+                raise asyncio.CancelledError()
+            await loop.run_in_executor(None, chrome.kill)
+            raise
+        self.launched += 1
+        try:
+            return await chrome.wait_ready(self._timeout)
+        except BaseException:
+            await loop.run_in_executor(None, chrome.kill)
+            raise
+
+    def _put(self, chrome: ChromeProcess):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(chrome)
+                return
+        self._ready.append(chrome)
+
+    def _fail(self, error: Exception):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_exception(error)
+
+    async def acquire(self, timeout: float = None) -> ChromeProcess:
+        """
+        a ready browser (waits for one if none is ready)
+
+        :raises: the launch error, if launching a browser failed ``retries + 1`` times
+        """
+        if self._closed:
+            raise RuntimeError("pool is closed")
+        if not self._started:
+            await self.start(wait=False)
+        loop = asyncio.get_running_loop()
+        while True:
+            if self._ready:
+                chrome = self._ready.popleft()
+            else:
+                if self._missing() > 0:
+                    self._refill()  # all launches failed
+                waiter = loop.create_future()
+                self._waiters.append(waiter)
+                try:
+                    chrome = await asyncio.wait_for(asyncio.shield(waiter), timeout)
+                except BaseException:
+                    if waiter.done() and not waiter.cancelled() and waiter.exception() is None:
+                        self._put(waiter.result())  # handed over just now
+                    else:
+                        waiter.cancel()
+                    raise
+            if chrome.process.poll() is None:
+                break
+            await loop.run_in_executor(None, chrome.kill)
+            if self._recycle and not self._closed:
+                self._refill()
+        self._in_use.add(chrome)
+        if not self._recycle:
+            self._refill()
+        return chrome
+
+    async def release(self, chrome: ChromeProcess):
+        """kill a browser and remove its profile, or reset and reuse it with ``recycle``"""
+        if self._recycle and not self._closed:
+            try:
+                await self._reset(chrome)  # still counted as in use meanwhile
+            except Exception:
+                pass
+            else:
+                self._in_use.discard(chrome)
+                if self._closed:
+                    await asyncio.get_running_loop().run_in_executor(None, chrome.kill)
+                else:
+                    self.recycled += 1
+                    self._put(chrome)
+                return
+        self._in_use.discard(chrome)
+        await asyncio.get_running_loop().run_in_executor(None, chrome.kill)
+        if self._recycle and not self._closed:
+            self._refill()
+
+    async def _reset(self, chrome: ChromeProcess):
+        from cdp_socket.socket import SingleCDPSocket
+        async with SingleCDPSocket(chrome.ws_url, timeout=self._timeout) as sock:
+            targets = (await sock.exec("Target.getTargets", timeout=self._timeout))["targetInfos"]
+            await sock.exec("Target.createTarget", {"url": "about:blank"}, timeout=self._timeout)
+            for target in targets:
+                if target["type"] == "page":
+                    await sock.exec("Target.closeTarget", {"targetId": target["targetId"]}, timeout=self._timeout)
+
+    def browser(self, timeout: float = None):
+        """``async with pool.browser() as chrome``"""
+        return _Borrowed(self, timeout)
+
+    @property
+    def ready(self) -> int:
+        return len(self._ready)
+
+    def stats(self) -> dict:
+        return {"ready": self.ready, "launching": len(self._launching), "in_use": len(self._in_use),
+                "launched": self.launched, "failed": self.failed, "recycled": self.recycled}
+
+    async def close(self):
+        self._closed = True
+        for task in list(self._launching):
+            task.cancel()
+        if self._launching:
+            await asyncio.wait(set(self._launching))
+        self._fail(RuntimeError("pool is closed"))
+        browsers = [*self._in_use, *self._ready]
+        self._in_use.clear()
+        self._ready.clear()
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(None, chrome.kill) for chrome in browsers))
+
+
+class _Borrowed:
+    def __init__(self, pool: ChromePool, timeout: float = None):
+        self._pool = pool
+        self._timeout = timeout
+        self._chrome: ChromeProcess = None
+
+    async def __aenter__(self) -> ChromeProcess:
+        self._chrome = await self._pool.acquire(self._timeout)
+        return self._chrome
+
+    async def __aexit__(self, *args, **kwargs):
+        await self._pool.release(self._chrome)
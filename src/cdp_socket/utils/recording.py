@@ -0,0 +1,97 @@
+import mmap
+import os
+import struct
+import time
+import typing
+
+MAGIC = b"CDPREC1\n"
+HEADER = struct.Struct("<d")  # wall-clock start
+RECORD = struct.Struct("<BdI")  # direction, seconds since start, payload length
+IN, OUT = 0, 1
+
+
+class Record(typing.NamedTuple):
+    direction: int  # IN: received from the browser, OUT: sent to it
+    timestamp: float  # seconds since the recording started
+    data: bytes
+
+
+class Recorder:
+    """
+    appends frames to a compact log: ``MAGIC``, the start time, then per frame
+    ``direction (u8), seconds since start (f64), length (u32), utf-8 payload``, little-endian
+
+    ``SingleCDPSocket(url, recorder=Recorder("session.cdprec"))`` records every frame of the socket.
+    """
+
+    def __init__(self, file: typing.Union[str, os.PathLike, typing.BinaryIO], buffering: int = 2 ** 16):
+        if isinstance(file, (str, os.PathLike)):
+            self._file = open(file, "wb", buffering=buffering)
+            self._owns_file = True
+        else:
+            self._file = file
+            self._owns_file = False
+        self._start = time.perf_counter()
+        self._file.write(MAGIC + HEADER.pack(time.time()))
+        self.frames = 0
+        self.bytes = 0
+
+    def record(self, direction: int, data: str or bytes):
+        if isinstance(data, str):
+            data = data.encode()
+        self._file.write(RECORD.pack(direction, time.perf_counter() - self._start, len(data)))
+        self._file.write(data)
+        self.frames += 1
+        self.bytes += len(data)
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        if self._owns_file:
+            self._file.close()
+        else:
+            self._file.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class Recording:
+    """a recording, read through ``mmap`` without loading it into memory"""
+
+    def __init__(self, path: typing.Union[str, os.PathLike]):
+        self._f = open(path, "rb")
+        self._mmap = mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(f"{path} isn't a cdp_socket recording")
+        self.started_at, = HEADER.unpack_from(self._mmap, len(MAGIC))
+
+    def __iter__(self) -> typing.Iterator[Record]:
+        buffer = self._mmap
+        offset = len(MAGIC) + HEADER.size
+        size = len(buffer)
+        while offset + RECORD.size <= size:
+            direction, timestamp, length = RECORD.unpack_from(buffer, offset)
+            offset += RECORD.size
+            if offset + length > size:
+                break  # truncated, e.g. still being written
+            yield Record(direction, timestamp, buffer[offset:offset + length])
+            offset += length
+
+    def inbound(self) -> typing.Iterator[Record]:
+        return (record for record in self if record.direction == IN)
+
+    def close(self):
+        self._mmap.close()
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -120,8 +120,9 @@ def launch_chrome(data_dir_path: str, port: int, binary_path: str = None, args:
     process = subprocess.Popen(
         [binary_path, *args],
         stdin=subprocess.PIPE,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
+        # never read, a full pipe would block the browser
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
         close_fds=IS_POSIX,
     )
     return process
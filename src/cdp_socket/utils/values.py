@@ -0,0 +1,313 @@
+import math
+import typing
+from collections.abc import Mapping, Sequence
+
+# "unserializableValue"s and special deep-serialized numbers
+_NUMBERS = {"NaN": math.nan, "Infinity": math.inf, "-Infinity": -math.inf, "-0": -0.0}
+_LISTS = frozenset(("array", "set"))
+_DICTS = frozenset(("object", "map"))
+_CONTAINERS = _LISTS | _DICTS
+# serialized as-is (date as its ISO string)
+_PLAIN = frozenset(("string", "boolean", "date"))
+_NONE = frozenset(("undefined", "null"))
+
+
+def _primitive(node: dict):
+    _type = node["type"]
+    if _type in _PLAIN:
+        return node["value"]
+    if _type == "number":
+        value = node["value"]
+        return _NUMBERS[value] if value.__class__ is str else value
+    if _type in _NONE:
+        return None
+    if _type == "bigint":
+        return int(node["value"])
+    if _type == "regexp":
+        return node["value"]  # {"pattern": ..., "flags": ...}
+    return node  # function, node, window, promise, ...: no python equivalent
+
+
+def _key(key):
+    # object keys are strings, map keys might be any serialized value
+    if key.__class__ is str:
+        return key
+    key = from_deep(key)
+    try:
+        hash(key)
+    except TypeError:
+        return repr(key)
+    return key
+
+
+def from_deep(node: dict):
+    """
+    convert a ``deepSerializedValue`` (``serializationOptions={"serialization": "deep"}``) to plain python objects,
+    without recursion: arrays and sets become lists, objects and maps dicts,
+    ``undefined`` and ``null`` ``None``, ``NaN``/``Infinity``/``-0`` floats and bigints ints.
+    Values without a python equivalent (functions, nodes, ...) are returned as their serialized dict.
+    """
+    # weakLocalObjectReference: converted object, for objects seen multiple times (or circular)
+    refs = {}
+    unresolved = []
+    root = _new(node, refs, unresolved, None, None)
+    if not _fill(node):
+        return root
+    # containers still to fill, primitives get converted in place
+    stack = [(node, root)]
+    pop, extend = stack.pop, stack.extend
+    while stack:
+        node, out = pop()
+        children = []
+        if out.__class__ is list:
+            idx = 0
+            for child in node["value"]:
+                _type = child["type"]
+                if _type == "string":
+                    out[idx] = child["value"]
+                elif _type == "number":
+                    value = child["value"]
+                    out[idx] = _NUMBERS[value] if value.__class__ is str else value
+                else:
+                    value = out[idx] = _new(child, refs, unresolved, out, idx)
+                    if (value.__class__ is list or value.__class__ is dict) and _fill(child):
+                        children.append((child, value))
+                idx += 1
+        else:
+            for key, child in node["value"]:
+                if key.__class__ is not str:
+                    key = _key(key)
+                _type = child["type"]
+                if _type == "string":
+                    out[key] = child["value"]
+                elif _type == "number":
+                    value = child["value"]
+                    out[key] = _NUMBERS[value] if value.__class__ is str else value
+                else:
+                    value = out[key] = _new(child, refs, unresolved, out, key)
+                    if (value.__class__ is list or value.__class__ is dict) and _fill(child):
+                        children.append((child, value))
+        if children:
+            children.reverse()  # popped in document order, references come after what they reference
+            extend(children)
+    for node, parent, key in unresolved:
+        parent[key] = refs.get(node["weakLocalObjectReference"], node)
+    return root
+
+
+def _fill(node: dict) -> bool:
+    # a container with its items, not a reference to one seen before
+    return node["type"] in _CONTAINERS and "value" in node
+
+
+def _new(node: dict, refs: dict, unresolved: list, parent, key):
+    # primitives converted, containers empty
+    _type = node["type"]
+    if _type == "string":
+        return node["value"]
+    if _type == "number":
+        value = node["value"]
+        return _NUMBERS[value] if value.__class__ is str else value
+    if "value" not in node:
+        ref = node.get("weakLocalObjectReference")
+        if ref is None:
+            return None if _type in _NONE else node
+        if ref in refs:
+            return refs[ref]
+        unresolved.append((node, parent, key))
+        return None
+    if _type in _LISTS:
+        out = [None] * len(node["value"])
+    elif _type in _DICTS:
+        out = {}
+    else:
+        return _primitive(node)
+    ref = node.get("weakLocalObjectReference")
+    if ref is not None:
+        refs[ref] = out
+    return out
+
+
+def _preview_value(prop: dict, push: callable):
+    _type = prop["type"]
+    if _type == "object" and prop.get("subtype") == "null":
+        return None
+    if "valuePreview" in prop:
+        out = _preview_container(prop["valuePreview"])
+        push((prop["valuePreview"], out))
+        return out
+    value = prop.get("value")
+    if _type == "number":
+        if value in _NUMBERS:
+            return _NUMBERS[value]
+        try:
+            return int(value)
+        except ValueError:
+            return float(value)
+    if _type == "boolean":
+        return value == "true"
+    if _type == "undefined":
+        return None
+    if _type == "bigint":
+        return int(value.rstrip("n"))
+    return value  # strings, or the description ("Object", "HTMLDivElement", "ƒ ()") of everything else
+
+
+def _entry_value(preview: dict, push: callable):
+    # entries are ObjectPreviews themselves, primitives only have a description
+    prop = {"type": preview["type"], "subtype": preview.get("subtype"), "value": preview.get("description")}
+    if prop["type"] == "object" and prop["subtype"] != "null":
+        prop["valuePreview"] = preview
+    return _preview_value(prop, push)
+
+
+def _preview_container(preview: dict) -> list or dict:
+    return [] if preview.get("subtype") in ("array", "typedarray", "set") else {}
+
+
+def from_preview(preview: dict):
+    """
+    convert an ``ObjectPreview`` (``RemoteObject["preview"]``, ``generatePreview=True``) to plain python objects,
+    without recursion. Previews are truncated by Chrome (``preview["overflow"]``), nested objects
+    beyond the preview's depth come out as their description.
+    """
+    root = _preview_container(preview)
+    stack = [(preview, root)]
+    pop, push = stack.pop, stack.append
+    while stack:
+        preview, out = pop()
+        entries = preview.get("entries")
+        if entries is not None:  # map, set, weakmap, ...
+            for entry in entries:
+                value = _entry_value(entry["value"], push)
+                if out.__class__ is list:
+                    out.append(value)
+                else:
+                    key = entry.get("key")
+                    key = _entry_value(key, push) if key else None
+                    try:
+                        out[key] = value
+                    except TypeError:  # unhashable key
+                        out[repr(key)] = value
+        elif out.__class__ is list:
+            for prop in preview.get("properties", ()):
+                out.append(_preview_value(prop, push))
+        else:
+            for prop in preview.get("properties", ()):
+                out[prop["name"]] = _preview_value(prop, push)
+    return root
+
+
+def from_remote_object(obj: dict):
+    """
+    python value of a ``RemoteObject`` (e.g. ``Runtime.evaluate``'s ``result``),
+    from whichever of ``deepSerializedValue``, ``value``, ``unserializableValue`` or ``preview`` it has.
+    Objects known only by their ``objectId`` are returned as is.
+    """
+    if "deepSerializedValue" in obj:
+        return from_deep(obj["deepSerializedValue"])
+    if "value" in obj:
+        return obj["value"]
+    if "unserializableValue" in obj:
+        value = obj["unserializableValue"]
+        return _NUMBERS[value] if value in _NUMBERS else int(value.rstrip("n"))
+    if obj.get("type") == "undefined" or obj.get("subtype") == "null":
+        return None
+    if "preview" in obj:
+        return from_preview(obj["preview"])
+    return obj
+
+
+def view(node: dict):
+    """
+    lazy counterpart of ``from_deep``: arrays and sets become a ``DeepList``, objects and maps a ``DeepDict``,
+    which convert only the items actually accessed. Primitives are converted right away.
+
+    .. code-block:: python
+
+        res = await sock.exec("Runtime.evaluate", args)
+        value = view(res["result"]["deepSerializedValue"])
+        value[0]["items"][3]  # converts only this path
+
+    References to objects seen before (``weakLocalObjectReference``) stay serialized dicts,
+    use ``to_python()`` to resolve them.
+    """
+    if "value" in node:
+        _type = node["type"]
+        if _type in _LISTS:
+            return DeepList(node)
+        if _type in _DICTS:
+            return DeepDict(node)
+        return _primitive(node)
+    return None if node["type"] in _NONE else node
+
+
+class DeepList(Sequence):
+    """read-only lazy view of a deep-serialized array or set, see ``view``"""
+    __slots__ = ("_node", "_cache")
+
+    def __init__(self, node: dict):
+        self._node = node
+        self._cache: typing.Dict[int, typing.Any] = {}
+
+    def __getitem__(self, idx: int or slice):
+        if idx.__class__ is slice:
+            return [self[i] for i in range(*idx.indices(len(self)))]
+        try:
+            return self._cache[idx]
+        except KeyError:
+            pass
+        value = self._cache[idx] = view(self._node["value"][idx])
+        return value
+
+    def __len__(self):
+        return len(self._node["value"])
+
+    def to_python(self) -> list:
+        return from_deep(self._node)
+
+    def __eq__(self, other):
+        if isinstance(other, (DeepList, list, tuple)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(<{self._node['type']}, {len(self)} items>)"
+
+
+class DeepDict(Mapping):
+    """read-only lazy view of a deep-serialized object or map, see ``view``"""
+    __slots__ = ("_node", "_index", "_cache")
+
+    def __init__(self, node: dict):
+        self._node = node
+        self._index: typing.Dict[typing.Any, dict] = None
+        self._cache: typing.Dict[typing.Any, typing.Any] = {}
+
+    def _load(self) -> dict:
+        if self._index is None:
+            self._index = {(key if key.__class__ is str else _key(key)): child for key, child in self._node["value"]}
+        return self._index
+
+    def __getitem__(self, key):
+        try:
+            return self._cache[key]
+        except KeyError:
+            pass
+        value = self._cache[key] = view(self._load()[key])
+        return value
+
+    def __iter__(self):
+        return iter(self._load())
+
+    def __len__(self):
+        return len(self._node["value"])
+
+    def __contains__(self, key):
+        return key in self._load()
+
+    def to_python(self) -> dict:
+        return from_deep(self._node)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(<{self._node['type']}, {len(self)} items>)"
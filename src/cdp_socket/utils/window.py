@@ -0,0 +1,183 @@
+import asyncio
+import collections
+import time
+import typing
+
+from cdp_socket.utils.metrics import Histogram
+
+INTERACTIVE = "interactive"
+NORMAL = "normal"
+BULK = "bulk"
+PRIORITIES = (INTERACTIVE, NORMAL, BULK)
+
+# method or "Domain." prefix: priority class, everything else is NORMAL
+DEFAULT_CLASSES = {
+    "Input.": INTERACTIVE,
+    "Page.navigate": INTERACTIVE,
+    "Page.reload": INTERACTIVE,
+    "Page.stopLoading": INTERACTIVE,
+    "DOM.": BULK,
+    "DOMSnapshot.": BULK,
+    "CSS.": BULK,
+    "Accessibility.": BULK,
+}
+
+
+class InFlightWindow:
+    """
+    limits the commands a socket has outstanding: ``SingleCDPSocket(url, window=InFlightWindow(limit=32))``
+
+    Each command takes a credit until its response (or error/timeout) arrives. Commands without a credit
+    wait in their priority class (``interactive``, ``normal``, ``bulk``, see ``DEFAULT_CLASSES``),
+    freed credits go round-robin over the classes (one per class and pass, ``interactive`` first)
+    and over the targets (sessions) within a class, so no class starves under sustained load.
+    ``interactive`` commands may exceed ``limit`` by ``interactive_reserve``, so they never wait behind bulk work.
+    Queueing counts towards the command's timeout.
+    """
+
+    def __init__(self, limit: int = 64, per_target: int = None, interactive_reserve: int = 4,
+                 classes: typing.Dict[str, str] = None):
+        """
+        :param limit: commands in flight per socket
+        :param per_target: commands in flight per target (session), unlimited by default
+        :param classes: ``{method or "Domain.": priority class}``, defaults to ``DEFAULT_CLASSES``
+        """
+        self.limit = limit
+        self.per_target = per_target
+        self.interactive_reserve = interactive_reserve
+        self._classes = dict(DEFAULT_CLASSES if classes is None else classes)
+        for key, cls in self._classes.items():
+            if cls not in PRIORITIES:
+                raise ValueError(f"{key!r} has an unknown priority class {cls!r}, allowed: {', '.join(PRIORITIES)}")
+        self._classified: typing.Dict[str, str] = {}
+        self._in_flight = 0
+        self._targets: typing.Dict[typing.Optional[str], int] = {}
+        # class: {target: [(future, queued at)]}
+        self._lanes: typing.Dict[str, typing.OrderedDict[typing.Optional[str], typing.Deque]] = {
+            cls: collections.OrderedDict() for cls in PRIORITIES}
+        self._turn = 0  # index of the class which gets the next freed credit
+        self.sent = {cls: 0 for cls in PRIORITIES}
+        self.queued = {cls: 0 for cls in PRIORITIES}
+        self.delay = {cls: Histogram() for cls in PRIORITIES}
+
+    def classify(self, method: str) -> str:
+        cls = self._classified.get(method)
+        if cls is None:
+            cls = self._classes.get(method) or self._classes.get(method[:method.find(".") + 1]) or NORMAL
+            self._classified[method] = cls
+        return cls
+
+    def _window_fits(self, cls: str) -> bool:
+        return self._in_flight < (self.limit + self.interactive_reserve if cls == INTERACTIVE else self.limit)
+
+    def _fits(self, cls: str, target: typing.Optional[str]) -> bool:
+        if not self._window_fits(cls):
+            return False
+        return self.per_target is None or self._targets.get(target, 0) < self.per_target
+
+    def acquire(self, method: str, target: str = None, priority: str = None) -> typing.Optional[asyncio.Future]:
+        """
+        take a credit for ``method``. Returns ``None`` if it got one, else a future to await,
+        which has to be passed to ``discard`` if the caller stops waiting.
+        """
+        if priority is None:
+            cls = self.classify(method)
+        elif priority in PRIORITIES:
+            cls = priority
+        else:
+            raise ValueError(f"unknown priority class {priority!r}, allowed: {', '.join(PRIORITIES)}")
+        if self._fits(cls, target) and not self._queued_before(cls, target):
+            self._take(target)
+            self.sent[cls] += 1
+            self.delay[cls].observe(0)
+            return None
+        fut = asyncio.get_running_loop().create_future()
+        lanes = self._lanes[cls]
+        lane = lanes.get(target)
+        if lane is None:
+            lane = lanes[target] = collections.deque()
+        lane.append((fut, time.perf_counter()))
+        self.queued[cls] += 1
+        return fut
+
+    def _queued_before(self, cls: str, target: typing.Optional[str]) -> bool:
+        for _cls in PRIORITIES:
+            if self._lanes[_cls].get(target):
+                return True
+            if _cls == cls:
+                return False
+
+    def _take(self, target: typing.Optional[str]):
+        self._in_flight += 1
+        if self.per_target is not None:
+            self._targets[target] = self._targets.get(target, 0) + 1
+
+    def release(self, target: str = None, *args):
+        """return a credit, usable as done callback: ``partial(window.release, target)``"""
+        self._in_flight -= 1
+        if self.per_target is not None:
+            count = self._targets[target] - 1
+            if count:
+                self._targets[target] = count
+            else:
+                del self._targets[target]
+        self._wake()
+
+    def discard(self, fut: asyncio.Future, target: str = None):
+        """stop waiting for a credit, returns it if it got granted already"""
+        if fut.done() and not fut.cancelled():
+            self.release(target)
+        else:
+            fut.cancel()
+            self._wake()  # drop it, it might block the lane
+
+    def _wake(self):
+        # one credit per class and pass, until no class gets one
+        skipped = 0
+        while skipped < len(PRIORITIES):
+            cls = PRIORITIES[self._turn]
+            self._turn = (self._turn + 1) % len(PRIORITIES)
+            if self._grant(cls):
+                skipped = 0
+            else:
+                skipped += 1
+
+    def _grant(self, cls: str) -> bool:
+        # to the least recently served target with a waiting command that fits
+        lanes = self._lanes[cls]
+        if not lanes or not self._window_fits(cls):
+            return False
+        for target in list(lanes):
+            lane = lanes[target]
+            while lane and lane[0][0].done():
+                lane.popleft()  # discarded
+            if not lane:
+                del lanes[target]
+                continue
+            if not self._fits(cls, target):
+                continue
+            fut, queued_at = lane.popleft()
+            self._take(target)
+            self.sent[cls] += 1
+            self.delay[cls].observe(time.perf_counter() - queued_at)
+            fut.set_result(None)
+            if lane:
+                lanes.move_to_end(target)
+            else:
+                del lanes[target]
+            return True
+        return False
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def waiting(self, cls: str = None) -> int:
+        classes = PRIORITIES if cls is None else (cls,)
+        return sum(1 for _cls in classes for lane in self._lanes[_cls].values()
+                   for fut, _ in lane if not fut.done())
+
+    def stats(self) -> dict:
+        return {"in_flight": self._in_flight, "limit": self.limit,
+                **{cls: {"sent": self.sent[cls], "queued": self.queued[cls], "waiting": self.waiting(cls),
+                         "delay": self.delay[cls].snapshot()} for cls in PRIORITIES}}
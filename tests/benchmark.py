@@ -0,0 +1,465 @@
+"""
+offline benchmarks against the local fake CDP endpoint (no Chrome required)
+
+usage: python tests/benchmark.py [--out results.json] [--scale 1.0] [case ...]
+results are written as json, so two runs can be diffed between releases
+"""
+import argparse
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import gc
+import threading
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import cdp_socket
+from cdp_socket.scripts.evaluate import ScriptCache
+from cdp_socket.socket import CDPSocket, SingleCDPSocket
+from cdp_socket.sync import SyncCDPSocket
+from cdp_socket.utils.cache import ResponseCache
+from cdp_socket.utils.encoder import FrameEncoder
+from cdp_socket.utils.metrics import Metrics
+from fake_server import FakeCDPServer
+from cdp_socket.utils.values import from_deep, view
+from cdp_socket.utils.window import InFlightWindow
+
+CASES = {}
+
+
+def case(name: str):
+    def decorator(func):
+        CASES[name] = func
+        return func
+
+    return decorator
+
+
+def percentile(values: list, q: float):
+    values = sorted(values)
+    if not values:
+        return None
+    idx = min(len(values) - 1, max(0, round(q / 100 * (len(values) - 1))))
+    return values[idx]
+
+
+def latency_stats(latencies: list, total: float):
+    return {"n": len(latencies),
+            "total_s": round(total, 4),
+            "per_sec": round(len(latencies) / total, 1),
+            "p50_us": round(percentile(latencies, 50) * 1e6, 1),
+            "p99_us": round(percentile(latencies, 99) * 1e6, 1)}
+
+
+async def connect(server: FakeCDPServer, **kwargs):
+    url = f"ws://{server.host}/devtools/page/{server.targets[0]['id']}"
+    return await SingleCDPSocket(url, **kwargs)
+
+
+async def _exec_roundtrip(server: FakeCDPServer, scale: float, **kwargs):
+    n_times = int(10_000 * scale)
+    async with await connect(server, **kwargs) as sock:
+        latencies = []
+        start = time.perf_counter()
+        for _ in range(n_times):
+            t = time.perf_counter()
+            await sock.exec("Browser.getVersion")
+            latencies.append(time.perf_counter() - t)
+        return latency_stats(latencies, time.perf_counter() - start)
+
+
+@case("exec_roundtrip")
+async def exec_roundtrip(server: FakeCDPServer, scale: float):
+    return await _exec_roundtrip(server, scale)
+
+
+@case("exec_roundtrip_metrics")
+async def exec_roundtrip_metrics(server: FakeCDPServer, scale: float):
+    return await _exec_roundtrip(server, scale, metrics=Metrics())
+
+
+@case("exec_cached")
+async def exec_cached(server: FakeCDPServer, scale: float):
+    return await _exec_roundtrip(server, scale, cache=ResponseCache())
+
+
+async def _exec_concurrent(server: FakeCDPServer, scale: float, **kwargs):
+    n_times, width = int(10_000 * scale), 100
+    async with await connect(server, **kwargs) as sock:
+        start = time.perf_counter()
+        for _ in range(max(1, n_times // width)):
+            await asyncio.gather(*(sock.exec("Browser.getVersion") for _ in range(width)))
+        total = time.perf_counter() - start
+        return {"n": n_times, "width": width, "total_s": round(total, 4), "per_sec": round(n_times / total, 1)}
+
+
+@case("exec_concurrent")
+async def exec_concurrent(server: FakeCDPServer, scale: float):
+    return await _exec_concurrent(server, scale)
+
+
+@case("exec_concurrent_coalesced")
+async def exec_concurrent_coalesced(server: FakeCDPServer, scale: float):
+    return await _exec_concurrent(server, scale, coalesce_writes=True)
+
+
+def _threads_exec(exec_fn: callable, n_times: int, n_threads: int):
+    per_thread = max(1, n_times // n_threads)
+
+    def work(_):
+        for _ in range(per_thread):
+            exec_fn("Browser.getVersion")
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(n_threads) as executor:
+        list(executor.map(work, range(n_threads)))
+    total = time.perf_counter() - start
+    return {"n": per_thread * n_threads, "threads": n_threads, "total_s": round(total, 4),
+            "per_sec": round(per_thread * n_threads / total, 1)}
+
+
+@case("sync_threads_threadsafe")
+async def sync_threads_threadsafe(server: FakeCDPServer, scale: float):
+    # baseline: one run_coroutine_threadsafe per command
+    url = f"ws://{server.host}/devtools/page/{server.targets[0]['id']}"
+
+    def bench():
+        loop = asyncio.new_event_loop()
+        thread = threading.Thread(target=loop.run_forever, daemon=True)
+        thread.start()
+        sock = asyncio.run_coroutine_threadsafe(_connect_url(url, loop), loop).result()
+
+        def exec_fn(method):
+            return asyncio.run_coroutine_threadsafe(sock.exec(method), loop).result()
+
+        try:
+            return _threads_exec(exec_fn, int(4_000 * scale), 8)
+        finally:
+            asyncio.run_coroutine_threadsafe(sock.close(reason=""), loop).result()
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join()
+            loop.close()
+
+    return await asyncio.get_running_loop().run_in_executor(None, bench)
+
+
+async def _connect_url(url: str, loop: asyncio.AbstractEventLoop):
+    return await SingleCDPSocket(url, loop=loop)
+
+
+@case("sync_threads_batched")
+async def sync_threads_batched(server: FakeCDPServer, scale: float):
+    url = f"ws://{server.host}/devtools/page/{server.targets[0]['id']}"
+
+    def bench():
+        with SyncCDPSocket(url) as sock:
+            result = _threads_exec(sock.exec, int(4_000 * scale), 8)
+            result["wakeups"] = sock.wakeups
+            return result
+
+    return await asyncio.get_running_loop().run_in_executor(None, bench)
+
+
+async def _evaluate(server: FakeCDPServer, scale: float, compiled: bool):
+    n_times = int(5_000 * scale)
+    script = "[" + ",".join(f'{{"key": {i}, "value": "{"A" * 32}"}}' for i in range(100)) + "]"  # ~5kB
+    metrics = Metrics()
+    async with await connect(server, metrics=metrics) as sock:
+        scripts = ScriptCache(sock)
+        start = time.perf_counter()
+        for _ in range(n_times):
+            if compiled:
+                await scripts.evaluate(script)
+            else:
+                await sock.exec("Runtime.evaluate", {"expression": script, "returnByValue": True})
+        total = time.perf_counter() - start
+    return {"n": n_times, "total_s": round(total, 4), "per_sec": round(n_times / total, 1),
+            "bytes_sent_per_call": round(metrics.bytes_sent / n_times, 1)}
+
+
+@case("evaluate")
+async def evaluate(server: FakeCDPServer, scale: float):
+    return await _evaluate(server, scale, compiled=False)
+
+
+@case("evaluate_compiled")
+async def evaluate_compiled(server: FakeCDPServer, scale: float):
+    return await _evaluate(server, scale, compiled=True)
+
+
+async def _interactive_under_bulk(server: FakeCDPServer, scale: float, **kwargs):
+    n_bulk, n_interactive = int(5_000 * scale), int(100 * scale) or 1
+    server.handlers["DOM.getDocument"] = lambda params, conn: {"root": {"nodeId": 1}}
+    server.handlers["Input.dispatchMouseEvent"] = lambda params, conn: {}
+    async with await connect(server, **kwargs) as sock:
+        bulk = asyncio.ensure_future(sock.exec_many([("DOM.getDocument",)] * n_bulk, timeout=60))
+        await asyncio.sleep(0)
+        latencies = []
+        start = time.perf_counter()
+        for _ in range(n_interactive):
+            t = time.perf_counter()
+            await sock.exec("Input.dispatchMouseEvent", timeout=60)
+            latencies.append(time.perf_counter() - t)
+        total = time.perf_counter() - start
+        await bulk
+        # the first one got sent with the whole bulk batch queued
+        return {"bulk": n_bulk, "first_us": round(latencies[0] * 1e6, 1), **latency_stats(latencies, total)}
+
+
+@case("interactive_under_bulk")
+async def interactive_under_bulk(server: FakeCDPServer, scale: float):
+    return await _interactive_under_bulk(server, scale)
+
+
+@case("interactive_under_bulk_window")
+async def interactive_under_bulk_window(server: FakeCDPServer, scale: float):
+    return await _interactive_under_bulk(server, scale, window=InFlightWindow(limit=32))
+
+
+_IMPORT_SCRIPT = """
+import sys, time
+start = time.perf_counter()
+import cdp_socket.socket
+print(time.perf_counter() - start, "aiohttp" in sys.modules)
+"""
+
+
+# noinspection PyUnusedLocal
+@case("import_time")
+async def import_time(server: FakeCDPServer, scale: float):
+    n_times = max(3, int(10 * scale))
+    times = []
+    for _ in range(n_times):
+        out = subprocess.run([sys.executable, "-c", _IMPORT_SCRIPT], capture_output=True, text=True, check=True)
+        elapsed, aiohttp_loaded = out.stdout.split()
+        times.append(float(elapsed))
+    return {"n": n_times, "median_ms": round(statistics.median(times) * 1e3, 2),
+            "min_ms": round(min(times) * 1e3, 2), "aiohttp_loaded": aiohttp_loaded == "True"}
+
+
+async def _first_exec(server: FakeCDPServer, scale: float, probe: str):
+    n_times = int(50 * scale)
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(n_times):
+        t = time.perf_counter()
+        async with CDPSocket(server.port, probe=probe) as base_socket:
+            sock = await base_socket.get_socket((await base_socket.targets)[0])
+            await sock.exec("Browser.getVersion")
+            latencies.append(time.perf_counter() - t)
+    return latency_stats(latencies, time.perf_counter() - start)
+
+
+@case("first_exec")
+async def first_exec(server: FakeCDPServer, scale: float):
+    return await _first_exec(server, scale, "connect")
+
+
+@case("first_exec_reuse")
+async def first_exec_reuse(server: FakeCDPServer, scale: float):
+    return await _first_exec(server, scale, "reuse")
+
+
+@case("first_exec_skip")
+async def first_exec_skip(server: FakeCDPServer, scale: float):
+    return await _first_exec(server, scale, "skip")
+
+
+async def _attach(scale: float, concurrent: bool):
+    n_targets = max(2, int(200 * scale))
+    async with FakeCDPServer(n_targets=n_targets) as server:
+        async with CDPSocket(server.port, probe="skip") as base_socket:
+            targets = await base_socket.targets
+            start = time.perf_counter()
+            if concurrent:
+                sockets, errors = await base_socket.get_sockets(targets, concurrency=32)
+            else:
+                sockets = {target["id"]: await base_socket.get_socket(target) for target in targets}
+            total = time.perf_counter() - start
+            return {"n": len(sockets), "total_ms": round(total * 1e3, 2),
+                    "per_target_us": round(total / n_targets * 1e6, 1)}
+
+
+# noinspection PyUnusedLocal
+@case("attach_sequential")
+async def attach_sequential(server: FakeCDPServer, scale: float):
+    return await _attach(scale, concurrent=False)
+
+
+# noinspection PyUnusedLocal
+@case("attach_concurrent")
+async def attach_concurrent(server: FakeCDPServer, scale: float):
+    return await _attach(scale, concurrent=True)
+
+
+@case("encode")
+async def encode(server: FakeCDPServer, scale: float):
+    n_times = int(100_000 * scale)
+    params = {"expression": "document.querySelectorAll('a').length", "returnByValue": True}
+    start = time.perf_counter()
+    for _id in range(n_times):
+        json.dumps({"id": _id, "method": "Runtime.evaluate", "params": params})
+    stdlib = time.perf_counter() - start
+    encoder = FrameEncoder()
+    start = time.perf_counter()
+    for _id in range(n_times):
+        encoder.encode(_id, "Runtime.evaluate", params)
+    frame_encoder = time.perf_counter() - start
+    return {"n": n_times, "json_per_sec": round(n_times / stdlib, 1),
+            "frame_encoder_per_sec": round(n_times / frame_encoder, 1)}
+
+
+def _naive_deep(node: dict):
+    # the usual hand-written recursive walk
+    _type, value = node["type"], node.get("value")
+    if _type in ("array", "set"):
+        return [_naive_deep(child) for child in value]
+    if _type in ("object", "map"):
+        return {key if isinstance(key, str) else _naive_deep(key): _naive_deep(child) for key, child in value}
+    if _type == "number" and isinstance(value, str):
+        return {"NaN": float("nan"), "Infinity": float("inf"), "-Infinity": float("-inf"), "-0": -0.0}[value]
+    if _type == "bigint":
+        return int(value)
+    return value
+
+
+@case("deep_values")
+async def deep_values(server: FakeCDPServer, scale: float):
+    n_items = int(20_000 * scale)
+    deep = {"type": "array", "value": [{"type": "object", "value": [
+        ["id", {"type": "number", "value": idx}],
+        ["name", {"type": "string", "value": f"item {idx}"}],
+        ["tags", {"type": "array", "value": [{"type": "string", "value": "a"}, {"type": "string", "value": "b"}]}],
+        ["pos", {"type": "object", "value": [["x", {"type": "number", "value": 1.5}],
+                                             ["y", {"type": "number", "value": "NaN"}]]}],
+    ]} for idx in range(n_items)]}
+    results = {"items": n_items}
+    for name, convert in (("naive_recursive", _naive_deep), ("from_deep", from_deep)):
+        gc.collect()
+        start = time.perf_counter()
+        convert(deep)
+        results[f"{name}_ms"] = round((time.perf_counter() - start) * 1e3, 2)
+    # a handful of paths out of the whole payload
+    gc.collect()
+    start = time.perf_counter()
+    value = view(deep)
+    for idx in range(0, n_items, max(1, n_items // 10)):
+        assert value[idx]["pos"]["x"] == 1.5
+    results["view_10_paths_ms"] = round((time.perf_counter() - start) * 1e3, 2)
+    return results
+
+
+async def _dispatch(server: FakeCDPServer, n_events: int, params: dict, subscribed: bool):
+    async with await connect(server) as sock:
+        done = asyncio.Event()
+        counter = [0]
+
+        def on_event(_):
+            counter[0] += 1
+            if counter[0] >= n_events:
+                done.set()
+
+        if subscribed:
+            sock.add_listener("Fake.event", on_event)
+        # marker event, sent after the flood, to detect that every frame passed the receive loop
+        sock.add_listener("Fake.done", lambda _: done.set())
+        start = time.perf_counter()
+        await sock.exec("Fake.flood", {"method": "Fake.event", "params": params, "count": n_events})
+        await server.flood("Fake.done")
+        await asyncio.wait_for(done.wait(), 60)
+        total = time.perf_counter() - start
+        return {"n": n_events, "total_s": round(total, 4), "per_sec": round(n_events / total, 1)}
+
+
+@case("event_dispatch")
+async def event_dispatch(server: FakeCDPServer, scale: float):
+    return await _dispatch(server, int(50_000 * scale), {"requestId": "1000.1", "timestamp": 1.0}, True)
+
+
+@case("event_dispatch_large")
+async def event_dispatch_large(server: FakeCDPServer, scale: float):
+    params = {"requestId": "1000.1", "headers": {f"header-{i}": "x" * 64 for i in range(64)}}
+    return await _dispatch(server, int(5_000 * scale), params, True)
+
+
+@case("event_dispatch_unsubscribed")
+async def event_dispatch_unsubscribed(server: FakeCDPServer, scale: float):
+    params = {"requestId": "1000.1", "headers": {f"header-{i}": "x" * 64 for i in range(64)}}
+    return await _dispatch(server, int(5_000 * scale), params, False)
+
+
+@case("event_stream")
+async def event_stream(server: FakeCDPServer, scale: float):
+    n_events = int(50_000 * scale)
+    async with await connect(server) as sock:
+        async with sock.stream("Fake.event", max_batch=1000, maxsize=n_events) as stream:
+            start = time.perf_counter()
+            await sock.exec("Fake.flood", {"method": "Fake.event", "params": {"requestId": "1000.1"},
+                                           "count": n_events})
+            received = batches = 0
+            async for batch in stream:
+                received += len(batch)
+                batches += 1
+                if received >= n_events:
+                    break
+            total = time.perf_counter() - start
+        return {"n": n_events, "batches": batches, "total_s": round(total, 4), "per_sec": round(n_events / total, 1)}
+
+
+@case("memory_growth")
+async def memory_growth(server: FakeCDPServer, scale: float):
+    n_times = int(10_000 * scale)
+    async with await connect(server) as sock:
+        for _ in range(100):  # warm up
+            await sock.exec("Browser.getVersion")
+        gc.collect()
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        for _ in range(n_times):
+            await sock.exec("Browser.getVersion")
+        await sock.exec("Fake.flood", {"method": "Fake.event", "params": {"a": 1}, "count": n_times})
+        await sock.exec("Browser.getVersion")
+        gc.collect()
+        after, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return {"n": n_times, "growth_bytes": after - before, "peak_bytes": peak - before,
+                "bytes_per_exec": round((after - before) / n_times, 2)}
+
+
+async def run(names: list, scale: float):
+    results = {}
+    for name in names:
+        async with FakeCDPServer() as server:
+            results[name] = await CASES[name](server, scale)
+        print(f"{name}: {results[name]}", file=sys.stderr)
+    return results
+
+
+def main(argv: list = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("cases", nargs="*", help=f"cases to run (default: all): {', '.join(CASES.keys())}")
+    parser.add_argument("--out", default=None, help="write json results to this path (default: stdout)")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplier for the iteration counts")
+    args = parser.parse_args(argv)
+    for name in args.cases:
+        if name not in CASES:
+            parser.error(f"unknown case: {name}")
+
+    results = asyncio.run(run(args.cases or list(CASES.keys()), args.scale))
+    report = {"meta": {"cdp_socket": cdp_socket.__version__, "python": platform.python_version(),
+                       "implementation": platform.python_implementation(), "platform": platform.platform(),
+                       "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"), "scale": args.scale},
+              "results": results}
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+    else:
+        print(json.dumps(report, indent=2, sort_keys=True))
+
+
+if __name__ == '__main__':
+    main()
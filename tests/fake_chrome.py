@@ -0,0 +1,46 @@
+"""
+stub browser executable for tests: serves ``FakeCDPServer`` on ``--remote-debugging-port``,
+writes ``DevToolsActivePort`` and prints the ``DevTools listening on ws://...`` line like Chrome
+
+usage: python fake_chrome.py [--stderr-lines=N] [--exit-code=N] --user-data-dir=DIR --remote-debugging-port=PORT
+"""
+import asyncio
+import os
+import sys
+
+from fake_server import FakeCDPServer
+
+
+def arg(name: str, default: str = None):
+    for item in sys.argv[1:]:
+        if item.startswith(f"--{name}="):
+            return item.split("=", 1)[1]
+    return default
+
+
+async def main():
+    exit_code = arg("exit-code")
+    if exit_code is not None:
+        print("failed to launch", file=sys.stderr)
+        sys.exit(int(exit_code))
+    # without a reader, this would block on a full pipe
+    for n in range(int(arg("stderr-lines", "0"))):
+        print(f"[{n}] noise", file=sys.stderr)
+    data_dir = arg("user-data-dir")
+    server = await FakeCDPServer(port=int(arg("remote-debugging-port", "0")))
+    ws_url = server.version["webSocketDebuggerUrl"]
+    if data_dir:
+        with open(os.path.join(data_dir, "DevToolsActivePort"), "w") as f:
+            f.write(f"{server.port}\n{ws_url.split(server.host, 1)[1]}")
+    print(f"\nDevTools listening on {ws_url}", file=sys.stderr, flush=True)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.close()
+
+
+if __name__ == '__main__':
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
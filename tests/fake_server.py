@@ -0,0 +1,511 @@
+"""
+stand-ins for Chrome's remote-debugging endpoint, used by the tests and ``benchmark.py``:
+``FakeCDPServer`` (scripted) and ``ReplayServer`` (plays a ``Recording`` back)
+"""
+import asyncio
+import base64
+import inspect
+import json
+import os
+import socket
+import typing
+import uuid
+
+from aiohttp import web, WSMsgType
+
+from cdp_socket.exceptions import CDPError
+from cdp_socket.utils.frames import peek_frame
+from cdp_socket.utils.recording import Recording
+
+NO_RESPONSE = object()  # handler return value for commands which never get a response
+
+
+class FakeConnection:
+    """a single websocket connection to the fake endpoint"""
+
+    def __init__(self, ws: web.WebSocketResponse, target_id: str, server: "FakeCDPServer"):
+        self._ws = ws
+        self._server = server
+        self.target_id = target_id
+        self.sessions: typing.Dict[str, str] = {}  # flat-mode sessionId: targetId
+        self.session_id: typing.Optional[str] = None  # of the command being handled
+        self.discover = False  # Target.setDiscoverTargets
+        self.runtime: typing.Set[typing.Optional[str]] = set()  # sessions with Runtime.enable
+        self._deferred = []
+
+    def defer(self, awaitable: typing.Awaitable):
+        """run ``awaitable`` once the response to the current command has been sent"""
+        self._deferred.append(awaitable)
+
+    async def send_raw(self, data: str):
+        await self._ws.send_str(data)
+
+    async def send_event(self, method: str, params: dict = None, count: int = 1, session_id: str = None):
+        _dict = {"method": method}
+        if params is not None:
+            _dict["params"] = params
+        if session_id is not None:
+            _dict["sessionId"] = session_id
+        data = _dumps(_dict)
+        for _ in range(count):
+            await self._ws.send_str(data)
+
+    @property
+    def closed(self):
+        return self._ws.closed
+
+    async def close(self, code: int = 1000, reason: str = ""):
+        await self._ws.close(code=code, message=reason.encode())
+
+
+class FakeCDPServer:
+    """
+    local stand-in for Chrome's remote-debugging endpoint
+
+    serves ``/json``, ``/json/list`` and ``/json/version`` over http and answers commands on
+    ``/devtools/page/<id>`` and ``/devtools/browser/<id>`` websockets.
+    Commands are resolved through ``handlers``: ``{method: callable(params, connection) -> result}``,
+    callables may be async, raise ``CDPError`` or return ``NO_RESPONSE``. Unknown methods answer with Chrome's "wasn't found" error.
+
+    The ``Fake.flood`` command pushes ``{"method": ..., "params": ..., "count": ...}`` events after responding.
+    ``Page.printToPDF`` and ``Page.captureScreenshot`` return ``document`` (or a stream of it, read with ``IO.read``).
+    ``Runtime.evaluate`` and ``Runtime.runScript`` (of ``Runtime.compileScript``-ed ``scripts``) return the
+    expression itself as the string value, compiling and running scripts requires ``Runtime.enable`` and a script
+    runs only once like in V8. Without ``returnByValue``, ``Runtime.evaluate`` also returns an ``objectId`` of
+    ``objects``, ``Runtime.callFunctionOn`` on it returns the expression it got evaluated from.
+    ``Runtime.enable`` reports the default execution context ``context_id``.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, n_targets: int = 1,
+                 handlers: typing.Dict[str, callable] = None, delay: float = 0):
+        self._host = host
+        self._port = port
+        self._delay = delay
+        self._runner = None
+        self._browser_id = uuid.uuid4().hex
+        self.targets = [self._make_target() for _ in range(n_targets)]
+        self.connections: typing.List[FakeConnection] = []
+        self.received = 0
+        self.document = b"%PDF-1.7\n" + bytes(range(256)) * 64
+        self.streams: typing.Dict[str, typing.List] = {}  # handle: [data, position, base64Encoded]
+        self.scripts: typing.Dict[str, str] = {}  # scriptId: expression
+        self.objects: typing.Dict[str, typing.Tuple[str, typing.Optional[str]]] = {}  # objectId: expression, group
+        self.context_id = 1
+        self.handlers = {
+            "Browser.getVersion": self._get_version,
+            "Target.getTargets": self._get_targets,
+            "Fake.flood": self._flood,
+            "Target.attachToTarget": self._attach_to_target,
+            "Target.detachFromTarget": self._detach_from_target,
+            "Target.setDiscoverTargets": self._set_discover_targets,
+            "Target.createTarget": self._create_target,
+            "Target.closeTarget": self._close_target,
+            "Page.printToPDF": self._print_to_pdf,
+            "Page.captureScreenshot": self._capture_screenshot,
+            "IO.read": self._io_read,
+            "IO.close": self._io_close,
+            "Page.startScreencast": _empty,
+            "Page.stopScreencast": _empty,
+            "Page.screencastFrameAck": _empty,
+            "Runtime.enable": self._runtime_enable,
+            "Runtime.disable": self._runtime_disable,
+            "Runtime.evaluate": self._evaluate,
+            "Runtime.compileScript": self._compile_script,
+            "Runtime.runScript": self._run_script,
+            "Runtime.callFunctionOn": self._call_function_on,
+            "Runtime.releaseObject": self._release_object,
+            "Runtime.releaseObjectGroup": self._release_object_group,
+        }
+        if handlers:
+            self.handlers.update(handlers)
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *args, **kwargs):
+        await self.close()
+
+    def __await__(self):
+        return self.start().__await__()
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get("/json", self._json)
+        app.router.add_get("/json/list", self._json)
+        app.router.add_get("/json/version", self._json_version)
+        app.router.add_get("/devtools/page/{target_id}", self._websocket)
+        app.router.add_get("/devtools/browser/{target_id}", self._websocket)
+        self._runner = web.AppRunner(app, handle_signals=False)
+        await self._runner.setup()
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self._host, self._port))
+        self._port = sock.getsockname()[1]
+        await web.SockSite(self._runner, sock).start()
+        return self
+
+    async def close(self):
+        for conn in list(self.connections):
+            await conn.close()
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def _make_target(self, url: str = "about:blank"):
+        _id = uuid.uuid4().hex.upper()
+        return {"description": "", "id": _id, "title": url, "type": "page", "url": url}
+
+    def _target_json(self, target: dict):
+        return {**target,
+                "devtoolsFrontendUrl": f"/devtools/inspector.html?ws={self.host}/devtools/page/{target['id']}",
+                "webSocketDebuggerUrl": f"ws://{self.host}/devtools/page/{target['id']}"}
+
+    @property
+    def host(self):
+        return f"{self._host}:{self._port}"
+
+    @property
+    def port(self):
+        return self._port
+
+    @property
+    def version(self):
+        return {"Browser": "FakeChrome/1.0.0.0", "Protocol-Version": "1.3",
+                "User-Agent": "Mozilla/5.0 FakeChrome/1.0.0.0", "V8-Version": "0.0", "WebKit-Version": "0.0",
+                "webSocketDebuggerUrl": f"ws://{self.host}/devtools/browser/{self._browser_id}"}
+
+    async def flood(self, method: str, params: dict = None, count: int = 1, target_id: str = None):
+        """push ``count`` events to every (or one target's) connection"""
+        for conn in list(self.connections):
+            if target_id is None or conn.target_id == target_id:
+                await conn.send_event(method, params, count)
+
+    def add_stream(self, data: bytes, base64_encoded: bool = True) -> str:
+        """register ``data`` as a stream for ``IO.read``, returns the handle"""
+        handle = str(len(self.streams) + 1)
+        self.streams[handle] = [data, 0, base64_encoded]
+        return handle
+
+    async def add_target(self, url: str = "about:blank") -> dict:
+        """add a page target, announced with ``Target.targetCreated``"""
+        target = self._make_target(url)
+        self.targets.append(target)
+        await self._announce("Target.targetCreated", {"targetInfo": self._target_info(target)})
+        return target
+
+    async def remove_target(self, target_id: str):
+        """remove a target, announced with ``Target.targetDestroyed``"""
+        self.targets = [t for t in self.targets if t["id"] != target_id]
+        for conn in list(self.connections):
+            if conn.target_id == target_id:
+                await conn.close()
+        await self._announce("Target.targetDestroyed", {"targetId": target_id})
+
+    async def clear_contexts(self):
+        """
+        forget the compiled scripts and objects, send ``Runtime.executionContextsCleared`` and report a new
+        default context, like on navigation
+        """
+        self.scripts.clear()
+        self.objects.clear()
+        self.context_id += 1
+        await self.flood("Runtime.executionContextsCleared", {})
+        for conn in list(self.connections):
+            for session_id in conn.runtime:
+                await conn.send_event("Runtime.executionContextCreated", self._context(conn), session_id=session_id)
+
+    async def _announce(self, method: str, params: dict):
+        for conn in list(self.connections):
+            if conn.discover:
+                await conn.send_event(method, params)
+
+    # http
+    async def _json(self, request: web.Request):
+        return web.json_response([self._target_json(t) for t in self.targets])
+
+    async def _json_version(self, request: web.Request):
+        return web.json_response(self.version)
+
+    # websocket
+    async def _websocket(self, request: web.Request):
+        target_id = request.match_info["target_id"]
+        if request.path.startswith("/devtools/page/") and not any(t["id"] == target_id for t in self.targets):
+            raise web.HTTPNotFound(text=f"No such target id: {target_id}")
+        ws = web.WebSocketResponse(max_msg_size=0)
+        await ws.prepare(request)
+        conn = FakeConnection(ws, target_id, self)
+        self.connections.append(conn)
+        self._on_connect(conn)
+        try:
+            async for msg in ws:
+                if msg.type == WSMsgType.TEXT:
+                    await self._handle_message(conn, msg.data)
+                elif msg.type == WSMsgType.ERROR:
+                    break
+        finally:
+            self.connections.remove(conn)
+        return ws
+
+    def _on_connect(self, conn: FakeConnection):
+        pass
+
+    async def _handle_message(self, conn: FakeConnection, data: str):
+        self.received += 1
+        message = json.loads(data)
+        _id = message["id"]
+        method = message["method"]
+        params = message.get("params", {})
+        conn.session_id = session_id = message.get("sessionId")
+        if self._delay:
+            await asyncio.sleep(self._delay)
+        handler = self.handlers.get(method)
+        if handler is None and method.endswith((".enable", ".disable")):
+            handler = _empty
+        try:
+            if handler is None:
+                raise CDPError({"code": -32601, "message": f"'{method}' wasn't found"})
+            result = handler(params, conn)
+            if inspect.isawaitable(result):
+                result = await result
+            if result is NO_RESPONSE:
+                return
+            response = {"id": _id, "result": {} if result is None else result}
+        except CDPError as e:
+            response = {"id": _id, "error": {"code": e.code, "message": e.message}}
+        if session_id is not None:
+            response["sessionId"] = session_id
+        await conn.send_raw(_dumps(response))
+        while conn._deferred:
+            await conn._deferred.pop(0)
+
+    # default handlers
+    # noinspection PyUnusedLocal
+    def _get_version(self, params: dict, conn: FakeConnection):
+        return {"protocolVersion": "1.3", "product": "FakeChrome/1.0.0.0", "revision": "@0",
+                "userAgent": "Mozilla/5.0 FakeChrome/1.0.0.0", "jsVersion": "0.0"}
+
+    # noinspection PyUnusedLocal
+    def _get_targets(self, params: dict, conn: FakeConnection):
+        return {"targetInfos": [self._target_info(t) for t in self.targets]}
+
+    def _target_info(self, target: dict):
+        return {"targetId": target["id"], "type": target["type"], "title": target["title"], "url": target["url"],
+                "attached": any(c.target_id == target["id"] for c in self.connections), "canAccessOpener": False}
+
+    # noinspection PyUnusedLocal
+    async def _create_target(self, params: dict, conn: FakeConnection):
+        target = await self.add_target(params.get("url", "about:blank"))
+        return {"targetId": target["id"]}
+
+    # noinspection PyUnusedLocal
+    async def _close_target(self, params: dict, conn: FakeConnection):
+        target_id = params["targetId"]
+        if not any(t["id"] == target_id for t in self.targets):
+            raise CDPError({"code": -32602, "message": "No target with given id found"})
+        await self.remove_target(target_id)
+        return {"success": True}
+
+    def _set_discover_targets(self, params: dict, conn: FakeConnection):
+        discover = params["discover"]
+        if discover and not conn.discover:
+            for target in self.targets:
+                conn.defer(conn.send_event("Target.targetCreated", {"targetInfo": self._target_info(target)}))
+        conn.discover = discover
+
+    # noinspection PyMethodMayBeStatic
+    def _flood(self, params: dict, conn: FakeConnection):
+        conn.defer(conn.send_event(params["method"], params.get("params"), params.get("count", 1), conn.session_id))
+
+    def _attach_to_target(self, params: dict, conn: FakeConnection):
+        target_id = params["targetId"]
+        if not any(t["id"] == target_id for t in self.targets):
+            raise CDPError({"code": -32602, "message": "No target with given id found"})
+        if not params.get("flatten"):
+            raise CDPError({"code": -32000, "message": "only flat mode is supported by the fake server"})
+        session_id = uuid.uuid4().hex.upper()
+        conn.sessions[session_id] = target_id
+        return {"sessionId": session_id}
+
+    # noinspection PyMethodMayBeStatic
+    def _detach_from_target(self, params: dict, conn: FakeConnection):
+        session_id = params["sessionId"]
+        target_id = conn.sessions.pop(session_id, None)
+        if target_id is None:
+            raise CDPError({"code": -32602, "message": "No session with given id"})
+        conn.defer(conn.send_event("Target.detachedFromTarget", {"sessionId": session_id, "targetId": target_id}))
+
+    # noinspection PyUnusedLocal
+    def _print_to_pdf(self, params: dict, conn: FakeConnection):
+        if params.get("transferMode") == "ReturnAsStream":
+            return {"data": "", "stream": self.add_stream(self.document)}
+        return {"data": base64.b64encode(self.document).decode()}
+
+    # noinspection PyUnusedLocal
+    def _capture_screenshot(self, params: dict, conn: FakeConnection):
+        return {"data": base64.b64encode(self.document).decode()}
+
+    # noinspection PyUnusedLocal
+    def _io_read(self, params: dict, conn: FakeConnection):
+        stream = self.streams.get(params["handle"])
+        if stream is None:
+            raise CDPError({"code": -32000, "message": "Invalid stream handle"})
+        data, position, base64_encoded = stream
+        if params.get("offset") is not None:
+            position = params["offset"]
+        chunk = data[position:position + params.get("size", 10 * 1024 * 1024)]
+        stream[1] = position + len(chunk)
+        if base64_encoded:
+            return {"base64Encoded": True, "data": base64.b64encode(chunk).decode(), "eof": stream[1] >= len(data)}
+        return {"data": chunk.decode(), "eof": stream[1] >= len(data)}
+
+    # noinspection PyUnusedLocal
+    def _io_close(self, params: dict, conn: FakeConnection):
+        if self.streams.pop(params["handle"], None) is None:
+            raise CDPError({"code": -32000, "message": "Invalid stream handle"})
+
+    # noinspection PyUnusedLocal
+    def _evaluate(self, params: dict, conn: FakeConnection):
+        result = {"type": "string", "value": params["expression"]}
+        if not params.get("returnByValue"):
+            object_id = uuid.uuid4().hex
+            self.objects[object_id] = (params["expression"], params.get("objectGroup"))
+            result["objectId"] = object_id
+        return {"result": result}
+
+    # noinspection PyUnusedLocal
+    def _call_function_on(self, params: dict, conn: FakeConnection):
+        obj = self.objects.get(params.get("objectId"))
+        if obj is None:
+            raise CDPError({"code": -32000, "message": "Could not find object with given id"})
+        return {"result": {"type": "string", "value": obj[0]}}
+
+    # noinspection PyUnusedLocal
+    def _release_object(self, params: dict, conn: FakeConnection):
+        self.objects.pop(params["objectId"], None)
+
+    # noinspection PyUnusedLocal
+    def _release_object_group(self, params: dict, conn: FakeConnection):
+        group = params["objectGroup"]
+        for object_id in [object_id for object_id, obj in self.objects.items() if obj[1] == group]:
+            del self.objects[object_id]
+
+    def _context(self, conn: FakeConnection) -> dict:
+        return {"context": {"id": self.context_id, "origin": "", "name": "", "uniqueId": str(self.context_id),
+                            "auxData": {"isDefault": True, "type": "default", "frameId": conn.target_id}}}
+
+    async def _runtime_enable(self, params: dict, conn: FakeConnection):
+        if conn.session_id not in conn.runtime:
+            conn.runtime.add(conn.session_id)
+            # existing contexts get reported before the response
+            await conn.send_event("Runtime.executionContextCreated", self._context(conn), session_id=conn.session_id)
+
+    # noinspection PyUnusedLocal
+    def _runtime_disable(self, params: dict, conn: FakeConnection):
+        conn.runtime.discard(conn.session_id)
+
+    @staticmethod
+    def _check_runtime(conn: FakeConnection):
+        if conn.session_id not in conn.runtime:
+            raise CDPError({"code": -32000, "message": "Runtime agent is not enabled"})
+
+    # noinspection PyUnusedLocal
+    def _compile_script(self, params: dict, conn: FakeConnection):
+        self._check_runtime(conn)
+        if not params.get("persistScript"):
+            return {}
+        script_id = str(len(self.scripts) + 1) + uuid.uuid4().hex[:8]
+        self.scripts[script_id] = params["expression"]
+        return {"scriptId": script_id}
+
+    # noinspection PyUnusedLocal
+    def _run_script(self, params: dict, conn: FakeConnection):
+        self._check_runtime(conn)
+        expression = self.scripts.pop(params["scriptId"], None)  # V8 forgets a script once it ran
+        if expression is None:
+            raise CDPError({"code": -32000, "message": "No script with given id"})
+        return {"result": {"type": "string", "value": expression}}
+
+
+class ReplayServer(FakeCDPServer):
+    """
+    plays the frames a socket received back to every websocket connecting to it, serving ``/json`` like
+    ``FakeCDPServer``.
+
+    :param speed: 1 for the original timing, 10 for ten times faster, 0 for as fast as possible
+    :param match_ids: hold back each response until the client sent a command with the same id
+    """
+
+    def __init__(self, path: typing.Union[str, os.PathLike], speed: float = 1, match_ids: bool = True,
+                 host: str = "127.0.0.1", port: int = 0):
+        super().__init__(host=host, port=port)
+        self._path = path
+        self._speed = speed
+        self._match_ids = match_ids
+        self._playing: typing.Set[asyncio.Task] = set()
+        self._requested: typing.Dict[FakeConnection, typing.Dict[int, asyncio.Future]] = {}
+        self.played = 0
+
+    def _on_connect(self, conn: FakeConnection):
+        self._requested[conn] = {}
+        task = asyncio.ensure_future(self._play(conn))
+        self._playing.add(task)
+        task.add_done_callback(self._playing.discard)
+
+    def _requested_future(self, conn: FakeConnection, _id: int) -> asyncio.Future:
+        requested = self._requested[conn]
+        fut = requested.get(_id)
+        if fut is None:
+            fut = requested[_id] = asyncio.get_running_loop().create_future()
+        return fut
+
+    async def _handle_message(self, conn: FakeConnection, data: str):
+        self.received += 1
+        _id = json.loads(data).get("id")
+        if _id is not None:
+            fut = self._requested_future(conn, _id)
+            if not fut.done():
+                fut.set_result(None)
+        return NO_RESPONSE
+
+    async def _play(self, conn: FakeConnection):
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        with Recording(self._path) as recording:
+            for record in recording.inbound():
+                if self._speed:
+                    delay = start + record.timestamp / self._speed - loop.time()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                data = bytes(record.data).decode()
+                if self._match_ids:
+                    _id, _ = peek_frame(data)
+                    if _id is not None:
+                        await self._requested_future(conn, _id)
+                if conn.closed:
+                    break
+                await conn.send_raw(data)
+                self.played += 1
+        self._requested.pop(conn, None)
+
+    async def close(self):
+        for task in list(self._playing):
+            task.cancel()
+        await super().close()
+
+
+def _dumps(obj):
+    # compact, like Chrome
+    return json.dumps(obj, separators=(",", ":"))
+
+
+# noinspection PyUnusedLocal
+def _empty(params: dict, conn: FakeConnection):
+    return {}
+
+
+def run(coro):
+    return asyncio.run(asyncio.wait_for(coro, 30))
+
+
+def page_url(server: FakeCDPServer, idx: int = 0):
+    return f"ws://{server.host}/devtools/page/{server.targets[idx]['id']}"
@@ -0,0 +1,89 @@
+from cdp_socket.socket import SingleCDPSocket
+from cdp_socket.utils.cache import ResponseCache, CachePolicy
+from fake_server import run, page_url, FakeCDPServer
+
+import asyncio
+import unittest
+
+
+class Cache(unittest.TestCase):
+
+    def test_cache(self):
+        async def flood_and_sync(server, sock, method):
+            done = asyncio.ensure_future(sock.wait_for("Fake.done", timeout=5))
+            await server.flood(method)
+            await server.flood("Fake.done")
+            await done
+
+        async def main():
+            calls = {}
+
+            def handler(result):
+                async def handle(params, conn):
+                    calls[params.get("expression", "doc")] = calls.get(params.get("expression", "doc"), 0) + 1
+                    await asyncio.sleep(0.01)
+                    return result
+                return handle
+
+            cache = ResponseCache({"DOM.getDocument": CachePolicy(),
+                                   "Runtime.evaluate": CachePolicy(ttl=0.05, maxsize=1,
+                                                                   when=lambda p: p["expression"] != "Date.now()")})
+            async with FakeCDPServer(handlers={"DOM.getDocument": handler({"root": {"nodeId": 1}}),
+                                               "Runtime.evaluate": handler({"result": {"value": 2}})}) as server:
+                async with SingleCDPSocket(page_url(server), cache=cache) as sock:
+                    # coalesced while in flight, then cached
+                    results = await asyncio.gather(*(sock.exec("DOM.getDocument") for _ in range(5)))
+                    self.assertEqual(results, [{"root": {"nodeId": 1}}] * 5)
+                    await sock.exec("DOM.getDocument")
+                    self.assertEqual(calls["doc"], 1)
+                    self.assertEqual(cache.coalesced, 4)
+
+                    # event-driven invalidation
+                    await flood_and_sync(server, sock, "DOM.documentUpdated")
+                    await sock.exec("DOM.getDocument")
+                    self.assertEqual(calls["doc"], 2)
+
+                    # ttl, lru size and predicate
+                    for _ in range(2):
+                        await sock.exec("Runtime.evaluate", {"expression": "1+1"})
+                        await sock.exec("Runtime.evaluate", {"expression": "Date.now()"})
+                    self.assertEqual((calls["1+1"], calls["Date.now()"]), (1, 2))
+                    await asyncio.sleep(0.06)
+                    await sock.exec("Runtime.evaluate", {"expression": "1+1"})
+                    self.assertEqual(calls["1+1"], 2)
+                    await sock.exec("Runtime.evaluate", {"expression": "2+2"})
+                    await sock.exec("Runtime.evaluate", {"expression": "1+1"})  # evicted by 2+2
+                    self.assertEqual(calls["1+1"], 3)
+                    await flood_and_sync(server, sock, "Page.frameNavigated")
+                    self.assertEqual(cache.stats()["entries"], 1)  # DOM.getDocument only
+
+        run(main())
+
+    def test_cache_reconnect_and_detach(self):
+        async def main():
+            async with FakeCDPServer(handlers={"DOM.getDocument": lambda params, conn: {"root": {"nodeId": 1}}}
+                                     ) as server:
+                async with SingleCDPSocket(server.version["webSocketDebuggerUrl"], cache=ResponseCache(),
+                                           reconnect=True) as sock:
+                    session = await sock.attach(server.targets[0]["id"])
+                    await session.exec("DOM.getDocument")
+                    await sock.exec("DOM.getDocument")
+                    self.assertEqual(len(sock.cache), 2)
+
+                    # only the detached session's entries are dropped
+                    await session.detach()
+                    await asyncio.sleep(0.05)
+                    self.assertEqual(len(sock.cache), 1)
+
+                    # nothing survives a reconnect
+                    await server.connections[0].close(code=1011, reason="crashed")
+                    await asyncio.sleep(0.05)
+                    await sock.exec("Target.getTargets", timeout=5)
+                    self.assertEqual(sock.reconnects, 1)
+                    self.assertEqual(len(sock.cache), 0)
+
+        run(main())
+
+
+if __name__ == '__main__':
+    unittest.main()
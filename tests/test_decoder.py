@@ -0,0 +1,53 @@
+from cdp_socket.socket import SingleCDPSocket
+from cdp_socket.utils.decoder import JSONDecoder
+from fake_server import run, page_url, FakeCDPServer
+
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import unittest
+
+import orjson
+
+
+class Decoder(unittest.TestCase):
+
+    def test_decoder(self):
+        async def main():
+            async with FakeCDPServer() as server:
+                decoder = JSONDecoder(process_threshold=10_000, executor=ThreadPoolExecutor(1))
+                async with SingleCDPSocket(page_url(server), decoder=decoder) as sock:
+                    big = {"data": "x" * 20_000}
+                    received = asyncio.ensure_future(sock.wait_for("Fake.big", timeout=5))
+                    await sock.exec("Fake.flood", {"method": "Fake.big", "params": big})
+                    self.assertEqual(await received, big)
+                    self.assertEqual(decoder.counters["inline"], 1)
+                    self.assertEqual(decoder.counters["process"], 1)
+                    self.assertEqual(decoder.loads('"\\ud800"'), "\ud800")  # lone surrogate
+                    self.assertEqual(decoder.counters["fallback"], 1)
+                    self.assertEqual(decoder.counters["process_size"], len(orjson.dumps(
+                        {"method": "Fake.big", "params": big}).decode()))
+                decoder.executor.shutdown()
+
+        run(main())
+
+    def test_decoder_pool_shutdown(self):
+        async def main():
+            decoder = JSONDecoder(process_threshold=10_000, max_workers=1)
+            # fork the worker before any connection exists, it would keep their sockets open
+            await asyncio.get_running_loop().run_in_executor(decoder.executor, int)
+            pool = decoder.executor
+            async with FakeCDPServer() as server:
+                async with SingleCDPSocket(page_url(server), decoder=decoder) as sock:
+                    async with SingleCDPSocket(page_url(server), decoder=decoder):
+                        received = asyncio.ensure_future(sock.wait_for("Fake.big", timeout=5))
+                        await sock.exec("Fake.flood", {"method": "Fake.big", "params": {"data": "x" * 20_000}})
+                        await received
+                    self.assertIs(decoder._executor, pool)  # still in use
+                self.assertIsNone(decoder._executor)
+                self.assertEqual(decoder.counters["process"], 1)
+
+        run(main())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,153 @@
+from cdp_socket.socket import CDPSocket, SingleCDPSocket
+from cdp_socket.utils.discovery import Discovery
+from fake_server import run, FakeCDPServer
+
+import asyncio
+import unittest
+
+import websockets
+
+
+class Targets(unittest.TestCase):
+
+    def test_live_targets(self):
+        async def main():
+            async with FakeCDPServer(n_targets=2) as server:
+                async with await CDPSocket(server.port, live_targets=True) as base_socket:
+                    discovery = base_socket.discovery
+                    requests = discovery.requests
+                    targets = await base_socket.targets
+                    self.assertEqual({t["id"] for t in targets}, {t["id"] for t in server.targets})
+                    created = asyncio.ensure_future(
+                        (await base_socket.get_browser_socket()).wait_for("Target.targetCreated", timeout=5))
+                    target = await server.add_target("https://example.com")
+                    await created
+                    self.assertEqual(discovery.get_target(target["id"])["url"], "https://example.com")
+                    sock = await base_socket.get_socket(discovery.get_target(target["id"]))
+                    self.assertEqual((await sock.exec("Browser.getVersion"))["product"], "FakeChrome/1.0.0.0")
+                    destroyed = asyncio.ensure_future(
+                        (await base_socket.get_browser_socket()).wait_for("Target.targetDestroyed", timeout=5))
+                    await server.remove_target(target["id"])
+                    await destroyed
+                    self.assertEqual(len(await base_socket.targets), 2)
+                    self.assertEqual(discovery.requests, requests)  # no http round-trips
+                    self.assertIs(await discovery.version(), await discovery.version())
+
+        run(main())
+
+    def test_probe(self):
+        async def main():
+            async with FakeCDPServer() as server:
+                connected = []
+                server._on_connect = connected.append
+                async with CDPSocket(server.port, probe="skip"):
+                    self.assertEqual(connected, [])
+                async with CDPSocket(server.port, probe="reuse") as base_socket:
+                    self.assertEqual(len(connected), 1)
+                    sock = await base_socket.get_socket((await base_socket.targets)[0])
+                    self.assertEqual(len(connected), 1)  # the probe's connection
+                    self.assertEqual((await sock.exec("Browser.getVersion"))["product"], "FakeChrome/1.0.0.0")
+                async with CDPSocket(server.port) as base_socket:
+                    self.assertEqual(len(connected), 2)
+                    await base_socket.get_socket((await base_socket.targets)[0])
+                    self.assertEqual(len(connected), 3)
+                with self.assertRaises(ValueError):
+                    CDPSocket(server.port, probe="ping")
+
+        run(main())
+
+    def test_get_sockets(self):
+        async def main():
+            async with FakeCDPServer(n_targets=5) as server:
+                connected = []
+                server._on_connect = connected.append
+                async with CDPSocket(server.port, probe="skip") as base_socket:
+                    targets = await base_socket.targets
+                    existing = await base_socket.get_socket(targets[0])
+                    sockets, errors = await base_socket.get_sockets(targets + [targets[1]["id"], "missing"],
+                                                                    concurrency=2)
+                    self.assertEqual(set(sockets), {t["id"] for t in targets})
+                    self.assertIs(sockets[targets[0]["id"]], existing)
+                    self.assertEqual(list(errors), ["missing"])
+                    self.assertIsInstance(errors["missing"], websockets.InvalidStatusCode)
+                    self.assertEqual(len(connected), 5)
+                    self.assertEqual((await sockets[targets[4]["id"]].exec("Browser.getVersion"))["product"],
+                                     "FakeChrome/1.0.0.0")
+                    # all reused
+                    sockets, errors = await base_socket.get_sockets()
+                    self.assertEqual((len(sockets), len(errors), len(connected)), (5, 0, 5))
+                    # but not a closed one
+                    await existing.close()
+                    sockets, errors = await base_socket.get_sockets()
+                    self.assertEqual((len(sockets), len(errors), len(connected)), (5, 0, 6))
+                    self.assertIsNot(sockets[targets[0]["id"]], existing)
+                    self.assertEqual((await sockets[targets[0]["id"]].exec("Browser.getVersion"))["product"],
+                                     "FakeChrome/1.0.0.0")
+                    self.assertIs(await base_socket.get_socket(targets[0]), sockets[targets[0]["id"]])
+
+        run(main())
+
+    def test_backoff(self):
+        async def main():
+            async with FakeCDPServer() as server:
+                port = server.port
+            discovery = Discovery(f"127.0.0.1:{port}", backoff_base=0.01, backoff_cap=0.05)
+            with self.assertRaises(asyncio.TimeoutError):
+                await discovery.get_json(timeout=0.3)
+            self.assertGreater(discovery.retries, 1)
+            self.assertLess(discovery.retries, 100)
+            await discovery.close()
+
+        run(main())
+
+    def test_non_json_retried(self):
+        async def main():
+            from aiohttp import web
+            calls = []
+
+            async def handle(request):
+                calls.append(request.path)
+                if len(calls) < 3:
+                    return web.Response(text="starting")
+                return web.json_response([])
+
+            app = web.Application()
+            app.router.add_get("/json", handle)
+            runner = web.AppRunner(app)
+            await runner.setup()
+            site = web.TCPSite(runner, "127.0.0.1", 0)
+            await site.start()
+            try:
+                port = site._server.sockets[0].getsockname()[1]
+                discovery = Discovery(f"127.0.0.1:{port}", backoff_base=0.01, backoff_cap=0.05)
+                self.assertEqual(await discovery.get_json(timeout=5), [])
+                self.assertEqual(discovery.retries, 2)
+                await discovery.close()
+            finally:
+                await runner.cleanup()
+
+        run(main())
+
+    def test_watch_switch(self):
+        async def main():
+            async with FakeCDPServer() as server:
+                url = f"ws://127.0.0.1:{server.port}/devtools/browser/fake"
+                async with SingleCDPSocket(url) as first, SingleCDPSocket(url) as second:
+                    discovery = Discovery(f"127.0.0.1:{server.port}")
+                    await discovery.watch(first)
+                    await discovery.watch(second)
+                    self.assertFalse(any(first._events.values()))
+                    self.assertNotIn(discovery._on_closed, first.on_closed)
+                    self.assertEqual(len(second._events["Target.targetCreated"]), 1)
+
+                    discovery._on_target({"targetInfo": {"targetId": "W", "type": "worklet", "title": "", "url": ""}})
+                    self.assertNotIn("webSocketDebuggerUrl", discovery.get_target("W"))
+                    page = discovery.get_target(server.targets[0]["id"])
+                    self.assertTrue(page["webSocketDebuggerUrl"].endswith(f"/devtools/page/{page['id']}"))
+                    await discovery.close()
+
+        run(main())
+
+
+if __name__ == '__main__':
+    unittest.main()
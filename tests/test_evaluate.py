@@ -0,0 +1,124 @@
+from cdp_socket.exceptions import CDPError
+from cdp_socket.socket import SingleCDPSocket
+from cdp_socket.utils.metrics import Metrics
+from cdp_socket.scripts.evaluate import ScriptCache
+from fake_server import run, page_url, FakeCDPServer
+
+import asyncio
+import json
+import unittest
+
+
+class Evaluate(unittest.TestCase):
+
+    def test_script_cache(self):
+        async def main():
+            metrics = Metrics()
+            async with FakeCDPServer() as server:
+                async with SingleCDPSocket(page_url(server), metrics=metrics) as sock:
+                    scripts = ScriptCache(sock)
+                    script = "[" + ",".join(["1"] * 1000) + "]"
+                    results = await asyncio.gather(*(scripts.evaluate(script) for _ in range(5)))
+                    # the fake returns the installed function's source
+                    self.assertTrue(all(json.dumps(script) in res["result"]["value"] for res in results))
+                    self.assertEqual(scripts.compiled, 1)  # concurrent compiles coalesced
+
+                    before = metrics.bytes_sent
+                    await scripts.evaluate(script)
+                    self.assertLess(metrics.bytes_sent - before, 200)  # only the objectId got sent
+
+                    # invalidated by the event
+                    done = asyncio.ensure_future(sock.wait_for("Runtime.executionContextsCleared", timeout=5))
+                    await server.clear_contexts()
+                    await done
+                    self.assertEqual(len(scripts), 0)
+                    await scripts.evaluate(script)
+                    self.assertEqual(scripts.compiled, 2)
+
+                    # installed again if the function is gone without an event
+                    server.objects.clear()
+                    self.assertIn(json.dumps(script), (await scripts.evaluate(script))["result"]["value"])
+                    self.assertEqual(scripts.compiled, 3)
+                    self.assertEqual(scripts.runs, 8)
+
+                    # a separate function per context, the default one keyed by its id
+                    await scripts.evaluate(script, context_id=7)
+                    self.assertEqual(len(scripts), 2)
+                    await scripts.evaluate(script, context_id=server.context_id)
+                    self.assertEqual(scripts.compiled, 4)
+
+                    # only the destroyed context's functions are dropped
+                    destroyed = asyncio.ensure_future(sock.wait_for("Runtime.executionContextDestroyed", timeout=5))
+                    await server.flood("Runtime.executionContextDestroyed", {"executionContextId": 7})
+                    await destroyed
+                    self.assertEqual(len(scripts), 1)
+                    destroyed = asyncio.ensure_future(sock.wait_for("Runtime.executionContextDestroyed", timeout=5))
+                    await server.flood("Runtime.executionContextDestroyed", {"executionContextId": server.context_id})
+                    await destroyed
+                    self.assertEqual(len(scripts), 0)
+
+                    scripts.close()
+                    await asyncio.sleep(0.05)
+                    self.assertEqual(server.objects, {})  # released
+
+        run(main())
+
+    def test_fake_run_script_once(self):
+        async def main():
+            async with FakeCDPServer() as server:
+                async with SingleCDPSocket(page_url(server)) as sock:
+                    await sock.exec("Runtime.enable")
+                    res = await sock.exec("Runtime.compileScript", {"expression": "1", "sourceURL": "",
+                                                                    "persistScript": True})
+                    params = {"scriptId": res["scriptId"]}
+                    self.assertEqual((await sock.exec("Runtime.runScript", params))["result"]["value"], "1")
+                    with self.assertRaises(CDPError) as cm:
+                        await sock.exec("Runtime.runScript", params)  # like V8
+                    self.assertEqual(cm.exception.message, "No script with given id")
+
+        run(main())
+
+    def test_script_cache_runtime(self):
+        async def main():
+            enables = []
+
+            def runtime_enable(params, conn):
+                enables.append(conn.session_id)
+                conn.runtime.add(conn.session_id)
+
+            def call_function_on(params, conn):
+                raise CDPError({"code": -32000, "message": "Object couldn't be returned by value"})
+
+            async with FakeCDPServer(handlers={"Runtime.enable": runtime_enable}) as server:
+                async with SingleCDPSocket(page_url(server)) as sock:
+                    with self.assertRaises(CDPError) as cm:
+                        await sock.exec("Runtime.compileScript", {"expression": "1", "sourceURL": "",
+                                                                  "persistScript": True})
+                    self.assertEqual(cm.exception.message, "Runtime agent is not enabled")
+                    scripts = ScriptCache(sock)
+                    await asyncio.gather(*(scripts.evaluate("1") for _ in range(3)))
+                    await scripts.evaluate("2")
+                    self.assertEqual(enables, [None])
+
+                # a reference with auto_enable
+                async with SingleCDPSocket(page_url(server), auto_enable=True, auto_disable_delay=0) as sock:
+                    scripts = ScriptCache(sock)
+                    await scripts.evaluate("1")
+                    self.assertEqual(len(enables), 2)
+                    self.assertEqual(sock.domains.refs()["Runtime"], 4)  # three listeners and the cache
+                    scripts.close()
+                    self.assertNotIn("Runtime", sock.domains.refs())
+
+                # other -32000 errors aren't retried with a reinstall
+                server.handlers["Runtime.callFunctionOn"] = call_function_on
+                async with SingleCDPSocket(page_url(server)) as sock:
+                    scripts = ScriptCache(sock)
+                    with self.assertRaises(CDPError):
+                        await scripts.evaluate("1")
+                    self.assertEqual(scripts.compiled, 1)
+
+        run(main())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,200 @@
+from cdp_socket.exceptions import CDPError, BufferOverflowError, SocketExcitedError
+from cdp_socket.socket import SingleCDPSocket
+from cdp_socket.utils.frames import peek_frame, LazyParams
+from fake_server import run, page_url, FakeCDPServer
+
+import asyncio
+import unittest
+
+
+class Receive(unittest.TestCase):
+
+    def test_lazy_params(self):
+        async def main():
+            async with FakeCDPServer() as server:
+                async with SingleCDPSocket(page_url(server), lazy_params=True) as sock:
+                    received = []
+                    sock.add_listener("Fake.event", received.append)
+                    done = asyncio.ensure_future(sock.wait_for("Fake.done", timeout=5))
+                    await sock.exec("Fake.flood", {"method": "Fake.unsubscribed", "count": 10})
+                    await sock.exec("Fake.flood", {"method": "Fake.event", "params": {"a": [1, 2]}, "count": 2})
+                    await server.flood("Fake.done")
+                    await done
+                    self.assertEqual(len(received), 2)
+                    self.assertIsInstance(received[0], LazyParams)
+                    self.assertFalse(received[0].loaded)
+                    self.assertEqual(received[0]["a"], [1, 2])
+                    self.assertEqual(dict(received[1]), {"a": [1, 2]})
+                    self.assertNotIn("Fake.unsubscribed", sock._events)
+
+        run(main())
+
+    def test_queued_listeners(self):
+        async def main():
+            async with FakeCDPServer() as server:
+                async with SingleCDPSocket(page_url(server)) as sock:
+                    slow_seen, latest_seen = [], []
+
+                    async def slow(params):
+                        await asyncio.sleep(0.05)
+                        slow_seen.append(params["n"])
+
+                    sock.add_listener("Fake.event", slow, maxsize=2, policy="drop_oldest")
+                    sock.add_listener("Fake.event", latest_seen.append, policy="coalesce_latest")
+                    done = asyncio.ensure_future(sock.wait_for("Fake.done", timeout=5))
+                    for n in range(20):
+                        await server.flood("Fake.event", {"n": n})
+                    await server.flood("Fake.done")
+                    await done
+                    # the slow listener didn't delay the response
+                    start = asyncio.get_running_loop().time()
+                    await sock.exec("Browser.getVersion")
+                    self.assertLess(asyncio.get_running_loop().time() - start, 0.04)
+
+                    stats = sock.listener_stats()["Fake.event"]
+                    self.assertEqual(stats[0]["policy"], "drop_oldest")
+                    self.assertGreater(stats[0]["dropped"], 0)
+                    await asyncio.sleep(0.2)
+                    self.assertEqual(slow_seen[-1], 19)
+                    self.assertEqual(latest_seen[-1], {"n": 19})
+                    sock.remove_listener("Fake.event", slow)
+                    self.assertEqual(len(sock.listener_stats()["Fake.event"]), 1)
+
+        run(main())
+
+    def test_auto_enable(self):
+        async def main():
+            calls = []
+
+            def enable(params, conn):
+                calls.append("Fake.enable")
+                return {}
+
+            def disable(params, conn):
+                calls.append("Fake.disable")
+                return {}
+
+            def missing(params, conn):
+                raise CDPError({"code": -32601, "message": "'Missing.enable' wasn't found"})
+
+            handlers = {"Fake.enable": enable, "Fake.disable": disable, "Missing.enable": missing}
+            async with FakeCDPServer(handlers=handlers) as server:
+                async with SingleCDPSocket(page_url(server), auto_enable=True, auto_disable_delay=0.05) as sock:
+                    sock.add_listener("Fake.event", print)
+                    sock.add_listener("Fake.other", print)
+                    sock.add_listener("Target.targetCreated", print)
+                    done = asyncio.ensure_future(sock.wait_for("Fake.done", timeout=5))
+                    await asyncio.sleep(0.01)
+                    self.assertEqual(calls, ["Fake.enable"])
+                    self.assertEqual(sock.domains.refs(), {"Fake": 3})
+                    await server.flood("Fake.done")
+                    await done
+                    sock.remove_listener("Fake.event", print)
+                    sock.remove_listener("Fake.other", print)
+                    # re-acquired within the debounce delay
+                    sock.add_listener("Fake.event", print)
+                    await asyncio.sleep(0.1)
+                    self.assertEqual(calls, ["Fake.enable"])
+                    sock.remove_listener("Fake.event", print)
+                    await asyncio.sleep(0.1)
+                    self.assertEqual(calls, ["Fake.enable", "Fake.disable"])
+                    self.assertEqual(sock.domains.enabled, set())
+                    # domains without an enable command are skipped from then on
+                    _iter = sock.method_iterator("Missing.event")
+                    await _iter.ready
+                    _iter.close()
+                    self.assertEqual(sock.domains.enabled, set())
+                    self.assertIsNone(sock.method_iterator("Missing.event").ready)
+
+                    # enabled by the user: a listener doesn't disable it on removal
+                    calls.clear()
+                    await sock.exec("Fake.enable")
+                    sock.add_listener("Fake.event", print)
+                    sock.remove_listener("Fake.event", print)
+                    await asyncio.sleep(0.1)
+                    self.assertEqual(calls, ["Fake.enable"])
+                    self.assertEqual(sock.domains.enabled, {"Fake"})
+                    await sock.exec("Fake.disable")
+                    sock.add_listener("Fake.event", print)
+                    await asyncio.sleep(0.01)
+                    self.assertEqual(calls, ["Fake.enable", "Fake.disable", "Fake.enable"])
+
+        run(main())
+
+    def test_method_iterator_lossless(self):
+        async def main():
+            async with FakeCDPServer() as server:
+                async with SingleCDPSocket(page_url(server)) as sock:
+                    _iter = sock.method_iterator("Fake.event")
+                    await sock.exec("Fake.flood", {"method": "Fake.event", "params": {"a": 1}, "count": 50})
+                    await sock.exec("Browser.getVersion")
+                    received = [await _iter.__anext__() for _ in range(50)]
+                    self.assertEqual(received, [{"a": 1}] * 50)
+                    _iter.close()
+                    self.assertFalse(sock._subscribed("Fake.event"))
+
+        run(main())
+
+    def test_stream(self):
+        async def main():
+            async with FakeCDPServer() as server:
+                async with SingleCDPSocket(page_url(server)) as sock:
+                    batches = []
+                    async with sock.stream("Fake.event", max_batch=30, max_delay=0.5,
+                                           predicate=lambda p: p["n"] % 2 == 0) as stream:
+                        for n in range(100):
+                            await server.flood("Fake.event", {"n": n})
+                        async for batch in stream:
+                            batches.append(batch)
+                            if sum(map(len, batches)) == 50:
+                                break
+                    self.assertEqual([len(b) for b in batches], [30, 20])
+                    self.assertEqual([e["n"] for b in batches for e in b], list(range(0, 100, 2)))
+
+                    stream = sock.stream("Fake.event", maxsize=10, overflow="error")
+                    await sock.exec("Fake.flood", {"method": "Fake.event", "params": {"n": 0}, "count": 11})
+                    await sock.exec("Browser.getVersion")
+                    with self.assertRaises(BufferOverflowError):
+                        await stream.__anext__()
+                    stream.close()
+
+        run(main())
+
+    def test_iterator_close_wakes(self):
+        async def main():
+            async with FakeCDPServer() as server:
+                sock = await SingleCDPSocket(page_url(server))
+                _iter = sock.method_iterator("Fake.event")
+                consumer = asyncio.ensure_future(_iter.__anext__())
+                await asyncio.sleep(0.05)
+                _iter.close()
+                with self.assertRaises(StopAsyncIteration):
+                    await consumer
+
+                batches = []
+
+                async def consume():
+                    async for batch in sock.stream("Fake.event"):
+                        batches.append(batch)
+
+                consumer = asyncio.ensure_future(consume())
+                waiting = asyncio.ensure_future(sock.wait_for("Fake.event"))
+                await asyncio.sleep(0.05)
+                await sock.close()
+                await consumer  # ends the async for
+                self.assertEqual(batches, [])
+                with self.assertRaises(SocketExcitedError):
+                    await waiting
+                self.assertFalse(sock._iterators)
+                self.assertFalse(sock._subscribed("Fake.event"))
+
+        run(main())
+
+    def test_peek_frame(self):
+        self.assertEqual(peek_frame('{"id":12,"result":{}}'), (12, None))
+        self.assertEqual(peek_frame('{"method":"Page.loadEventFired","params":{}}'), (None, "Page.loadEventFired"))
+        self.assertEqual(peek_frame('{"result":{},"id":1}'), (None, None))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+from cdp_socket.exceptions import CDPError
+from cdp_socket.socket import SingleCDPSocket
+from cdp_socket.utils.encoder import FrameEncoder
+from fake_server import run, page_url, FakeCDPServer, NO_RESPONSE
+
+import asyncio
+import json
+import time
+import unittest
+
+import websockets
+
+
+class Exec(unittest.TestCase):
+
+    def test_exec_many(self):
+        async def main():
+            async with FakeCDPServer() as server:
+                async with SingleCDPSocket(page_url(server)) as sock:
+                    res = await sock.exec_many([("Browser.getVersion",), ("Unknown.method", {"a": 1}),
+                                                ("Page.enable", {})])
+                    self.assertEqual(res[0]["product"], "FakeChrome/1.0.0.0")
+                    self.assertIsInstance(res[1], CDPError)
+                    self.assertEqual(res[2], {})
+                    self.assertEqual(await sock.exec_many([]), [])
+                    self.assertEqual(len(sock.pending), 0)
+
+        run(main())
+
+    def test_exec_many_timeout(self):
+        async def main():
+            async with FakeCDPServer(handlers={"Never.respond": lambda params, conn: NO_RESPONSE}) as server:
+                async with SingleCDPSocket(page_url(server)) as sock:
+                    res = await sock.exec_many([("Page.enable",), ("Never.respond",)], timeout=0.2)
+                    self.assertEqual(res[0], {})
+                    self.assertIsInstance(res[1], asyncio.TimeoutError)
+
+        run(main())
+
+    def test_late_and_orphaned(self):
+        async def main():
+            async with FakeCDPServer(handlers={"Never.respond": lambda params, conn: NO_RESPONSE}) as server:
+                async with SingleCDPSocket(page_url(server)) as sock:
+                    with self.assertRaises(asyncio.TimeoutError):
+                        await sock.exec("Never.respond", timeout=0.05)
+                    _id = sock._req_count - 1
+                    self.assertEqual(sock.pending.stats(), {"pending": 0, "expired": 1, "late": 0, "orphaned": 0})
+                    await server.connections[0].send_raw(f'{{"id":{_id},"result":{{}}}}')
+                    await server.connections[0].send_raw('{"id":123456,"result":{}}')
+                    await sock.exec("Browser.getVersion")
+                    self.assertEqual(sock.pending.stats(), {"pending": 0, "expired": 1, "late": 1, "orphaned": 1})
+
+        run(main())
+
+    def test_as_completed(self):
+        async def main():
+            async with FakeCDPServer() as server:
+                async with SingleCDPSocket(page_url(server)) as sock:
+                    commands = [("Browser.getVersion",)] * 10 + [("Unknown.method",)]
+                    seen = {}
+                    async for idx, res in sock.as_completed(commands):
+                        seen[idx] = res
+                    self.assertEqual(sorted(seen.keys()), list(range(11)))
+                    self.assertIsInstance(seen[10], CDPError)
+
+        run(main())
+
+    def test_coalesce_writes(self):
+        async def main():
+            async with FakeCDPServer() as server:
+                async with SingleCDPSocket(page_url(server), coalesce_writes=True) as sock:
+                    res = await asyncio.gather(*(sock.exec("Browser.getVersion") for _ in range(50)))
+                    self.assertEqual(len(res), 50)
+                    self.assertEqual(sock._writer.frames, 50)
+                    self.assertEqual(sock._writer.writes, 1)
+                    self.assertEqual(server.received, 50)
+
+        run(main())
+
+    def test_fail_fast(self):
+        async def main():
+            async with FakeCDPServer(handlers={"Never.respond": lambda params, conn: NO_RESPONSE}) as server:
+                sock = await SingleCDPSocket(page_url(server))
+                closed = []
+                sock.on_closed.append(lambda code, reason: closed.append(code))
+                fut = asyncio.ensure_future(sock.exec("Never.respond", timeout=10))
+                await asyncio.sleep(0.05)
+                start = time.perf_counter()
+                await server.connections[0].close(code=1011, reason="crashed")
+                with self.assertRaises(websockets.exceptions.ConnectionClosedError):
+                    await fut
+                self.assertLess(time.perf_counter() - start, 1)
+                self.assertEqual(closed, [1011])
+                self.assertEqual(len(sock.pending), 0)
+
+        run(main())
+
+    def test_encoder(self):
+        encoder = FrameEncoder()
+        self.assertEqual(json.loads(encoder.encode(3, "Page.navigate", {"url": "about:blank"})),
+                         {"method": "Page.navigate", "id": 3, "params": {"url": "about:blank"}})
+        self.assertEqual(json.loads(encoder.encode(4, "Page.navigate")), {"method": "Page.navigate", "id": 4})
+        self.assertEqual(json.loads(encoder.encode(5, "A.b", {"big": 2 ** 70}))["params"]["big"], 2 ** 70)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+from cdp_socket.exceptions import CDPError
+from cdp_socket.socket import CDPSocket, SingleCDPSocket
+from fake_server import FakeCDPServer
+
+import asyncio
+import unittest
+
+
+def run(coro):
+    return asyncio.run(asyncio.wait_for(coro, 30))
+
+
+class FakeServer(unittest.TestCase):
+
+    def test_cdp_socket(self):
+        async def main():
+            async with FakeCDPServer(n_targets=2) as server:
+                base_socket = await CDPSocket(server.port)
+                targets = await base_socket.targets
+                self.assertEqual([t["id"] for t in targets], [t["id"] for t in server.targets])
+                sock = await base_socket.get_socket(targets[1])
+                res = await sock.exec("Browser.getVersion")
+                self.assertEqual(res["product"], "FakeChrome/1.0.0.0")
+                await base_socket.close()
+
+        run(main())
+
+    def test_errors_and_handlers(self):
+        async def main():
+            async def evaluate(params, conn):
+                return {"result": {"type": "string", "value": params["expression"]}}
+
+            async with FakeCDPServer(handlers={"Runtime.evaluate": evaluate}) as server:
+                url = f"ws://{server.host}/devtools/page/{server.targets[0]['id']}"
+                async with SingleCDPSocket(url) as sock:
+                    res = await sock.exec("Runtime.evaluate", {"expression": "1+1"})
+                    self.assertEqual(res["result"]["value"], "1+1")
+                    self.assertEqual(await sock.exec("Page.enable"), {})
+                    with self.assertRaises(CDPError) as cm:
+                        await sock.exec("Unknown.method")
+                    self.assertEqual(cm.exception.code, -32601)
+
+        run(main())
+
+    def test_flood(self):
+        async def main():
+            async with FakeCDPServer() as server:
+                url = f"ws://{server.host}/devtools/page/{server.targets[0]['id']}"
+                async with SingleCDPSocket(url) as sock:
+                    received = []
+                    sock.add_listener("Fake.event", received.append)
+                    done = asyncio.ensure_future(sock.wait_for("Fake.done", timeout=5))
+                    await sock.exec("Fake.flood", {"method": "Fake.event", "params": {"n": 1}, "count": 100})
+                    await server.flood("Fake.done")
+                    await done
+                    self.assertEqual(len(received), 100)
+                    self.assertEqual(received[0], {"n": 1})
+
+        run(main())
+
+
+if __name__ == '__main__':
+    unittest.main()
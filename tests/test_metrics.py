@@ -0,0 +1,76 @@
+from cdp_socket.exceptions import CDPError, SocketExcitedError
+from cdp_socket.socket import SingleCDPSocket
+from cdp_socket.utils.metrics import Metrics, Tracer
+from fake_server import run, page_url, FakeCDPServer, NO_RESPONSE
+
+import asyncio
+import unittest
+
+
+class Instrumentation(unittest.TestCase):
+
+    def test_metrics(self):
+        async def main():
+            class Recorder(Tracer):
+                def __init__(self):
+                    self.ended = []
+
+                def request_start(self, method, params, session_id=None):
+                    return method
+
+                def request_end(self, token, method, duration, error=None):
+                    self.ended.append((token, error.__class__.__name__ if error else None))
+
+            metrics = Metrics()
+            tracer = Recorder()
+            metrics.add_tracer(tracer)
+            async with FakeCDPServer(handlers={"Never.respond": lambda params, conn: NO_RESPONSE}) as server:
+                def queued(params):
+                    pass
+
+                async with SingleCDPSocket(page_url(server), metrics=metrics) as sock:
+                    sock.add_listener("Fake.event", lambda params: None)
+                    sock.add_listener("Fake.event", queued, maxsize=10)
+                    await sock.exec_many([("Browser.getVersion",)] * 3)
+                    with self.assertRaises(CDPError):
+                        await sock.exec("Unknown.method")
+                    with self.assertRaises(asyncio.TimeoutError):
+                        await sock.exec("Never.respond", timeout=0.05)
+                    task = asyncio.ensure_future(sock.exec("Never.respond", timeout=5))
+                    await asyncio.sleep(0.01)
+                    task.cancel()
+                    done = asyncio.ensure_future(sock.wait_for("Fake.done", timeout=5))
+                    await sock.exec("Fake.flood", {"method": "Fake.event", "count": 5})
+                    await server.flood("Fake.done")
+                    await done
+                    lost = asyncio.ensure_future(sock.exec("Never.respond", timeout=5))
+                    await asyncio.sleep(0.01)
+                with self.assertRaises(SocketExcitedError):
+                    await lost
+            snapshot = metrics.snapshot()
+            self.assertEqual(snapshot["requests"]["Browser.getVersion"]["count"], 3)
+            self.assertEqual(snapshot["errors"], {"Unknown.method": 1})
+            self.assertEqual(snapshot["timeouts"], {"Never.respond": 1})
+            self.assertEqual(snapshot["cancelled"], {"Never.respond": 1})
+            self.assertNotIn("Never.respond", snapshot["requests"])  # no latency sample
+            self.assertEqual(snapshot["events"]["Fake.event"], 5)
+            self.assertEqual(snapshot["disconnected"], {"Never.respond": 1})
+            self.assertEqual(sum(h["count"] for h in snapshot["callbacks"].values()), 10)
+            self.assertEqual(snapshot["callbacks"][f"Fake.event:{queued.__qualname__}"]["count"], 5)
+            self.assertEqual(snapshot["frames_sent"], 8)
+            self.assertGreater(snapshot["bytes_received"], snapshot["bytes_sent"])
+            self.assertEqual(snapshot["pending"], 0)
+            self.assertIn(("Unknown.method", "CDPError"), tracer.ended)
+            self.assertIn(("Never.respond", "TimeoutError"), tracer.ended)
+            text = metrics.prometheus()
+            self.assertIn('cdp_socket_request_duration_seconds_bucket{method="Browser.getVersion",le="+Inf"} 3',
+                          text)
+            self.assertIn('cdp_socket_request_failures_total{method="Never.respond",reason="timeout"} 1', text)
+            self.assertIn('cdp_socket_request_failures_total{method="Never.respond",reason="disconnected"} 1', text)
+            self.assertIn("# TYPE cdp_socket_pending_requests gauge", text)
+
+        run(main())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+from cdp_socket.socket import CDPSocket
+from cdp_socket.utils.pool import ChromePool, launch
+from fake_server import run
+
+import asyncio
+import glob
+import os
+import sys
+import tempfile
+import time
+import unittest
+
+
+class Pool(unittest.TestCase):
+    fake_chrome = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_chrome.py")
+
+    def test_pool(self):
+        async def main():
+            with tempfile.TemporaryDirectory() as template:
+                with open(os.path.join(template, "Preferences"), "w") as f:
+                    f.write("{}")
+                args = [self.fake_chrome, "--stderr-lines=20000"]
+                async with ChromePool(size=2, binary_path=sys.executable, args=args,
+                                      profile_template=template) as pool:
+                    self.assertEqual(pool.stats()["ready"], 2)
+                    async with pool.browser(timeout=10) as chrome:
+                        self.assertTrue(os.path.isfile(os.path.join(chrome.data_dir, "Preferences")))
+                        self.assertTrue(chrome.ws_url.startswith(f"ws://{chrome.host}/devtools/browser/"))
+                        async with await CDPSocket(chrome.port) as base_socket:
+                            sock = await base_socket.get_socket((await base_socket.targets)[0])
+                            res = await sock.exec("Browser.getVersion")
+                            self.assertEqual(res["product"], "FakeChrome/1.0.0.0")
+                    self.assertIsNotNone(chrome.process.poll())
+                    self.assertFalse(os.path.exists(chrome.data_dir))
+                    await pool.start()
+                    self.assertEqual(pool.stats()["ready"], 2)
+                    self.assertEqual(pool.launched, 3)
+
+        run(main())
+
+    def test_close_while_launching(self):
+        import cdp_socket.utils.pool as pool_module
+        launched = []
+
+        def _launch(**kwargs):
+            time.sleep(0.2)  # still in the executor when the pool gets closed
+            chrome = launch(**kwargs)
+            launched.append(chrome)
+            return chrome
+
+        async def main():
+            pool = ChromePool(size=3, binary_path=sys.executable, args=[self.fake_chrome])
+            await pool.start(wait=False)
+            await asyncio.sleep(0.05)
+            await pool.close()
+            self.assertEqual(len(launched), 3)
+            for chrome in launched:
+                self.assertIsNotNone(chrome.process.poll())
+                self.assertFalse(os.path.exists(chrome.data_dir))
+
+        pool_module.launch = _launch
+        try:
+            run(main())
+        finally:
+            pool_module.launch = launch
+
+    def test_failed_launches(self):
+        async def main():
+            # the browser exits before listening
+            args = [self.fake_chrome, "--exit-code=3"]
+            async with ChromePool(size=1, binary_path=sys.executable, args=args, retries=1) as pool:
+                with self.assertRaises(RuntimeError) as cm:
+                    await pool.acquire(timeout=30)
+                self.assertIn("failed to launch", str(cm.exception))
+                self.assertEqual(pool.failed, 4)  # two attempts by start(), two by acquire()
+
+            # launch() itself raises, its temporary profile gets removed
+            before = set(glob.glob(os.path.join(tempfile.gettempdir(), "cdp_socket_*")))
+            async with ChromePool(size=1, binary_path=os.path.join(tempfile.gettempdir(), "no-such-chrome"),
+                                  retries=0) as pool:
+                with self.assertRaises(FileNotFoundError):
+                    await pool.acquire(timeout=30)
+                self.assertEqual(pool.failed, 2)  # start() and acquire() tried once each
+            self.assertEqual(set(glob.glob(os.path.join(tempfile.gettempdir(), "cdp_socket_*"))), before)
+
+        run(main())
+
+    def test_recycle(self):
+        async def main():
+            async with ChromePool(size=1, binary_path=sys.executable, args=[self.fake_chrome],
+                                  recycle=True) as pool:
+                chrome = await pool.acquire(timeout=10)
+                async with await CDPSocket(chrome.port) as base_socket:
+                    first = (await base_socket.targets)[0]["id"]
+                with self.assertRaises(asyncio.TimeoutError):
+                    await pool.acquire(timeout=0.2)  # the only browser is in use
+                waiting = asyncio.ensure_future(pool.acquire(timeout=10))
+                await pool.release(chrome)
+                self.assertIs(await waiting, chrome)
+                self.assertIsNone(chrome.process.poll())
+                async with await CDPSocket(chrome.port) as base_socket:
+                    targets = await base_socket.targets
+                self.assertEqual(len(targets), 1)
+                self.assertNotEqual(targets[0]["id"], first)  # a fresh page
+                self.assertEqual(pool.stats()["recycled"], 1)
+                self.assertEqual(pool.launched, 1)
+            self.assertIsNotNone(chrome.process.poll())
+
+        run(main())
+
+    def test_launch_failure(self):
+        async def main():
+            chrome = launch(binary_path=sys.executable, args=[self.fake_chrome, "--exit-code=3"])
+            with self.assertRaises(RuntimeError) as cm:
+                await chrome.wait_ready(10)
+            self.assertIn("failed to launch", str(cm.exception))
+            chrome.kill()
+
+        run(main())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+from cdp_socket.socket import SingleCDPSocket
+from fake_server import run, page_url, FakeCDPServer, NO_RESPONSE
+
+import asyncio
+import unittest
+
+import websockets
+
+
+class Reconnect(unittest.TestCase):
+
+    def test_reconnect(self):
+        async def main():
+            calls = {"Slow.get": 0, "Network.enable": 0}
+
+            def slow_get(params, conn):
+                calls["Slow.get"] += 1
+                return NO_RESPONSE if calls["Slow.get"] == 1 else {"ok": True}
+
+            def network_enable(params, conn):
+                calls["Network.enable"] += 1
+                return {}
+
+            async with FakeCDPServer(handlers={"Slow.get": slow_get, "Never.respond": lambda p, c: NO_RESPONSE,
+                                               "Network.enable": network_enable}) as server:
+                async with SingleCDPSocket(page_url(server), reconnect=True, idempotent={"Slow.get"}) as sock:
+                    events = []
+                    sock.add_listener("Fake.event", lambda params: events.append(params))
+                    await sock.exec("Network.enable")
+                    replayed = asyncio.ensure_future(sock.exec("Slow.get", timeout=5))
+                    failed = asyncio.ensure_future(sock.exec("Never.respond", timeout=5))
+                    await asyncio.sleep(0.05)
+                    await server.connections[0].close(code=1011, reason="crashed")
+
+                    with self.assertRaises(websockets.exceptions.ConnectionClosedError):
+                        await failed
+                    self.assertEqual(await replayed, {"ok": True})
+                    self.assertEqual(sock.reconnects, 1)
+                    self.assertEqual(calls, {"Slow.get": 2, "Network.enable": 2})
+                    # listeners survive
+                    await sock.exec("Fake.flood", {"method": "Fake.event", "params": {"n": 1}})
+                    await asyncio.sleep(0.05)
+                    self.assertEqual(events, [{"n": 1}])
+
+        run(main())
+
+    def test_reconnect_sessions(self):
+        async def main():
+            async with FakeCDPServer() as server:
+                async with SingleCDPSocket(server.version["webSocketDebuggerUrl"], reconnect=True) as sock:
+                    session = await sock.attach(server.targets[0]["id"])
+                    await server.connections[0].close(code=1011, reason="crashed")
+                    await asyncio.sleep(0.05)
+                    await sock.exec("Target.getTargets", timeout=5)
+                    self.assertTrue(session.closed)
+
+                    # detach handling isn't registered twice
+                    session = await sock.attach(server.targets[0]["id"])
+                    self.assertEqual(len(sock._events["Target.detachedFromTarget"]), 1)
+                    await session.detach()
+                    await asyncio.sleep(0.05)
+                    self.assertEqual(len(sock._events["Target.detachedFromTarget"]), 0)
+
+        run(main())
+
+
+if __name__ == '__main__':
+    unittest.main()
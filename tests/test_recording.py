@@ -0,0 +1,45 @@
+from cdp_socket.socket import SingleCDPSocket
+from cdp_socket.utils.recording import Recorder, Recording, IN, OUT
+from fake_server import run, page_url, FakeCDPServer, ReplayServer
+
+import asyncio
+import os
+import tempfile
+import unittest
+
+
+class RecordReplay(unittest.TestCase):
+
+    def test_record_replay(self):
+        async def main():
+            with tempfile.TemporaryDirectory() as tmp:
+                path = os.path.join(tmp, "session.cdprec")
+                with Recorder(path) as recorder:
+                    async with FakeCDPServer() as server:
+                        async with SingleCDPSocket(page_url(server), recorder=recorder) as sock:
+                            version = await sock.exec("Browser.getVersion")
+                            done = asyncio.ensure_future(sock.wait_for("Fake.event", timeout=5))
+                            await sock.exec("Fake.flood", {"method": "Fake.event", "params": {"n": 1}})
+                            await done
+                self.assertEqual(recorder.frames, 5)  # 2 commands, 2 responses, 1 event
+                with Recording(path) as recording:
+                    records = list(recording)
+                    self.assertEqual([r.direction for r in records].count(OUT), 2)
+                    self.assertEqual([r.timestamp for r in records], sorted(r.timestamp for r in records))
+                    self.assertIn(b'"Fake.event"', bytes(records[-1].data))
+                    self.assertEqual(records[-1].direction, IN)
+
+                async with ReplayServer(path, speed=0) as replay:
+                    async with SingleCDPSocket(page_url(replay)) as sock:
+                        event = asyncio.ensure_future(sock.wait_for("Fake.event", timeout=5))
+                        # responses are held back until the command with the same id got sent
+                        self.assertEqual(await sock.exec("Browser.getVersion"), version)
+                        await sock.exec("Fake.flood")
+                        self.assertEqual(await event, {"n": 1})
+                    self.assertEqual(replay.played, 3)
+
+        run(main())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+from cdp_socket.socket import SingleCDPSocket
+from cdp_socket.scripts.screencast import Screencast
+from fake_server import run, page_url, FakeCDPServer
+
+import asyncio
+import base64
+import unittest
+
+
+class Screencasting(unittest.TestCase):
+
+    def test_screencast(self):
+        async def main():
+            acks = []
+            handlers = {"Page.screencastFrameAck": lambda params, conn: acks.append(params["sessionId"])}
+            async with FakeCDPServer(handlers=handlers) as server:
+                async with SingleCDPSocket(page_url(server)) as sock:
+                    frames = []
+
+                    async def sink(frame):
+                        await asyncio.sleep(0.02)
+                        frames.append(frame)
+
+                    data = base64.b64encode(b"\xff\xd8 jpeg").decode()
+                    async with Screencast(sock, sink, params={"format": "jpeg"}, max_pending=2) as cast:
+                        for n in range(10):
+                            await server.flood("Page.screencastFrame", {"data": data, "metadata": {}, "sessionId": n})
+                        await asyncio.sleep(0.1)
+                    self.assertEqual(sorted(acks), list(range(10)))
+                    stats = cast.stats()
+                    self.assertEqual(stats["received"], 10)
+                    self.assertEqual(stats["acked"], 10)
+                    self.assertEqual(stats["processed"] + stats["dropped"], 10)
+                    self.assertGreater(stats["dropped"], 0)
+                    self.assertEqual(frames[-1].session_id, 9)
+                    self.assertEqual(frames[-1].data, b"\xff\xd8 jpeg")
+                    self.assertNotIn("Page.screencastFrame", {m for m, cbs in sock._events.items() if cbs})
+
+                    # acks delayed for max_fps don't fire after stop()
+                    acks.clear()
+                    async with Screencast(sock, sink, max_fps=10) as cast:
+                        for n in range(5):
+                            await server.flood("Page.screencastFrame", {"data": data, "metadata": {}, "sessionId": n})
+                        await asyncio.sleep(0.05)
+                        self.assertEqual(len(cast._delayed_acks), 4)
+                    self.assertFalse(cast._delayed_acks)
+                    await asyncio.sleep(0.2)
+                    self.assertEqual(acks, [0])
+
+        run(main())
+
+
+if __name__ == '__main__':
+    unittest.main()
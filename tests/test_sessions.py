@@ -0,0 +1,49 @@
+from cdp_socket.exceptions import CDPError
+from cdp_socket.socket import CDPSocket
+from fake_server import run, FakeCDPServer
+
+import asyncio
+import unittest
+
+
+class Sessions(unittest.TestCase):
+
+    def test_flat_sessions(self):
+        async def main():
+            async with FakeCDPServer(n_targets=3) as server:
+                base_socket = await CDPSocket(server.port)
+                targets = await base_socket.targets
+                sessions = [await base_socket.get_session(target) for target in targets]
+                self.assertIs(await base_socket.get_session(targets[0]), sessions[0])
+                browser = await base_socket.get_browser_socket()
+                self.assertEqual(len(server.connections), 1)
+                self.assertEqual(len(browser.sessions), 3)
+
+                res = await sessions[1].exec("Browser.getVersion")
+                self.assertEqual(res["product"], "FakeChrome/1.0.0.0")
+                with self.assertRaises(CDPError):
+                    await sessions[1].exec("Unknown.method")
+
+                received = [[], [], []]
+                for idx, session in enumerate(sessions):
+                    session.add_listener("Fake.event", received[idx].append)
+                done = asyncio.ensure_future(sessions[2].wait_for("Fake.done", timeout=5))
+                await sessions[0].exec("Fake.flood", {"method": "Fake.event", "params": {"s": 0}, "count": 3})
+                await sessions[2].exec("Fake.flood", {"method": "Fake.event", "params": {"s": 2}})
+                await sessions[2].exec("Fake.flood", {"method": "Fake.done"})
+                await done
+                self.assertEqual(received, [[{"s": 0}] * 3, [], [{"s": 2}]])
+
+                closed = asyncio.get_running_loop().create_future()
+                sessions[0].on_closed.append(lambda code, reason: closed.set_result(reason))
+                await sessions[0].detach()
+                self.assertEqual(await asyncio.wait_for(closed, 5), "detached")
+                self.assertTrue(sessions[0].closed)
+                self.assertNotIn(targets[0]["id"], base_socket.sessions)
+                await base_socket.close()
+
+        run(main())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+from cdp_socket.exceptions import CDPError
+from cdp_socket.shards import ShardedCDPSocket, select
+from fake_server import run, FakeCDPServer
+
+import asyncio
+import os
+import time
+import unittest
+
+
+class Shards(unittest.TestCase):
+
+    def test_sharded(self):
+        async def main():
+            async with FakeCDPServer(n_targets=4) as server:
+                async with ShardedCDPSocket(server.port, shards=2) as sharded:
+                    targets = await sharded.targets
+                    self.assertEqual({sharded.shard_for(t["id"]) for t in targets}, {0, 1})
+                    products = await asyncio.gather(*(sharded.exec(t["id"], "Browser.getVersion", fields="product")
+                                                      for t in targets))
+                    self.assertEqual(products, ["FakeChrome/1.0.0.0"] * 4)
+                    res = await sharded.exec(targets[0]["id"], "Browser.getVersion",
+                                             fields=["product", "missing.field"])
+                    self.assertEqual(res, ["FakeChrome/1.0.0.0", None])
+                    with self.assertRaises(CDPError):
+                        await sharded.exec(targets[1]["id"], "Unknown.method")
+
+                    received = asyncio.Queue()
+                    listener = await sharded.add_listener(targets[1]["id"], "Fake.event", received.put_nowait,
+                                                          fields="a.1")
+                    await sharded.exec(targets[1]["id"], "Fake.flood",
+                                       {"method": "Fake.event", "params": {"a": [1, 2], "b": "x" * 1000}})
+                    self.assertEqual(await asyncio.wait_for(received.get(), 5), 2)
+                    sharded.remove_listener(listener)
+                    self.assertEqual(len(server.connections), 4)
+                    pids = {shard["pid"] for shard in sharded.stats()}
+                    self.assertEqual(len(pids), 2)
+                    self.assertNotIn(os.getpid(), pids)
+
+        run(main())
+
+    def test_concurrent_first_calls(self):
+        async def main():
+            async with FakeCDPServer() as server:
+                connected = []
+                server._on_connect = connected.append
+                async with ShardedCDPSocket(server.port, shards=1) as sharded:
+                    target_id = server.targets[0]["id"]
+                    products = await asyncio.gather(*(sharded.exec(target_id, "Browser.getVersion", fields="product")
+                                                      for _ in range(20)))
+                    self.assertEqual(products, ["FakeChrome/1.0.0.0"] * 20)
+                    self.assertEqual(len(connected), 2)  # the start-up probe and the target's socket
+                    self.assertEqual(await sharded.exec(target_id, "Browser.getVersion", timeout=None,
+                                                        fields="product"), "FakeChrome/1.0.0.0")
+
+                    # params which can't be serialised fail right away, the rest of the batch gets sent
+                    start = time.perf_counter()
+                    results = await asyncio.gather(sharded.exec(target_id, "Browser.getVersion", {"big": 2 ** 70}),
+                                                   sharded.exec(target_id, "Browser.getVersion", fields="product"),
+                                                   return_exceptions=True)
+                    self.assertIsInstance(results[0], TypeError)
+                    self.assertEqual(results[1], "FakeChrome/1.0.0.0")
+                    self.assertLess(time.perf_counter() - start, 1)
+
+        run(main())
+
+    def test_select(self):
+        res = {"result": {"type": "object", "value": [{"a": 1}, {"a": 2}]}}
+        self.assertEqual(select(res, "result.value.1.a"), 2)
+        self.assertEqual(select(res, ["result.type", "result.x"]), ["object", None])
+        self.assertIs(select(res), res)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+from cdp_socket.exceptions import CDPError
+from cdp_socket.sync import SyncCDPSocket
+from cdp_socket.utils.window import InFlightWindow
+from fake_server import run, page_url, FakeCDPServer, NO_RESPONSE
+
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import threading
+import time
+import unittest
+
+
+class Sync(unittest.TestCase):
+
+    def test_sync(self):
+        async def main():
+            async def slow(params, conn):
+                await asyncio.sleep(0.2)
+                return {}
+
+            async with FakeCDPServer(handlers={"Never.respond": lambda params, conn: NO_RESPONSE,
+                                               "Slow.get": slow}) as server:
+                def work():
+                    with SyncCDPSocket(page_url(server)) as sock:
+                        self.assertEqual(sock.exec("Browser.getVersion")["product"], "FakeChrome/1.0.0.0")
+                        with self.assertRaises(CDPError):
+                            sock.exec("Unknown.method")
+                        results = sock.exec_many([("Browser.getVersion",), ("Never.respond",)], timeout=0.1)
+                        self.assertIsInstance(results[1], asyncio.TimeoutError)
+                        futures = sock.submit_many([("Browser.getVersion",)] * 50)
+                        self.assertEqual(len([fut.result() for fut in futures]), 50)
+                        with ThreadPoolExecutor(8) as executor:
+                            versions = list(executor.map(lambda _: sock.exec("Browser.getVersion"), range(200)))
+                        self.assertEqual(len(versions), 200)
+                        # batched: fewer wake-ups than commands
+                        self.assertLess(sock.wakeups, sock.submitted)
+
+                        # listeners run on the socket's thread
+                        received = threading.Event()
+                        sock.add_listener("Fake.event", lambda params: received.set())
+                        sock.exec("Fake.flood", {"method": "Fake.event", "params": {"n": 1}})
+                        self.assertTrue(received.wait(5))
+                        with self.assertRaises(ValueError):
+                            sock.remove_listener("Fake.event", print)
+
+                        # pending commands fail on close, instead of being dropped with the loop
+                        pending = sock.submit("Never.respond", timeout=30)
+                        time.sleep(0.05)
+                    self.assertTrue(sock.closed)
+                    self.assertIsNotNone(pending.exception(5))
+                    with self.assertRaises(RuntimeError):
+                        sock.submit("Browser.getVersion")
+
+                    # exec_many keeps the shared deadline and the in-flight window
+                    with SyncCDPSocket(page_url(server), window=InFlightWindow(limit=1)) as sock:
+                        start = time.perf_counter()
+                        results = sock.exec_many([("Slow.get",)] * 4, timeout=0.3)
+                        self.assertLess(time.perf_counter() - start, 0.45)
+                        self.assertEqual(results[0], {})
+                        for res in results[1:]:
+                            self.assertIsInstance(res, asyncio.TimeoutError)
+
+                await asyncio.get_running_loop().run_in_executor(None, work)
+
+        run(main())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+from cdp_socket.exceptions import CDPError
+from cdp_socket.socket import SingleCDPSocket
+from cdp_socket.scripts.transfer import Base64Writer, print_to_pdf, capture_screenshot
+from fake_server import run, page_url, FakeCDPServer
+
+import base64
+import io
+import os
+import tempfile
+import unittest
+
+
+class Transfer(unittest.TestCase):
+
+    def test_print_to_pdf(self):
+        async def main():
+            async with FakeCDPServer() as server:
+                async with SingleCDPSocket(page_url(server)) as sock:
+                    buffer = io.BytesIO()
+                    written = await print_to_pdf(sock, buffer, chunk_size=1000, read_ahead=3)
+                    self.assertEqual(written, len(server.document))
+                    self.assertEqual(buffer.getvalue(), server.document)
+                    self.assertEqual(server.streams, {})
+                    with tempfile.TemporaryDirectory() as tmp:
+                        path = os.path.join(tmp, "page.pdf")
+                        await print_to_pdf(sock, path, chunk_size=4096)
+                        with open(path, "rb") as f:
+                            self.assertEqual(f.read(), server.document)
+                    self.assertEqual(len(sock.pending), 0)
+
+        run(main())
+
+    def test_transfer_close_error(self):
+        async def main():
+            def fail(message):
+                def handler(params, conn):
+                    raise CDPError({"code": -32000, "message": message})
+                return handler
+
+            async with FakeCDPServer(handlers={"IO.close": fail("close failed")}) as server:
+                async with SingleCDPSocket(page_url(server)) as sock:
+                    with self.assertRaises(CDPError) as ctx:
+                        await print_to_pdf(sock, io.BytesIO())
+                    self.assertEqual(ctx.exception.message, "close failed")  # nothing else failed
+                    server.handlers["IO.read"] = fail("read failed")
+                    with self.assertRaises(CDPError) as ctx:
+                        await print_to_pdf(sock, io.BytesIO())
+                    self.assertEqual(ctx.exception.message, "read failed")
+
+        run(main())
+
+    def test_capture_screenshot(self):
+        async def main():
+            async with FakeCDPServer() as server:
+                async with SingleCDPSocket(page_url(server)) as sock:
+                    buffer = io.BytesIO()
+                    await capture_screenshot(sock, buffer, chunk_size=1001)
+                    self.assertEqual(buffer.getvalue(), server.document)
+
+        run(main())
+
+    def test_base64_writer(self):
+        async def main():
+            data = bytes(range(256)) * 3
+            encoded = base64.b64encode(data)
+            buffer = io.BytesIO()
+            writer = Base64Writer(buffer)
+            for start in range(0, len(encoded), 7):
+                await writer.write(encoded[start:start + 7])
+            await writer.close()
+            self.assertEqual(buffer.getvalue(), data)
+            with self.assertRaises(ValueError):
+                writer = Base64Writer(io.BytesIO())
+                await writer.write(encoded[:5])
+                await writer.close()
+
+        run(main())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+from cdp_socket.utils.values import from_deep, from_preview, from_remote_object, view, DeepDict
+
+import sys
+import unittest
+
+
+class Values(unittest.TestCase):
+
+    def test_deep_values(self):
+        # [{a: 1, b: [NaN, -0, 12n], c: undefined}, new Map([[1, "x"]]), obj] with obj = {self: obj}
+        deep = {"type": "array", "value": [
+            {"type": "object", "value": [
+                ["a", {"type": "number", "value": 1}],
+                ["b", {"type": "array", "value": [{"type": "number", "value": "NaN"},
+                                                  {"type": "number", "value": "-0"},
+                                                  {"type": "bigint", "value": "12"}]}],
+                ["c", {"type": "undefined"}]]},
+            {"type": "map", "value": [[{"type": "number", "value": 1}, {"type": "string", "value": "x"}]]},
+            {"type": "object", "weakLocalObjectReference": 1, "value": [
+                ["self", {"type": "object", "weakLocalObjectReference": 1}]]},
+            {"type": "function"}]}
+        value = from_deep(deep)
+        self.assertEqual(value[0]["a"], 1)
+        nan, zero, big = value[0]["b"]
+        self.assertNotEqual(nan, nan)
+        self.assertEqual(str(zero), "-0.0")
+        self.assertEqual(big, 12)
+        self.assertIsNone(value[0]["c"])
+        self.assertEqual(value[1], {1: "x"})
+        self.assertIs(value[2]["self"], value[2])
+        self.assertEqual(value[3], {"type": "function"})
+
+        # deeper than the recursion limit
+        nested = {"type": "number", "value": 0}
+        for _ in range(sys.getrecursionlimit() * 2):
+            nested = {"type": "array", "value": [nested]}
+        self.assertIsInstance(from_deep(nested), list)
+
+        lazy = view(deep)
+        self.assertEqual(len(lazy), 4)
+        self.assertIsInstance(lazy[0], DeepDict)
+        self.assertEqual(list(lazy[0]), ["a", "b", "c"])
+        self.assertEqual(lazy[0]["b"][2], 12)
+        self.assertEqual(lazy[1][1], "x")
+        self.assertIs(lazy[0], lazy[0])  # converted once
+        self.assertEqual(lazy[0].to_python()["a"], 1)
+
+        preview = {"type": "object", "overflow": False, "properties": [
+            {"name": "n", "type": "number", "value": "1.5"},
+            {"name": "ok", "type": "boolean", "value": "true"},
+            {"name": "none", "type": "object", "subtype": "null", "value": "null"},
+            {"name": "list", "type": "object", "subtype": "array", "valuePreview": {
+                "type": "object", "subtype": "array", "overflow": False, "properties": [
+                    {"name": "0", "type": "string", "value": "a"}]}},
+            {"name": "el", "type": "object", "subtype": "node", "value": "div"}]}
+        self.assertEqual(from_preview(preview), {"n": 1.5, "ok": True, "none": None, "list": ["a"], "el": "div"})
+        map_preview = {"type": "object", "subtype": "map", "overflow": False, "properties": [], "entries": [
+            {"key": {"type": "string", "description": "k", "overflow": False, "properties": []},
+             "value": {"type": "number", "description": "2", "overflow": False, "properties": []}}]}
+        self.assertEqual(from_preview(map_preview), {"k": 2})
+
+        self.assertEqual(from_remote_object({"type": "number", "value": 3}), 3)
+        self.assertEqual(from_remote_object({"type": "bigint", "unserializableValue": "5n"}), 5)
+        self.assertEqual(from_remote_object({"type": "object", "deepSerializedValue": deep})[1], {1: "x"})
+
+
+if __name__ == '__main__':
+    unittest.main()
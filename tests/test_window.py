@@ -0,0 +1,112 @@
+from cdp_socket.socket import SingleCDPSocket
+from cdp_socket.utils.window import InFlightWindow, BULK, INTERACTIVE, NORMAL
+from fake_server import run, page_url, FakeCDPServer
+
+import asyncio
+import time
+import unittest
+
+
+class Window(unittest.TestCase):
+
+    def test_window(self):
+        async def slow(params, conn):
+            await asyncio.sleep(0.02)
+            return {}
+
+        async def main():
+            window = InFlightWindow(limit=2)
+            async with FakeCDPServer(handlers={"DOM.slow": slow, "Input.slow": slow}) as server:
+                async with SingleCDPSocket(page_url(server), window=window) as sock:
+                    done = []
+
+                    async def run_one(method, tag):
+                        await sock.exec(method, timeout=5)
+                        done.append(tag)
+
+                    bulk = [asyncio.ensure_future(run_one("DOM.slow", n)) for n in range(10)]
+                    await asyncio.sleep(0)
+                    self.assertEqual(window.in_flight, 2)
+                    self.assertEqual(window.waiting(BULK), 8)
+                    # bypasses the queued bulk commands
+                    await run_one("Input.slow", "input")
+                    self.assertLessEqual(done.index("input"), 2)
+
+                    # waiting for a credit counts towards the timeout
+                    with self.assertRaises(asyncio.TimeoutError):
+                        await sock.exec("DOM.slow", timeout=0.01)
+                    await asyncio.gather(*bulk)
+                    results = await sock.exec_many([("DOM.slow",)] * 5, timeout=5)
+                    self.assertEqual(results, [{}] * 5)
+                    self.assertEqual(window.in_flight, 0)
+            stats = window.stats()
+            self.assertEqual(stats[BULK]["sent"], 15)
+            self.assertEqual(stats[INTERACTIVE]["queued"], 0)
+            self.assertGreater(stats[BULK]["delay"]["sum"], 0)
+
+        run(main())
+
+    def test_window_exec_many_deadline(self):
+        async def slow(params, conn):
+            await asyncio.sleep(0.2)
+            return {}
+
+        async def main():
+            window = InFlightWindow(limit=1)
+            async with FakeCDPServer(handlers={"Slow.get": slow}) as server:
+                async with SingleCDPSocket(page_url(server), window=window) as sock:
+                    start = time.perf_counter()
+                    results = await sock.exec_many([("Slow.get",)] * 4, timeout=0.3)
+                    self.assertLess(time.perf_counter() - start, 0.45)  # one shared deadline
+                    self.assertEqual(results[0], {})
+                    for res in results[1:]:
+                        self.assertIsInstance(res, asyncio.TimeoutError)
+                    await asyncio.sleep(0.2)  # the late response returns its credit
+                    self.assertEqual(window.in_flight, 0)
+                    self.assertEqual(window.waiting(), 0)
+
+        run(main())
+
+    def test_window_per_target(self):
+        async def main():
+            window = InFlightWindow(limit=3, per_target=1)
+            self.assertIsNone(window.acquire("A.b", "a"))
+            waiting = window.acquire("A.b", "a")
+            self.assertIsNotNone(waiting)
+            self.assertIsNone(window.acquire("A.b", "b"))  # another target isn't blocked by "a"
+            self.assertIsNone(window.acquire("Input.x", "c"))
+            blocked = window.acquire("A.b", "d")  # window full
+            window.release("a")
+            self.assertTrue(waiting.done())
+            self.assertFalse(blocked.done())
+            window.discard(blocked, "d")
+            self.assertEqual(window.waiting(), 0)
+
+        run(main())
+
+    def test_window_round_robin(self):
+        async def main():
+            with self.assertRaises(ValueError) as cm:
+                InFlightWindow(classes={"DOM.": "slow"})
+            self.assertIn("interactive, normal, bulk", str(cm.exception))
+            window = InFlightWindow(limit=1, interactive_reserve=0)
+            with self.assertRaises(ValueError):
+                window.acquire("A.b", priority="urgent")
+
+            self.assertIsNone(window.acquire("A.b"))
+            order = []
+            for cls, target in [(INTERACTIVE, "a")] * 3 + [(BULK, "a"), (BULK, "a"), (BULK, "b"), (NORMAL, "a")]:
+                fut = window.acquire("A.b", target, priority=cls)
+                fut.add_done_callback(lambda _, _cls=cls, _target=target: order.append((_cls, _target)))
+            for _ in range(7):
+                window.release()
+                await asyncio.sleep(0)
+            # one credit per class and pass, targets take turns within a class
+            self.assertEqual(order, [(INTERACTIVE, "a"), (NORMAL, "a"), (BULK, "a"), (INTERACTIVE, "a"),
+                                     (BULK, "b"), (INTERACTIVE, "a"), (BULK, "a")])
+
+        run(main())
+
+
+if __name__ == '__main__':
+    unittest.main()